@@ -3,10 +3,11 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import numpy as np
+import tempfile
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation, PillowWriter
 from irrepnet import IRREPnetSim
+from irrepnet.trajectory import TrajectoryReader, record_trajectory
 
 def main():
     p = argparse.ArgumentParser(description="Animate counts over (edge, phase) during evolution.")
@@ -32,21 +33,29 @@ def main():
         default=None,
         help="Optional path to write per-frame per-channel edge sums as JSON.",
     )
+    p.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Directory for the compressed trajectory store (default: a temporary directory).",
+    )
+    p.add_argument("--every", type=int, default=1, help="Store every N-th step as a frame")
     args = p.parse_args()
 
     sim = IRREPnetSim(args.scenario)
 
-    # capture initial state
-    snapshots = []
-    snapshots.append(sim.counts.detach().to("cpu").numpy())
-
-    for _ in range(args.frames):
-        sim.step()
-        snapshots.append(sim.counts.detach().to("cpu").numpy())
+    # stream snapshots to disk; frames are read back lazily, so memory does not grow with --frames
+    if args.store:
+        animate(args, sim, args.store)
+    else:
+        with tempfile.TemporaryDirectory(prefix="irrepnet-anim-") as store:
+            animate(args, sim, store)
 
-    raw = np.stack(snapshots, axis=0)  # [T+1, E, C, K]
+def animate(args, sim, store):
+    record_trajectory(sim, store, args.frames, every=args.every)
+    reader = TrajectoryReader(store)
 
-    channel_names = [ch.name for ch in sim.scenario.channels]
+    channel_names = reader.channels
     if args.channels:
         selected_indices = []
         for name in args.channels:
@@ -59,32 +68,29 @@ def main():
         raise SystemExit("No channels selected for animation.")
     selected_names = [channel_names[i] for i in selected_indices]
 
-    data = raw[:, :, selected_indices, :]  # [T+1, E, C_sel, K]
-    T = data.shape[0]
-
-    aggregated_for_dump = data.sum(axis=3)  # [T+1, E, C_sel]
+    T = len(reader)
 
     if args.dump:
-        dump_payload = []
-        for frame_idx in range(T):
-            frame_entry = {"frame": frame_idx, "channels": {}}
-            for ci, name in enumerate(selected_names):
-                edge_values = aggregated_for_dump[frame_idx, :, ci]
-                nonzero = {int(edge_idx): int(val) for edge_idx, val in enumerate(edge_values) if val != 0}
-                if nonzero:
-                    frame_entry["channels"][name] = nonzero
-            dump_payload.append(frame_entry)
         with open(args.dump, "w", encoding="utf-8") as fh:
-            json.dump(dump_payload, fh, indent=2)
+            fh.write("[")
+            for frame_idx in range(T):
+                edge_sums = reader.frame(frame_idx, channels=selected_indices, sum_phases=True)[:, :, 0]
+                frame_entry = {"frame": frame_idx, "step": reader.steps[frame_idx], "channels": {}}
+                for ci, name in enumerate(selected_names):
+                    edge_values = edge_sums[:, ci]
+                    nonzero = {int(edge_idx): int(val) for edge_idx, val in enumerate(edge_values) if val != 0}
+                    if nonzero:
+                        frame_entry["channels"][name] = nonzero
+                fh.write(("," if frame_idx else "") + "\n" + json.dumps(frame_entry))
+            fh.write("\n]\n")
 
     if args.split_channels and len(selected_indices) > 1:
-        E, K = data.shape[1], data.shape[3]
         fig, axes = plt.subplots(len(selected_indices), 1, sharex=True, figsize=(8, 3 * len(selected_indices)))
         if len(selected_indices) == 1:
             axes = [axes]
         ims = []
         for idx, ax in enumerate(axes):
-            im = ax.imshow(data[0, :, idx, :], aspect="auto", origin="lower")
+            im = ax.imshow(reader.frame(0, channels=[selected_indices[idx]])[:, 0, :], aspect="auto", origin="lower")
             ax.set_ylabel("directed edge index")
             ax.set_title(f"Channel: {selected_names[idx]} — frame 0/{T-1}")
             ims.append(im)
@@ -92,17 +98,19 @@ def main():
         fig.colorbar(ims[0], ax=axes, label="count")
 
         def update(frame):
+            data = reader.frame(frame, channels=selected_indices)  # [E, C_sel, K]
             for idx, im in enumerate(ims):
-                im.set_data(data[frame, :, idx, :])
+                im.set_data(data[:, idx, :])
                 axes[idx].set_title(f"Channel: {selected_names[idx]} — frame {frame}/{T-1}")
             return tuple(ims)
 
         anim = FuncAnimation(fig, update, frames=T, interval=args.interval, blit=False)
     else:
-        summed = data.sum(axis=2)  # [T+1, E, K]
-        T, E, K = summed.shape
+        def summed(frame):
+            return reader.frame(frame, channels=selected_indices, sum_channels=True)[:, 0, :]  # [E, K]
+
         fig, ax = plt.subplots()
-        im = ax.imshow(summed[0], aspect="auto", origin="lower")
+        im = ax.imshow(summed(0), aspect="auto", origin="lower")
         ax.set_xlabel("phase (0..k-1)")
         ax.set_ylabel("directed edge index")
         label = ", ".join(selected_names) if selected_names else "all channels"
@@ -112,7 +120,7 @@ def main():
         cbar.set_label("count")
 
         def update(frame):
-            im.set_data(summed[frame])
+            im.set_data(summed(frame))
             ax.set_title(f"Counts over (edge, phase) — {label} — frame {frame}/{T-1}")
             return (im,)
 
@@ -12,6 +12,10 @@ def main():
     p.add_argument("--steps", type=int, default=100, help="Timed steps")
     p.add_argument("--device", type=str, default=None, choices=[None, "cpu", "cuda", "mps"],
                    help="Force device (default: auto-detect)")
+    p.add_argument("--breakdown", action="store_true",
+                   help="Profile a second pass and print per-phase timings and counters")
+    p.add_argument("--trace", type=str, default=None,
+                   help="With --breakdown, also write a Chrome trace (chrome://tracing, Perfetto)")
     args = p.parse_args()
 
     # device select
@@ -51,5 +55,17 @@ def main():
     print(f"warmup: {args.warmup} steps in {warmup_s:.4f}s")
     print(f"timed : {args.steps} steps in {total_s:.4f}s  → {per_step*1000:.3f} ms/step")
 
+    if args.breakdown or args.trace:
+        profiler = sim.enable_profiling()
+        for _ in range(args.steps):
+            sim.step()
+        sim.measure()
+        sim.disable_profiling()
+        print()
+        print(profiler.table())
+        if args.trace:
+            profiler.export_chrome_trace(args.trace)
+            print(f"trace → {args.trace}")
+
 if __name__ == "__main__":
     main()
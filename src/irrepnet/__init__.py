@@ -1,2 +1,32 @@
-from .sim import IRREPnetSim
-__all__ = ['IRREPnetSim']
+import importlib
+
+# torch is imported on first use of a simulator class, so `irrepnet.loader` tooling starts fast
+_EXPORTS = {
+    'IRREPnetSim': '.sim',
+    'TritSim': '.trit',
+    'PipelineFrame': '.pipeline',
+    'SimulationPipeline': '.pipeline',
+    'SimProfiler': '.instrument',
+    'GaugeResponse': '.gauge',
+    'HolonomyIndex': '.holonomy',
+    'MultiScenarioSim': '.multi',
+    'CorridorSim': '.corridor',
+    'AdjointResult': '.adjoint',
+    'ResponseLibrary': '.green',
+    'InvariantMonitor': '.monitor',
+    'TrajectoryReader': '.trajectory',
+    'TrajectoryWriter': '.trajectory',
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'irrepnet' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
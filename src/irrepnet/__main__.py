@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import sys
+from typing import Optional, Sequence
+
+COMMANDS = ("serve", "bench", "validate", "difftest")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] not in COMMANDS:
+        print(f"usage: irrepnet {{{','.join(COMMANDS)}}} [options]", file=sys.stderr)
+        return 2
+    command, rest = args[0], args[1:]
+    if command == "validate":
+        return validate(rest)
+    if command == "serve":
+        from .server import main as serve
+
+        return serve(rest)
+    if command == "difftest":
+        from .difftest import main as difftest
+
+        return difftest(rest)
+    from .bench import main as bench
+
+    return bench(rest)
+
+
+def validate(paths: Sequence[str]) -> int:
+    """Parse scenario files without building a simulator (torch is never imported)."""
+    import yaml
+
+    from .loader import _read_yaml, parse_scenario, parse_trit_scenario
+
+    failed = 0
+    for path in paths:
+        try:
+            raw = _read_yaml(path)
+            if not isinstance(raw, dict):
+                raise ValueError("E_SCENARIO_MALFORMED: top level must be a mapping")
+            trit = str(raw.get("irrepnet_dm", "")) == "0.3"
+            scenario = parse_trit_scenario(raw) if trit else parse_scenario(raw)
+        except (OSError, ValueError, yaml.YAMLError) as exc:
+            print(f"{path}: {exc}", file=sys.stderr)
+            failed += 1
+            continue
+        except (KeyError, TypeError) as exc:
+            print(f"{path}: E_SCENARIO_MALFORMED: {type(exc).__name__}: {exc}", file=sys.stderr)
+            failed += 1
+            continue
+        phases = "trit" if trit else f"k={scenario.k}"
+        print(
+            f"{path}: ok ({scenario.node_count} nodes, {len(scenario.directed_edges)} edges, "
+            f"{len(scenario.channels)} channels, {phases})"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
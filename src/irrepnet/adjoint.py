@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+
+import torch
+
+from .measure import _real_dtype_for_device, roots_of_unity
+
+
+@dataclass
+class AdjointResult:
+    """
+    Sensitivity of one readout's amplitude to the counts `steps` steps earlier:
+    `amplitude = sum(sensitivity * counts)` and the readout is `|amplitude|**2`.
+    `sensitivity` is complex `[E, C, k]` in the layout of `sim.export_counts()` (load order).
+    """
+
+    readout: str
+    steps: int
+    sensitivity: torch.Tensor
+    edge_ids: List[int]  # directed edge ID per sensitivity row
+
+    def amplitude(self, counts: torch.Tensor) -> complex:
+        """Readout amplitude for `counts` ([E, C, k], load order) as the start state."""
+        weights = self.sensitivity.to(counts.device)
+        return complex((weights * counts.to(weights.dtype)).sum().item())
+
+    def predict(self, counts: torch.Tensor) -> float:
+        """The measurement `sim.measure()[readout]` would report after `steps` steps from `counts`."""
+        return abs(self.amplitude(counts)) ** 2
+
+    def top(self, n: int = 10) -> List[Tuple[int, int, int, float]]:
+        """Largest |sensitivity| entries as (edge ID, channel, phase, magnitude)."""
+        magnitude = self.sensitivity.abs().reshape(-1)
+        values, flat = magnitude.topk(min(n, magnitude.numel()))
+        _, channels, k = self.sensitivity.shape
+        entries = []
+        for value, index in zip(values.tolist(), flat.tolist()):
+            if value == 0.0:
+                break
+            edge, rest = divmod(index, channels * k)
+            entries.append((self.edge_ids[edge], rest // k, rest % k, value))
+        return entries
+
+
+@torch.no_grad()
+def adjoint(sim: Any, readout: str, steps: int = 1) -> AdjointResult:
+    """
+    Backward pass of the (linear, coupling-free) layer maps from `readout`'s selector.
+
+    A layer maps counts by `next[t, c, g] += mask[e, c, g] * counts[e, c, g - delta[e, c]]` for every
+    fan-out target t of edge e. Its transpose sums the weights of e's targets, applies the mask and
+    shifts the phase back by delta; running the layers in reverse order for `steps` steps turns
+    the readout's phasor selector chi(g) on its (edge, channel) rows into the weight of every
+    source bin, in the cost of one simulation.
+    """
+    if sim.coupling_rules:
+        raise ValueError("E_ADJOINT_NONLINEAR: coupling rules make propagation nonlinear")
+    if steps < 0:
+        raise ValueError("E_ADJOINT_STEPS_RANGE")
+    matches = [r for r in sim.readouts if r.name == readout]
+    if not matches:
+        raise ValueError(f"E_ADJOINT_READOUT_UNKNOWN: {readout}")
+    selected = matches[0]
+    with sim.expanded_phases():  # sensitivities cover every declared phase
+        device = sim.device
+        k = sim.k
+        real_dtype = _real_dtype_for_device(device)
+        complex_dtype = torch.complex64 if real_dtype == torch.float32 else torch.complex128
+        chi = roots_of_unity(k, device=device, real_dtype=real_dtype).to(complex_dtype)
+
+        weights = torch.zeros((sim.num_edges, sim.num_channels, k), dtype=complex_dtype, device=device)
+        if selected.edges:
+            channels = list(selected.channels) if selected.channels is not None else list(range(sim.num_channels))
+            rows = torch.tensor(selected.edges, dtype=torch.int64, device=device)
+            selector = torch.zeros((sim.num_channels, k), dtype=complex_dtype, device=device)
+            selector[channels] = chi
+            # repeated readout edges count once per listing, as in measure_counts
+            weights.index_add_(0, rows, selector.expand(rows.numel(), -1, -1).contiguous())
+
+        phase = sim.phase_range.view(1, 1, k)
+        layers = [chunks for layer, chunks in zip(sim.layers, sim._plans) if layer] * sim.repeat
+        for _ in range(steps):
+            for chunks in reversed(layers):
+                previous = torch.zeros_like(weights)
+                for chunk in chunks:
+                    edge_idx = chunk.edge_idx
+                    rows = edge_idx.numel()
+                    gathered = torch.zeros((rows, sim.num_channels, k), dtype=complex_dtype, device=device)
+                    if chunk.fan_rows.numel():
+                        gathered.index_add_(0, chunk.fan_rows, weights.index_select(0, chunk.fan_targets))
+                    gathered = gathered * sim._edge_masks(edge_idx).to(real_dtype)
+                    delta = sim._edge_deltas(edge_idx)  # [R, C]
+                    index = (phase + delta.unsqueeze(-1)) % k  # source phase h feeds g = h + delta
+                    previous.index_copy_(0, edge_idx, gathered.gather(2, index.expand(rows, -1, k)))
+                weights = previous
+
+        export_index = getattr(sim, "export_index", None)
+        order = range(sim.num_edges)
+        if export_index is not None:
+            weights = weights.index_select(0, export_index)
+            order = export_index.tolist()
+    edge_ids = [sim.scenario.directed_edges[edge].id for edge in order]
+    return AdjointResult(readout=readout, steps=steps, sensitivity=weights.cpu(), edge_ids=edge_ids)
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+BACKEND_NAMES = ("auto", "torch", "numpy", "mmap")
+# `backend="auto"` uses NumPy on the CPU when the state has at most this many count bins (E x C x k)
+NUMPY_AUTO_CELLS = 1 << 14
+
+
+class TorchBackend:
+    """Layer kernels as torch ops on `sim.device` (the reference implementation in `IRREPnetSim`)."""
+
+    name = "torch"
+
+    def __init__(self, sim: Any):
+        self.sim = sim
+
+    def apply_layer(self, layer_idx: int, chunks: Sequence[Any]) -> None:
+        self.sim._apply_layer(chunks)
+
+    def clear_next(self) -> None:
+        self.sim.counts_next.zero_()
+
+    def invalidate(self, edges: Sequence[int], version: Tuple[int, ...]) -> None:
+        pass
+
+
+class _NumpyChunk:
+    """Precomputed gather indices and masks for one `_LayerChunk`, flattened over [C, k]."""
+
+    def __init__(self, sim: Any, chunk: Any):
+        edge_idx = chunk.edge_idx
+        cell = sim.num_channels * sim.bins
+        delta = sim._edge_deltas(edge_idx)  # [R, C]
+        phase = (sim.phase_range.view(1, 1, -1) - delta.unsqueeze(-1)) % sim.bins  # [R, C, k]
+        channel = torch.arange(sim.num_channels, dtype=torch.int64).view(1, -1, 1) * sim.bins
+        source = edge_idx.view(-1, 1, 1) * cell + channel + phase
+        self.rows = edge_idx.numpy()
+        self.source = source.reshape(-1, cell).numpy()
+        self.mask = sim._edge_masks(edge_idx).to(sim.count_dtype).reshape(-1, cell).numpy()
+        # fan-out as a segment sum: rows sorted by target, one reduceat segment per distinct target
+        fan_rows = chunk.fan_rows.numpy()
+        fan_targets = chunk.fan_targets.numpy()
+        order = np.argsort(fan_targets, kind="stable")
+        self.fan_rows = fan_rows[order]
+        self.targets, self.starts = np.unique(fan_targets[order], return_index=True)
+        self.local_node = chunk.local_node.numpy()
+        self.nodes = chunk.nodes
+
+
+class NumpyBackend:
+    """
+    Layer kernels in NumPy for small CPU scenarios, where torch's per-op dispatch dominates.
+    Works on NumPy views of the sim's CPU tensors (they share memory), so everything else that
+    reads or writes `sim.counts` sees the same state. Per-chunk gather indices and masks are
+    built on first use. The mutation API drops just the chunks holding the edges it changed
+    (`invalidate()`); any other write to the gauge, offset or mask tensors (`sim.gauge[n] = g`)
+    changes `sim._kernel_version()` and drops them all.
+    """
+
+    name = "numpy"
+
+    def __init__(self, sim: Any):
+        if sim.device.type != "cpu":
+            raise ValueError(f"E_BACKEND_DEVICE: the numpy backend needs a CPU device, got {sim.device}")
+        self.sim = sim
+        # id(chunks) -> (chunks, prepared); None marks a chunk to rebuild
+        self._layers: Dict[int, Tuple[Sequence[Any], List[Optional[_NumpyChunk]]]] = {}
+        self._version: Tuple[int, ...] = ()
+
+    chunk_type = _NumpyChunk
+
+    def invalidate(self, edges: Sequence[int], version: Tuple[int, ...]) -> None:
+        """Drop the chunks holding `edges`, written through the API at kernel version `version`."""
+        if version != self._version:
+            self._layers.clear()  # unannounced writes since the chunks were built
+        else:
+            stale = np.asarray(sorted(set(edges)), dtype=np.int64)
+            for key, (chunks, prepared) in list(self._layers.items()):
+                for position, chunk in enumerate(chunks):
+                    if prepared[position] is not None and np.isin(chunk.edge_idx.numpy(), stale).any():
+                        prepared[position] = None
+                if all(entry is None for entry in prepared):
+                    del self._layers[key]
+        self._version = self.sim._kernel_version()
+
+    def clear_next(self) -> None:
+        self.sim.counts_next.zero_()
+
+    def _prepared(self, chunks: Sequence[Any]) -> List[Any]:
+        version = self.sim._kernel_version()
+        if version != self._version:
+            self._layers.clear()
+            self._version = version
+        # keyed by the chunk list itself: the layer plans plus any pruned schedules (see `prune`)
+        cached = self._layers.get(id(chunks))
+        if cached is None or cached[0] is not chunks:
+            cached = (chunks, [None] * len(chunks))
+            self._layers[id(chunks)] = cached
+        prepared = cached[1]
+        for position, chunk in enumerate(chunks):
+            if prepared[position] is None:
+                prepared[position] = self.chunk_type(self.sim, chunk)
+        return prepared
+
+    def apply_layer(self, layer_idx: int, chunks: Sequence[Any]) -> None:
+        sim = self.sim
+        cell = sim.num_channels * sim.bins
+        counts = sim.counts.numpy().reshape(-1)
+        counts_next = sim.counts_next.numpy().reshape(-1, cell)
+        for chunk in self._prepared(chunks):
+            with sim._phase("propagate"):
+                allowed = counts[chunk.source] * chunk.mask  # [R, C*k]
+                if chunk.fan_rows.size:
+                    counts_next[chunk.targets] += np.add.reduceat(allowed[chunk.fan_rows], chunk.starts, axis=0)
+                sim._count("nodes_touched", len(chunk.nodes))
+                sim._count("edges_written", int(chunk.fan_rows.size))
+            if sim.coupling_rules:
+                self._couple(chunk, allowed)
+
+    def _couple(self, chunk: _NumpyChunk, allowed: np.ndarray) -> None:
+        sim = self.sim
+        with sim._phase("coupling"):
+            incoming = np.zeros((len(chunk.nodes), sim.num_channels * sim.bins), dtype=allowed.dtype)
+            np.add.at(incoming, chunk.local_node, allowed)
+            totals = incoming.sum(axis=1)
+            for local, node in enumerate(chunk.nodes):
+                if totals[local] == 0:
+                    continue
+                sim._apply_coupling(node, torch.from_numpy(incoming[local].reshape(sim.num_channels, sim.bins)))
+
+
+class _MappedChunk(_NumpyChunk):
+    """A `_NumpyChunk` whose gather reads only its own rows, staged in memory: [R, C*k]."""
+
+    def __init__(self, sim: Any, chunk: Any):
+        super().__init__(sim, chunk)
+        cell = sim.num_channels * sim.bins
+        local = np.arange(self.rows.size, dtype=np.int64) * cell
+        self.source = self.source - (self.rows * cell)[:, None] + local[:, None]
+
+
+def _spans(chunk: Any) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Readahead spans of a `_LayerChunk`: its own rows and its fan-out targets."""
+    return _span(chunk.edge_idx.numpy()), _span(np.unique(chunk.fan_targets.numpy()))
+
+
+def _span(rows: np.ndarray) -> Tuple[int, int]:
+    """[lo, hi) covering `rows`, or empty when they are too scattered for a readahead to pay off."""
+    if rows.size == 0:
+        return (0, 0)
+    lo, hi = int(rows.min()), int(rows.max()) + 1
+    return (lo, hi) if hi - lo <= 4 * rows.size + 64 else (0, 0)
+
+
+class MappedBackend(NumpyBackend):
+    """
+    Out-of-core variant of `NumpyBackend` for `MemoryLayout(storage="mmap")`, where `counts`
+    and `counts_next` are memory-mapped files. Each chunk (bounded by `chunk_rows`) reads just
+    its own rows into memory; while it computes, the OS is already reading the next chunk's rows
+    and fan-out targets (`madvise`). Locality-ordered edges (`reorder=`) keep those reads
+    sequential. A chunk's gather indices and masks are built when its turn comes and dropped
+    right after, so only one chunk's worth is ever resident. Instead of zeroing the whole buffer
+    after every layer, only the row ranges the layer wrote are cleared; the state is assumed
+    dirty everywhere once per step, since it may have been written between steps.
+    """
+
+    name = "mmap"
+    chunk_type = _MappedChunk
+
+    def __init__(self, sim: Any):
+        super().__init__(sim)
+        self._dirty: Dict[int, List[Tuple[int, int]]] = {}  # buffer data_ptr -> written row ranges
+        self._step: Optional[int] = None
+
+    def _buffer(self, tensor: torch.Tensor) -> Any:
+        return next(mapped for mapped in self.sim._mapped if mapped.tensor.data_ptr() == tensor.data_ptr())
+
+    def apply_layer(self, layer_idx: int, chunks: Sequence[Any]) -> None:
+        sim = self.sim
+        cell = sim.num_channels * sim.bins
+        counts = sim.counts.numpy().reshape(-1, cell)
+        counts_next = sim.counts_next.numpy().reshape(-1, cell)
+        if self._step != sim.step_count:
+            self._dirty[sim.counts.data_ptr()] = [(0, sim.num_edges)]
+            self._step = sim.step_count
+        written = self._dirty.setdefault(sim.counts_next.data_ptr(), [])
+        source, target = self._buffer(sim.counts), self._buffer(sim.counts_next)
+        if chunks:
+            source.prefetch(*_spans(chunks[0])[0])
+        for position, plan in enumerate(chunks):
+            if position + 1 < len(chunks):
+                rows, targets = _spans(chunks[position + 1])
+                source.prefetch(*rows)
+                target.prefetch(*targets)
+            chunk = _MappedChunk(sim, plan)  # not cached: each is as large as the rows it stages
+            with sim._phase("propagate"):
+                staged = counts[chunk.rows].reshape(-1)
+                allowed = staged[chunk.source] * chunk.mask  # [R, C*k]
+                if chunk.fan_rows.size:
+                    counts_next[chunk.targets] += np.add.reduceat(allowed[chunk.fan_rows], chunk.starts, axis=0)
+                    written.append((int(chunk.targets[0]), int(chunk.targets[-1]) + 1))
+                sim._count("nodes_touched", len(chunk.nodes))
+                sim._count("edges_written", int(chunk.fan_rows.size))
+            if sim.coupling_rules:
+                # emissions go to out-edges of the chunk's nodes, all of them fan-out targets
+                self._couple(chunk, allowed)
+
+    def clear_next(self) -> None:
+        buffer = self.sim.counts_next
+        ranges = sorted(self._dirty.get(buffer.data_ptr(), [(0, self.sim.num_edges)]))
+        view = buffer.numpy()
+        end = -1
+        for lo, hi in ranges:
+            if hi <= end:
+                continue
+            lo = max(lo, end)
+            view[lo:hi] = 0
+            end = hi
+        self._dirty[buffer.data_ptr()] = []
+
+
+BACKENDS = {"torch": TorchBackend, "numpy": NumpyBackend, "mmap": MappedBackend}
+
+
+def resolve_backend(
+    name: str,
+    device: Optional[torch.device | str],
+    cells: int,
+    storage: str = "memory",
+    state: str = "edges",
+) -> Tuple[str, Optional[torch.device]]:
+    """
+    Concrete backend name (and device) for a requested `backend`; "auto" picks NumPy for small
+    CPU runs. Memory-mapped storage always runs the "mmap" backend on the CPU, and node-inbox
+    state the "torch" backend.
+    """
+    device = torch.device(device) if device is not None else None
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"E_BACKEND_UNKNOWN: {name}")
+    if state not in ("edges", "inbox"):
+        raise ValueError(f"E_BACKEND_STATE: {state}")
+    if state == "inbox":
+        if storage != "memory" or name not in ("auto", "torch"):
+            raise ValueError(f"E_BACKEND_STATE: node-inbox state runs the torch backend in memory, not {name}")
+        return "torch", device
+    if storage == "mmap" or name == "mmap":
+        if storage != "mmap":
+            raise ValueError("E_BACKEND_STORAGE: the mmap backend needs a layout with storage='mmap'")
+        if name not in ("auto", "mmap"):
+            raise ValueError(f"E_BACKEND_STORAGE: memory-mapped counts run the mmap backend, not {name}")
+        if device is not None and device.type != "cpu":
+            raise ValueError(f"E_BACKEND_DEVICE: memory-mapped counts need a CPU device, got {device}")
+        return "mmap", torch.device("cpu")
+    if name == "numpy":
+        if device is not None and device.type != "cpu":
+            raise ValueError(f"E_BACKEND_DEVICE: the numpy backend needs a CPU device, got {device}")
+        return name, torch.device("cpu")
+    if name == "auto":
+        if (device is None or device.type == "cpu") and cells <= NUMPY_AUTO_CELLS:
+            return "numpy", torch.device("cpu")
+        return "torch", device
+    return name, device
@@ -0,0 +1,436 @@
+"""
+Scaling benchmarks over synthetic scenario families, with JSON output and
+baseline comparison:
+
+    python -m irrepnet.bench --scale small --out out/bench.json
+    python -m irrepnet.bench --baseline out/baseline.json --tolerance 0.25
+
+Generated scenarios have a stationary total count after the first step (rings,
+phase-split lattice masks) so timings are not skewed by growing integers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import torch
+import yaml
+
+from .loader import parse_scenario
+from .sim import IRREPnetSim, select_device
+
+
+@dataclass
+class BenchCase:
+    name: str
+    family: str
+    params: Dict[str, int]
+    raw: Dict[str, Any] = field(repr=False)
+
+
+# --------------------------------------------------------------------------- #
+# Scenario families
+
+
+def _channels(count: int) -> List[Dict[str, Any]]:
+    return [{"name": f"ch{idx}", "charge": 1} for idx in range(count)]
+
+
+def _scenario(
+    *,
+    k: int,
+    channels: List[Dict[str, Any]],
+    nodes: List[Dict[str, Any]],
+    directed: List[Dict[str, Any]],
+    mask: Callable[[Dict[str, Any], int], List[int]],
+    counts_init: List[Dict[str, Any]],
+    outputs: List[Dict[str, Any]],
+    rules: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    edges = [{"id": entry["id"], "u": entry["src"], "v": entry["dst"]} for entry in directed]
+    for entry in directed:
+        entry["edge_ref"] = entry["id"]
+    fusion_mask = [[mask(entry, c_idx) for c_idx in range(len(channels))] for entry in directed]
+    return {
+        "irrepnet_dm": "0.2",
+        "phase_group": {"kind": "Zk", "k": k},
+        "channels": channels,
+        "nodes": nodes,
+        "edges": edges,
+        "directed_edges": directed,
+        "fusion_mask": fusion_mask,
+        "counts_init": counts_init,
+        "dag": {"layers": [{"edges": [entry["id"] for entry in directed]}]},
+        "measurement": {"outputs": outputs},
+        "coupling_rules": rules or [],
+    }
+
+
+def corridor_scenario(length: int, k: int = 8, channels: int = 1) -> Dict[str, Any]:
+    """Ring corridor: forward edges pass everything, reverse edges are masked off."""
+    nodes = [{"id": idx, "gauge_phase": idx % k} for idx in range(length)]
+    directed: List[Dict[str, Any]] = []
+    for idx in range(length):
+        directed.append({"id": 2 * idx, "src": idx, "dst": (idx + 1) % length})
+        directed.append({"id": 2 * idx + 1, "src": (idx + 1) % length, "dst": idx})
+    chans = _channels(channels)
+    return _scenario(
+        k=k,
+        channels=chans,
+        nodes=nodes,
+        directed=directed,
+        mask=lambda entry, _c: [1 if entry["id"] % 2 == 0 else 0] * k,
+        counts_init=[{"edge": 0, "channel": ch["name"], "phase": 0, "value": 1000} for ch in chans],
+        outputs=[{"name": "end", "readout_edges": [2 * (length - 1)]}],
+    )
+
+
+def lattice_scenario(side: int, k: int = 8, channels: int = 1) -> Dict[str, Any]:
+    """side x side torus; right edges pass phases [0, k/2), down edges [k/2, k) after a +1 offset."""
+    nodes = [{"id": idx} for idx in range(side * side)]
+    directed: List[Dict[str, Any]] = []
+    for row in range(side):
+        for col in range(side):
+            node = row * side + col
+            right = row * side + (col + 1) % side
+            down = ((row + 1) % side) * side + col
+            directed.append({"id": len(directed), "src": node, "dst": right, "phase_offset": 1, "dir": "right"})
+            directed.append({"id": len(directed), "src": node, "dst": down, "phase_offset": 1, "dir": "down"})
+    half = k // 2
+
+    def mask(entry: Dict[str, Any], _c: int) -> List[int]:
+        if entry["dir"] == "right":
+            return [1 if phase < half else 0 for phase in range(k)]
+        return [1 if phase >= half else 0 for phase in range(k)]
+
+    chans = _channels(channels)
+    return _scenario(
+        k=k,
+        channels=chans,
+        nodes=nodes,
+        directed=directed,
+        mask=mask,
+        counts_init=[{"edge": 0, "channel": ch["name"], "phase": 0, "value": 1000} for ch in chans],
+        outputs=[{"name": "origin", "readout_edges": [0, 1]}],
+    )
+
+
+def scatter_zone_scenario(length: int, k: int = 8, channels: int = 1) -> Dict[str, Any]:
+    """Ring where every node is a scatter zone emitting gamma onto a dead-end spur each step."""
+    nodes = [{"id": idx, "tags": ["scatter_zone"]} for idx in range(length)]
+    nodes += [{"id": length + idx} for idx in range(length)]
+    directed: List[Dict[str, Any]] = []
+    for idx in range(length):
+        directed.append({"id": 2 * idx, "src": idx, "dst": (idx + 1) % length})
+        directed.append({"id": 2 * idx + 1, "src": idx, "dst": length + idx, "tags": ["gamma_line"]})
+    chans = _channels(channels) + [{"name": "gamma", "charge": 0, "neutral": True}]
+    rules = [
+        {
+            "name": f"brems_{ch['name']}",
+            "scope": {"nodes_any": ["scatter_zone"], "out_edges_any": ["gamma_line"]},
+            "in": [{"ch": ch["name"], "min": 1}],
+            "out": [{"ch": ch["name"], "add": 1}, {"ch": "gamma", "add": 1}],
+            "phase": {"gamma": "delta", ch["name"]: "inherit"},
+        }
+        for ch in chans[:-1]
+    ]
+    return _scenario(
+        k=k,
+        channels=chans,
+        nodes=nodes,
+        directed=directed,
+        mask=lambda entry, c_idx: [1 if entry["id"] % 2 == 0 and c_idx < channels else 0] * k,
+        counts_init=[
+            {"edge": 2 * idx, "channel": ch["name"], "phase": idx % k, "value": 10}
+            for idx in range(length)
+            for ch in chans[:-1]
+        ],
+        outputs=[{"name": "gamma_0", "readout_edges": [1], "channels": ["gamma"]}],
+        rules=rules,
+    )
+
+
+def detector_scenario(readouts: int, k: int = 8, channels: int = 1) -> Dict[str, Any]:
+    """Ring corridor with one readout per forward edge."""
+    raw = corridor_scenario(readouts, k=k, channels=channels)
+    raw["measurement"]["outputs"] = [
+        {"name": f"det_{idx}", "readout_edges": [2 * idx]} for idx in range(readouts)
+    ]
+    return raw
+
+
+FAMILIES: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "corridor": corridor_scenario,
+    "lattice": lattice_scenario,
+    "scatter": scatter_zone_scenario,
+    "detectors": detector_scenario,
+}
+
+SCALES: Dict[str, Dict[str, Sequence[int]]] = {
+    "tiny": {"corridor": [8], "lattice": [3], "scatter": [4], "detectors": [8], "k": [8], "channels": [1]},
+    "small": {
+        "corridor": [64, 256],
+        "lattice": [8, 16],
+        "scatter": [16, 64],
+        "detectors": [32, 128],
+        "k": [8, 64],
+        "channels": [1, 4],
+    },
+    "medium": {
+        "corridor": [1024, 4096],
+        "lattice": [32, 64],
+        "scatter": [128, 512],
+        "detectors": [256, 1024],
+        "k": [8, 64],
+        "channels": [1, 4],
+    },
+}
+
+
+def default_suite(scale: str = "small", families: Optional[Sequence[str]] = None) -> List[BenchCase]:
+    if scale not in SCALES:
+        raise ValueError(f"E_BENCH_SCALE_UNKNOWN: {scale}")
+    sizes = SCALES[scale]
+    cases: List[BenchCase] = []
+    for family in families or FAMILIES:
+        for size in sizes[family]:
+            for k in sizes["k"]:
+                for channels in sizes["channels"]:
+                    name = f"{family}-n{size}-k{k}-c{channels}"
+                    params = {"size": size, "k": k, "channels": channels}
+                    cases.append(BenchCase(name, family, params, FAMILIES[family](size, k=k, channels=channels)))
+    return cases
+
+
+# --------------------------------------------------------------------------- #
+# Measurement
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    elif device.type == "mps":
+        torch.mps.synchronize()
+
+
+def _tensor_bytes(sim: IRREPnetSim) -> int:
+    return sum(value.nbytes for value in vars(sim).values() if isinstance(value, torch.Tensor))
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def _step_ms(sim: IRREPnetSim, warmup: int, steps: int) -> float:
+    for _ in range(warmup):
+        sim.step()
+    _synchronize(sim.device)
+    start = time.perf_counter()
+    for _ in range(steps):
+        sim.step()
+    _synchronize(sim.device)
+    return (time.perf_counter() - start) * 1000.0 / max(1, steps)
+
+
+def run_case(
+    case: BenchCase,
+    device: torch.device,
+    warmup: int = 3,
+    steps: int = 20,
+    reorder: Optional[str] = None,
+    backend: str = "auto",
+) -> Dict[str, Any]:
+    """
+    Time one case. `peak_rss_bytes` is left empty: the RSS high-water mark covers the whole
+    process, so only `run_suite(isolate=True)`, which runs each case in a fresh one, fills it in
+    (with `base_rss_bytes`, the mark before the case started).
+    """
+    text = yaml.safe_dump(case.raw, sort_keys=False)
+    start = time.perf_counter()
+    scenario = parse_scenario(yaml.safe_load(text), reorder=reorder)
+    load_ms = (time.perf_counter() - start) * 1000.0
+
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats()
+    start = time.perf_counter()
+    sim = IRREPnetSim(scenario, device=device, backend=backend)
+    _synchronize(device)
+    build_ms = (time.perf_counter() - start) * 1000.0
+
+    step_ms = _step_ms(sim, warmup, steps)
+
+    start = time.perf_counter()
+    sim.measure()
+    measure_ms = (time.perf_counter() - start) * 1000.0
+
+    coupling_ms = 0.0
+    if scenario.coupling_rules:
+        uncoupled = IRREPnetSim(scenario, device=device, backend=sim.backend)
+        uncoupled.coupling_rules = []
+        coupling_ms = max(0.0, step_ms - _step_ms(uncoupled, warmup, steps))
+
+    return {
+        "name": case.name,
+        "family": case.family,
+        "params": case.params,
+        "backend": sim.backend,
+        "edges": sim.num_edges,
+        "nodes": sim.num_nodes,
+        "load_ms": load_ms,
+        "build_ms": build_ms,
+        "step_ms": step_ms,
+        "steps_per_s": 1000.0 / step_ms if step_ms > 0 else float("inf"),
+        "coupling_ms": coupling_ms,
+        "measure_ms": measure_ms,
+        "tensor_bytes": _tensor_bytes(sim),
+        "estimated_peak_bytes": IRREPnetSim.estimate_memory(scenario).total_bytes,
+        "peak_device_bytes": torch.cuda.max_memory_allocated() if device.type == "cuda" else None,
+        "base_rss_bytes": None,
+        "peak_rss_bytes": None,
+    }
+
+
+def _run_fresh(case: BenchCase, **kwargs: Any) -> Dict[str, Any]:
+    """`run_case` as the only work of a fresh process, whose RSS high-water mark is then the case's own."""
+    base = _peak_rss_bytes()  # interpreter, torch and irrepnet imports
+    result = run_case(case, **kwargs)
+    result["base_rss_bytes"], result["peak_rss_bytes"] = base, _peak_rss_bytes()
+    return result
+
+
+def run_suite(
+    cases: Sequence[BenchCase],
+    device: Optional[torch.device] = None,
+    warmup: int = 3,
+    steps: int = 20,
+    reorder: Optional[str] = None,
+    backend: str = "auto",
+    isolate: bool = True,
+) -> Dict[str, Any]:
+    """
+    Run `cases` one after another. With `isolate`, each runs in a fresh (spawned) process so it
+    also gets a `peak_rss_bytes`.
+    """
+    device = select_device(device)
+    options = dict(device=device, warmup=warmup, steps=steps, reorder=reorder, backend=backend)
+    if isolate:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+            results = list(pool.map(functools.partial(_run_fresh, **options), cases))
+    else:
+        results = [run_case(case, **options) for case in cases]
+    return {
+        "meta": {
+            "device": str(device),
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "warmup": warmup,
+            "steps": steps,
+            "reorder": reorder,
+            "backend": backend,
+            "isolate": isolate,
+        },
+        "results": results,
+    }
+
+
+# Metrics where larger is worse; steps_per_s is derived from step_ms.
+REGRESSION_METRICS = ("load_ms", "build_ms", "step_ms", "coupling_ms", "measure_ms", "tensor_bytes")
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.25,
+    metrics: Sequence[str] = REGRESSION_METRICS,
+    floor_ms: float = 0.05,
+) -> List[str]:
+    """
+    Return one message per metric that is worse than `baseline * (1 + tolerance)`, and one per
+    case that ran on a different backend than in the baseline (its timings are not comparable).
+    """
+    previous = {entry["name"]: entry for entry in baseline.get("results", [])}
+    regressions: List[str] = []
+    for entry in current.get("results", []):
+        base = previous.get(entry["name"])
+        if base is None:
+            continue
+        if entry.get("backend", base.get("backend")) != base.get("backend", entry.get("backend")):
+            regressions.append(f"{entry['name']}: ran on {entry['backend']}, baseline on {base['backend']}")
+            continue
+        for metric in metrics:
+            now, before = entry.get(metric), base.get(metric)
+            if now is None or before is None:
+                continue
+            limit = before * (1.0 + tolerance)
+            if metric.endswith("_ms"):
+                limit = max(limit, floor_ms)
+            if now > limit:
+                regressions.append(f"{entry['name']}: {metric} {now:.4g} > {limit:.4g} (baseline {before:.4g})")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark IRREPnetSim over synthetic scenario families.")
+    parser.add_argument("--scale", default="small", choices=sorted(SCALES), help="Size preset (default: small)")
+    parser.add_argument("--family", action="append", choices=sorted(FAMILIES), help="Restrict to a family")
+    parser.add_argument("--device", default=None, choices=["cpu", "cuda", "mps"], help="Force device")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed steps per case")
+    parser.add_argument("--steps", type=int, default=20, help="Timed steps per case")
+    parser.add_argument("--reorder", default=None, choices=["rcm", "bfs"], help="Renumber nodes/edges at load")
+    parser.add_argument("--backend", default="auto", choices=["auto", "torch", "numpy"], help="Layer kernels")
+    parser.add_argument(
+        "--in-process", action="store_true", help="Run all cases in this process (no per-case peak RSS)"
+    )
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    device = torch.device(args.device) if args.device else None
+    report = run_suite(
+        default_suite(args.scale, args.family),
+        device,
+        warmup=args.warmup,
+        steps=args.steps,
+        reorder=args.reorder,
+        backend=args.backend,
+        isolate=not args.in_process,
+    )
+
+    for entry in report["results"]:
+        print(
+            f"{entry['name']:32s} {entry['backend']:5s} E={entry['edges']:6d}  load {entry['load_ms']:8.2f} ms  "
+            f"build {entry['build_ms']:8.2f} ms  step {entry['step_ms']:8.3f} ms  "
+            f"measure {entry['measure_ms']:7.3f} ms"
+        )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare(report, baseline, tolerance=args.tolerance)
+        for message in regressions:
+            print(f"[regression] {message}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
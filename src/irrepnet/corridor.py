@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import torch
+
+from .loader import CountInitEntry, DirectedEdge, MeasurementReadout, Scenario, load_scenario
+from .sim import IRREPnetSim
+
+
+@dataclass(frozen=True)
+class Corridor:
+    """
+    A pass-through chain v_0 -e_1-> v_1 ... -e_m-> v_m collapsed into one compound edge.
+    Position j (0..m-1) is edge e_{j+1}; a count there has been read by e_1..e_j.
+    """
+
+    edge: int  # compound edge index in the collapsed scenario (keeps the ID and tags of e_1)
+    edge_ids: Tuple[int, ...]  # e_1..e_m
+    node_ids: Tuple[int, ...]  # v_0..v_m (v_m == v_0 for a closed ring)
+    gauges: Tuple[int, ...]  # v_0..v_m when collapsed; only the end nodes can change later
+    offsets: Tuple[int, ...]  # e_1..e_m
+    passes: Tuple[Tuple[bool, ...], ...]  # [position][channel]: survived the masks of e_1..e_j
+    spurs: Tuple[Tuple[int, int], ...]  # (edge ID, j): dead out-edge of v_j, a copy of position j
+    stubs: Tuple[Tuple[int, int], ...]  # (edge ID, gauge of v_j): dead edge from a kept node into v_j
+    counts_init: Tuple[CountInitEntry, ...]  # start counts on the chain, `edge` = position
+
+    @property
+    def delay(self) -> int:
+        """Layer applications spent inside the corridor beyond one hop."""
+        return len(self.edge_ids) - 1
+
+
+def _uniform(mask: Sequence[Sequence[int]]) -> bool:
+    return all(all(row) or not any(row) for row in mask)
+
+
+def _dead(mask: Sequence[Sequence[int]]) -> bool:
+    return not any(any(row) for row in mask)
+
+
+def find_corridors(scenario: Scenario) -> List[Tuple[List[int], List[int]]]:
+    """
+    Collapsible chains as (edge indices e_1..e_m, node indices v_0..v_m).
+
+    An interior node has exactly one live in-edge and one live out-edge (a dead edge has an
+    all-zero mask, so it never carries anything on), and no coupling rule applies there. Both of
+    its live edges run in every non-empty layer, so counts advance one edge per layer
+    application, and carry no readout. Its in-edge's mask passes or blocks each channel
+    outright, so the mask commutes with the phase shifts. Its dead out-edges carry no readout
+    or start counts, and start counts on its out-edge are in channels the chain so far passes.
+    A ring made only of such nodes is broken at its first node.
+    """
+    directed = scenario.directed_edges
+    layers = [set(layer) for layer in scenario.layers if layer]
+    scheduled: Set[int] = set.intersection(*layers) if layers else set()
+    readout_edges = {edge for readout in scenario.measurement for edge in readout.edges}
+    init_edges = {entry.edge for entry in scenario.counts_init}
+    live_in: List[List[int]] = [[] for _ in range(scenario.node_count)]
+    live_out: List[List[int]] = [[] for _ in range(scenario.node_count)]
+    dead_out: List[List[int]] = [[] for _ in range(scenario.node_count)]
+    for edge_idx, edge in enumerate(directed):
+        if _dead(scenario.fusion_mask[edge_idx]):
+            dead_out[edge.src].append(edge_idx)
+        else:
+            live_in[edge.dst].append(edge_idx)
+            live_out[edge.src].append(edge_idx)
+
+    def ruled(node: int) -> bool:
+        tags = set(scenario.node_tags[node])
+        rules = scenario.coupling_rules
+        return any(not rule.node_tags_any or not tags.isdisjoint(rule.node_tags_any) for rule in rules)
+
+    def interior(node: int) -> bool:
+        if len(live_in[node]) != 1 or len(live_out[node]) != 1 or ruled(node):
+            return False
+        e_in, e_out = live_in[node][0], live_out[node][0]
+        return (
+            e_in != e_out
+            and {e_in, e_out} <= scheduled
+            and not {e_in, e_out} & readout_edges
+            and _uniform(scenario.fusion_mask[e_in])
+            and not any(spur in readout_edges or spur in init_edges for spur in dead_out[node])
+        )
+
+    inner = {node for node in range(scenario.node_count) if interior(node)}
+    init_channels: Dict[int, Set[int]] = {}
+    for entry in scenario.counts_init:
+        init_channels.setdefault(entry.edge, set()).add(entry.channel)
+
+    def chains_through(inner: Set[int]) -> Tuple[List[Tuple[List[int], List[int]]], Set[int]]:
+        chains: List[Tuple[List[int], List[int]]] = []
+        covered: Set[int] = set()
+        blocked: Set[int] = set()  # nodes whose out-edge starts counts in a channel the chain already blocks
+
+        def follow(start: int, stop: int) -> None:
+            edges, nodes = [start], [directed[start].src, directed[start].dst]
+            passing = set(range(len(scenario.channels)))
+            while nodes[-1] in inner and nodes[-1] != stop:
+                covered.add(nodes[-1])
+                passing &= {c for c, row in enumerate(scenario.fusion_mask[edges[-1]]) if row[0]}
+                edges.append(live_out[nodes[-1]][0])
+                if init_channels.get(edges[-1], set()) - passing:
+                    blocked.add(nodes[-1])
+                nodes.append(directed[edges[-1]].dst)
+            chains.append((edges, nodes))
+
+        for edge_idx, edge in enumerate(directed):
+            if edge.dst in inner and edge.src not in inner and not _dead(scenario.fusion_mask[edge_idx]):
+                follow(edge_idx, -1)
+        for node in sorted(inner - covered):
+            if node not in covered:
+                inner.discard(node)  # the ring's end node
+                covered.add(node)
+                follow(live_out[node][0], node)
+        return chains, blocked
+
+    while True:
+        chains, blocked = chains_through(set(inner))
+        if not blocked:
+            return chains
+        inner -= blocked
+
+
+def collapse_corridors(scenario: Scenario) -> Tuple[Scenario, List[Corridor]]:
+    """
+    `scenario` with every chain from `find_corridors` replaced by one compound edge at e_1's
+    place. The compound edge runs v_0 -> v_m with the summed offset (the gauges of interior
+    nodes telescope away) and e_m's mask, with any channel an inner mask blocks cleared.
+    Interior nodes, e_2..e_m and the dead out-edges of interior nodes are dropped; a dead edge
+    from a kept node into an interior node becomes a self-loop (a "stub"; `CorridorSim` keeps
+    its emission shift). Start counts on the chain move
+    to the `Corridor` records, which `CorridorSim` keeps in its delay lines.
+    """
+    chains = find_corridors(scenario)
+    directed = scenario.directed_edges
+    channels = len(scenario.channels)
+    dropped_nodes = {node for _, nodes in chains for node in nodes[1:-1]}
+    dropped_edges = {edge for edges, _ in chains for edge in edges[1:]}
+    for node in dropped_nodes:
+        for edge_idx, edge in enumerate(directed):
+            if edge.src == node and _dead(scenario.fusion_mask[edge_idx]):
+                dropped_edges.add(edge_idx)
+    kept_nodes = [node for node in range(scenario.node_count) if node not in dropped_nodes]
+    node_map = {node: new for new, node in enumerate(kept_nodes)}
+    kept_edges = [edge for edge in range(len(directed)) if edge not in dropped_edges]
+    edge_map = {edge: new for new, edge in enumerate(kept_edges)}
+    chain_of = {edges[0]: (edges, nodes) for edges, nodes in chains}
+
+    new_edges: List[DirectedEdge] = []
+    fusion_mask: List[List[List[int]]] = []
+    corridors: List[Corridor] = []
+    for edge_idx in kept_edges:
+        edge = directed[edge_idx]
+        mask = [list(row) for row in scenario.fusion_mask[edge_idx]]
+        if edge_idx in chain_of:
+            edges, nodes = chain_of[edge_idx]
+            passes = [tuple([True] * channels)]
+            for inner in edges[:-1]:
+                passes.append(tuple(p and bool(scenario.fusion_mask[inner][c][0]) for c, p in enumerate(passes[-1])))
+            last = scenario.fusion_mask[edges[-1]]
+            mask = [list(last[c]) if passes[-1][c] else [0] * scenario.k for c in range(channels)]
+            offset = sum(directed[e].phase_offset for e in edges) % scenario.k
+            new_edges.append(replace(edge, dst=node_map[nodes[-1]], src=node_map[nodes[0]], phase_offset=offset))
+            position = {e: j for j, e in enumerate(edges)}
+            inside = {node: j for j, node in enumerate(nodes[1:-1], start=1)}
+            spurs = tuple(
+                (other.id, inside[other.src]) for e, other in enumerate(directed)
+                if other.src in inside and _dead(scenario.fusion_mask[e])
+            )
+            stubs = tuple(
+                (other.id, scenario.node_gauge[other.dst]) for e, other in enumerate(directed)
+                if other.dst in inside and other.src not in dropped_nodes and _dead(scenario.fusion_mask[e])
+            )
+            corridors.append(
+                Corridor(
+                    edge=len(new_edges) - 1,
+                    edge_ids=tuple(directed[e].id for e in edges),
+                    node_ids=tuple(scenario.node_ids[node] for node in nodes),
+                    gauges=tuple(scenario.node_gauge[node] for node in nodes),
+                    offsets=tuple(directed[e].phase_offset for e in edges),
+                    passes=tuple(passes),
+                    spurs=spurs,
+                    stubs=stubs,
+                    counts_init=tuple(
+                        replace(entry, edge=position[entry.edge]) for entry in scenario.counts_init
+                        if entry.edge in position
+                    ),
+                )
+            )
+        else:
+            dst = edge.src if edge.dst in dropped_nodes else edge.dst  # only dead edges get here
+            new_edges.append(replace(edge, src=node_map[edge.src], dst=node_map[dst]))
+        fusion_mask.append(mask)
+
+    order = sorted(range(len(kept_edges)), key=lambda new: scenario.edge_order[kept_edges[new]])
+    edge_order = [0] * len(kept_edges)
+    for rank, new in enumerate(order):
+        edge_order[new] = rank
+    node_ids = [scenario.node_ids[node] for node in kept_nodes]
+    coarse = replace(
+        scenario,
+        node_count=len(kept_nodes),
+        node_gauge=[scenario.node_gauge[node] for node in kept_nodes],
+        node_tags=[scenario.node_tags[node] for node in kept_nodes],
+        directed_edges=new_edges,
+        edge_index_by_id={edge.id: idx for idx, edge in enumerate(new_edges)},
+        fusion_mask=fusion_mask,
+        counts_init=[
+            replace(entry, edge=edge_map[entry.edge]) for entry in scenario.counts_init
+            if entry.edge in edge_map and entry.edge not in chain_of
+        ],
+        layers=[[edge_map[e] for e in layer if e in edge_map] for layer in scenario.layers],
+        measurement=[
+            MeasurementReadout(name=r.name, edges=tuple(edge_map[e] for e in r.edges), channels=r.channels)
+            for r in scenario.measurement
+        ],
+        node_ids=node_ids,
+        node_index_by_id={node_id: idx for idx, node_id in enumerate(node_ids)},
+        edge_order=edge_order,
+    )
+    return coarse, corridors
+
+
+class CorridorSim(IRREPnetSim):
+    """
+    Steps the collapsed graph of `collapse_corridors`, so the work per layer application scales
+    with the junctions rather than the corridor lengths.
+
+    Each compound edge has a delay line: a ring of `delay` [C, k] rows holding what entered the
+    corridor in the last `delay` applications, unshifted. After every application the compound
+    edge's fresh row goes into the ring, and the row that entered `delay` applications earlier
+    takes its place. The next application reads that row with the whole corridor's shift. Rows
+    already past e_1 are re-phased when the entry node's gauge changes, so end-node gauges stay
+    mutable. `edge_counts` / `original_counts` rebuild any original edge's row.
+    Collapsed edges and nodes cannot be mutated (`E_CORRIDOR_COLLAPSED`). The sim runs at the
+    declared k; pruning, gauge sweeps, responses and the stability tools would only see the
+    collapsed graph, so they raise `E_CORRIDOR_UNSUPPORTED`.
+    """
+
+    def __init__(
+        self,
+        scenario: str | Scenario,
+        device: torch.device | None = None,
+        *,
+        count_dtype: torch.dtype = torch.int32,
+        backend: str = "auto",
+    ):
+        self.original = load_scenario(scenario) if isinstance(scenario, str) else scenario
+        coarse, self.corridors = collapse_corridors(self.original)
+        self._positions: Dict[int, Tuple[int, int]] = {}  # original edge ID -> (corridor, position)
+        self._spurs: Dict[int, Tuple[int, int]] = {}
+        for index, corridor in enumerate(self.corridors):
+            for position, edge_id in enumerate(corridor.edge_ids):
+                self._positions[edge_id] = (index, position)
+            for edge_id, position in corridor.spurs:
+                self._spurs[edge_id] = (index, position)
+        self._collapsed_nodes = {node_id for corridor in self.corridors for node_id in corridor.node_ids[1:-1]}
+        self._compound = {corridor.edge: index for index, corridor in enumerate(self.corridors)}
+        self._stubs = {
+            coarse.edge_index_by_id[edge_id]: gauge for corridor in self.corridors for edge_id, gauge in corridor.stubs
+        }
+        super().__init__(coarse, device, count_dtype=count_dtype, backend=backend, reduce_phases=False)
+
+    def _build(self) -> None:
+        super()._build()
+        lengths = [corridor.delay for corridor in self.corridors]
+        shape = (sum(lengths), self.num_channels, self.bins)
+        self._ring = torch.zeros(shape, dtype=self.count_dtype, device=self.device)
+        bases = [sum(lengths[:index]) for index in range(len(lengths))]
+        self._ring_base = torch.tensor(bases, dtype=torch.int64, device=self.device)
+        self._ring_len = torch.tensor(lengths, dtype=torch.int64, device=self.device)
+        self._compound_idx = torch.tensor(
+            [corridor.edge for corridor in self.corridors], dtype=torch.int64, device=self.device
+        )
+        self._aged = 0
+        for index, corridor in enumerate(self.corridors):
+            for entry in corridor.counts_init:
+                phase = (entry.phase - self._partial(index, entry.edge, entry.channel)) % self.k
+                self._row(index, entry.edge)[entry.channel, phase] += entry.value
+
+    def _slot(self, index: int, position: int) -> int:
+        """Ring row of corridor `index` holding position 0 <= `position` < delay."""
+        delay = self.corridors[index].delay
+        return int(self._ring_base[index]) + (self._aged - 1 - position) % delay
+
+    def _row(self, index: int, position: int) -> torch.Tensor:
+        """Unshifted row (a view) of a corridor position; the last one sits on the compound edge."""
+        corridor = self.corridors[index]
+        if position == corridor.delay:
+            return self.counts[corridor.edge]
+        return self._ring[self._slot(index, position)]
+
+    def _partial(self, index: int, position: int, channel: int) -> int:
+        """Phase shift of e_1..e_position, with the current entry-node gauge."""
+        corridor = self.corridors[index]
+        shift = sum(corridor.offsets[:position])
+        if not self.channels[channel].neutral and position:
+            entry = int(self.gauge[self.scenario.node_index_by_id[corridor.node_ids[0]]])
+            shift += entry - corridor.gauges[position]
+        return shift % self.k
+
+    # ------------------------------------------------------------------ #
+
+    def _step(self, schedule: Optional[Sequence[Sequence[Any]]]) -> None:
+        if schedule is not None:
+            self._unsupported("a pruned schedule")
+        super()._step(schedule)
+
+    def _advance(self) -> None:
+        super()._advance()
+        if not self.corridors:
+            return
+        slots = self._ring_base + self._aged % self._ring_len
+        fresh = self.counts.index_select(0, self._compound_idx)
+        self.counts.index_copy_(0, self._compound_idx, self._ring.index_select(0, slots))
+        self._ring.index_copy_(0, slots, fresh)
+        self._aged += 1
+
+    def _write_gauge(self, node: int, phase: int) -> None:
+        change = (phase - int(self.gauge[node])) % self.k
+        super()._write_gauge(node, phase)
+        if not change:
+            return
+        charged = (~self.channel_is_neutral).nonzero().flatten()
+        node_id = self.scenario.node_ids[node]
+        for index, corridor in enumerate(self.corridors):
+            if corridor.node_ids[0] != node_id:
+                continue
+            # rows already past e_1 took its shift with the old gauge; the compound read uses the new one
+            for position in range(1, corridor.delay + 1):
+                row = self._row(index, position)
+                row[charged] = torch.roll(row[charged], shifts=-change, dims=-1)
+
+    def _edge_channel_delta(self, channel: int, edge_idx: int) -> int:
+        index = self._compound.get(edge_idx)
+        if index is not None:
+            return self._partial(index, 1, channel)  # emissions land on e_1
+        if edge_idx in self._stubs and not self.channels[channel].neutral:
+            edge = self.scenario.directed_edges[edge_idx]
+            return (int(self.gauge[edge.src]) - self._stubs[edge_idx] + edge.phase_offset) % self.k
+        return super()._edge_channel_delta(channel, edge_idx)
+
+    # ------------------------------------------------------------------ #
+
+    def node_index(self, node_id: int) -> int:
+        if node_id in self._collapsed_nodes:
+            raise ValueError(f"E_CORRIDOR_COLLAPSED: node {node_id} is inside a corridor")
+        return super().node_index(node_id)
+
+    def edge_index(self, edge_id: int) -> int:
+        if edge_id in self._positions or edge_id in self._spurs:
+            raise ValueError(f"E_CORRIDOR_COLLAPSED: edge {edge_id} is part of a corridor")
+        return super().edge_index(edge_id)
+
+    def edge_counts(self, edge_id: int) -> torch.Tensor:
+        """[C, k] counts the uncollapsed sim would hold on original edge `edge_id`."""
+        located = self._positions.get(edge_id)
+        spur = self._spurs.get(edge_id)
+        if located is None and spur is not None:
+            if not self._aged:
+                return torch.zeros_like(self.counts[0])
+            located = spur
+        if located is None:
+            return self.counts[super().edge_index(edge_id)].clone()
+        index, position = located
+        corridor = self.corridors[index]
+        row = self._row(index, position).clone()
+        for channel in range(self.num_channels):
+            if corridor.passes[position][channel]:
+                row[channel] = torch.roll(row[channel], shifts=self._partial(index, position, channel), dims=0)
+            else:
+                row[channel] = 0
+        return row
+
+    def original_counts(self) -> torch.Tensor:
+        """What `export_counts()` of the uncollapsed scenario would return."""
+        edges = self.original.directed_edges
+        order = sorted(range(len(edges)), key=self.original.edge_order.__getitem__)
+        return torch.stack([self.edge_counts(edges[edge_idx].id) for edge_idx in order])
+
+    def _unsupported(self, what: str) -> None:
+        raise ValueError(f"E_CORRIDOR_UNSUPPORTED: {what} sees only the collapsed graph")
+
+    def light_cone(self, *args: Any, **kwargs: Any) -> Any:
+        self._unsupported("light_cone")
+
+    def gauge_response(self, *args: Any, **kwargs: Any) -> Any:
+        self._unsupported("gauge_response")
+
+    def response_library(self, *args: Any, **kwargs: Any) -> Any:
+        self._unsupported("response_library")
+
+    def adjoint(self, *args: Any, **kwargs: Any) -> Any:
+        self._unsupported("adjoint")
+
+    def run_until_stable(self, *args: Any, **kwargs: Any) -> Any:
+        self._unsupported("run_until_stable")
+
+    def jump_to(self, *args: Any, **kwargs: Any) -> Any:
+        self._unsupported("jump_to")
@@ -0,0 +1,534 @@
+"""
+Differential testing of alternative engines against the reference `IRREPnetSim` (torch backend,
+edge state, no reordering, declared k), whose Python-loop semantics are the spec:
+
+    python -m irrepnet difftest --candidate numpy --cases 200 --steps 4
+    python -m irrepnet difftest --candidate corridor --out failing.yaml
+
+Random scenarios are stepped in lockstep with the reference, comparing the exported counts after
+every layer application; the first failing scenario is shrunk to a small reproducer.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import copy
+import math
+import random
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import torch
+import yaml
+
+from .corridor import CorridorSim
+from .loader import Scenario, parse_scenario
+from .memory import MemoryLayout
+from .sim import IRREPnetSim
+
+CPU = torch.device("cpu")
+NODE_TAGS = ("hot", "cold")
+EDGE_TAGS = ("line", "side")
+MAX_OUT_DEGREE = 2
+
+Engine = Callable[[Scenario], IRREPnetSim]
+Edit = Callable[[Dict[str, Any]], Any]  # in-place change of a raw scenario (see `shrink`)
+
+REFERENCE: Engine = partial(IRREPnetSim, device=CPU, backend="torch", reduce_phases=False)
+CANDIDATES: Dict[str, Engine] = {
+    "numpy": partial(IRREPnetSim, device=CPU, backend="numpy"),
+    "reduced": partial(IRREPnetSim, device=CPU, backend="torch", reduce_phases=True),
+    "rcm": partial(IRREPnetSim, device=CPU, backend="torch", reorder="rcm"),
+    "chunked": partial(IRREPnetSim, device=CPU, backend="torch", layout=MemoryLayout(masks="compact", chunk_rows=2)),
+    "inbox": partial(IRREPnetSim, device=CPU, layout=MemoryLayout(state="inbox")),
+    "mmap": partial(IRREPnetSim, device=CPU, layout=MemoryLayout(storage="mmap", chunk_rows=2)),
+    "corridor": partial(CorridorSim, device=CPU),
+}
+
+
+@dataclass(frozen=True)
+class Divergence:
+    """
+    First disagreement with the reference. `layer` counts the non-empty layer applications of
+    `step` (None: the state before it); `edge` is a directed-edge ID and `channel` a name. A
+    readout mismatch sets `readout`; a candidate exception sets `error`, with `layer` the number
+    of applications it completed.
+    """
+
+    step: int
+    layer: Optional[int]
+    edge: Optional[int] = None
+    channel: Optional[str] = None
+    phase: Optional[int] = None
+    expected: Optional[float] = None
+    actual: Optional[float] = None
+    readout: Optional[str] = None
+    error: Optional[str] = None
+
+    def report(self) -> str:
+        where = f"step {self.step}" + (f" layer {self.layer}" if self.layer is not None else "")
+        if self.error is not None:
+            return f"{where}: candidate raised {self.error}"
+        if self.readout is not None:
+            return f"{where}: readout {self.readout} expected {self.expected} got {self.actual}"
+        if self.edge is None:
+            return f"{where}: {self.expected} layer applications expected, got {self.actual}"
+        return (
+            f"{where}: edge {self.edge} channel {self.channel} phase {self.phase} "
+            f"expected {self.expected} got {self.actual}"
+        )
+
+
+class ReferenceFailure(Exception):
+    """The reference raised on a scenario, which then tells nothing about the candidate."""
+
+
+# --------------------------------------------------------------------------- #
+# Random scenarios
+
+
+def random_scenario(
+    seed: int,
+    *,
+    max_nodes: int = 6,
+    max_channels: int = 3,
+    max_rules: int = 3,
+    ks: Sequence[int] = (2, 3, 4, 6, 8),
+) -> Dict[str, Any]:
+    """
+    A raw (YAML-shaped) scenario that passes the loader's validation: random multigraph with
+    self-loops, charges, neutral channels, masks, offsets, gauges, tags, layers, readouts and
+    coupling rules (every phase keyword the sim implements, probabilities, routes).
+    """
+    rng = random.Random(seed)
+    k = rng.choice(list(ks))
+    node_count = rng.randint(2, max_nodes)
+    channels = [
+        {"name": f"c{idx}", "charge": rng.randint(-2, 2), "neutral": rng.random() < 0.25}
+        for idx in range(rng.randint(1, max_channels))
+    ]
+    names = [channel["name"] for channel in channels]
+    nodes = [
+        {"id": node, "gauge_phase": rng.randrange(k), "tags": rng.sample(NODE_TAGS, rng.randint(0, 2))}
+        for node in range(node_count)
+    ]
+    # at most MAX_OUT_DEGREE out-edges per node (parallel edges and self-loops included) keeps the
+    # fan-out, and so the growth of the counts over a few steps, well inside int32
+    edge_count = rng.randint(node_count, MAX_OUT_DEGREE * node_count)
+    sources = rng.sample([node for node in range(node_count) for _ in range(MAX_OUT_DEGREE)], edge_count)
+    ids = rng.sample(range(4 * edge_count), edge_count)  # IDs unrelated to the load order
+    directed = [
+        {
+            "id": edge_id,
+            "src": src,
+            "dst": rng.randrange(node_count),
+            "edge_ref": edge_id,
+            "phase_offset": rng.randrange(k),
+            "tags": rng.sample(EDGE_TAGS, rng.randint(0, 1)),
+        }
+        for edge_id, src in zip(ids, sources)
+    ]
+
+    def mask_row() -> List[int]:
+        kind = rng.random()
+        if kind < 0.4:
+            return [1] * k
+        if kind < 0.5:
+            return [0] * k
+        return [int(rng.random() < 0.6) for _ in range(k)]
+
+    rules = [_random_rule(rng, idx, channels, k) for idx in range(rng.randint(0, max_rules))]
+    layers = [{"edges": rng.sample(ids, rng.randint(1, edge_count))} for _ in range(rng.randint(1, 3))]
+    outputs = []
+    for idx in range(rng.randint(1, 2)):
+        readout_edges = rng.sample(ids, rng.randint(1, min(3, edge_count)))
+        output: Dict[str, Any] = {"name": f"out{idx}", "readout_edges": readout_edges}
+        if rng.random() < 0.5:
+            output["channels"] = rng.sample(names, rng.randint(1, len(names)))
+        outputs.append(output)
+    return {
+        "irrepnet_dm": "0.2",
+        "phase_group": {"kind": "Zk", "k": k},
+        "seed": rng.randrange(2**32),
+        "channels": channels,
+        "nodes": nodes,
+        "edges": [{"id": entry["id"], "u": entry["src"], "v": entry["dst"]} for entry in directed],
+        "directed_edges": directed,
+        "fusion_mask": [[mask_row() for _ in channels] for _ in directed],
+        "counts_init": [
+            {"edge": edge_id, "channel": rng.choice(names), "phase": rng.randrange(k), "value": rng.randint(1, 3)}
+            for edge_id in rng.choices(ids, k=rng.randint(1, edge_count))
+        ],
+        "dag": {"layers": layers, "repeat": rng.randint(1, 2)},
+        "measurement": {"outputs": outputs},
+        "coupling_rules": rules,
+    }
+
+
+def _random_rule(rng: random.Random, index: int, channels: Sequence[Dict[str, Any]], k: int) -> Dict[str, Any]:
+    names = [channel["name"] for channel in channels]
+    inputs = rng.sample(names, rng.randint(1, min(2, len(names))))
+    outputs = rng.sample(names, rng.randint(1, min(2, len(names))))
+    phase: Dict[str, Any] = {}
+    for name in outputs:
+        choice = rng.random()
+        if choice < 0.35:
+            phase[name] = "delta"
+        elif choice < 0.6:
+            phase[name] = f"fixed:{rng.randrange(k)}"
+        elif choice < 0.85:
+            phase[name] = f"inherit_from:{rng.choice(inputs)}"
+        elif len(inputs) == 1:
+            phase[name] = "inherit"
+        # otherwise the loader's default: inherit from a same-channel input, else delta
+    rule: Dict[str, Any] = {
+        "name": f"rule{index}",
+        "in": [{"ch": name, "min": 1, "sum_over_phases": rng.random() < 0.3} for name in inputs],
+        "out": [{"ch": name, "add": rng.randint(0, 1)} for name in outputs],
+        "phase": phase,
+    }
+    scope: Dict[str, Any] = {}
+    if rng.random() < 0.5:
+        scope["nodes_any"] = rng.sample(NODE_TAGS, 1)
+    if rng.random() < 0.3:
+        scope["out_edges_any"] = rng.sample(EDGE_TAGS, 1)
+    if scope:
+        rule["scope"] = scope
+    charge = {channel["name"]: channel["charge"] for channel in channels}
+    balance = sum(charge[out["ch"]] * out["add"] for out in rule["out"]) - sum(charge[name] for name in inputs)
+    if balance:
+        rule["nonconservative"] = True
+    if rng.random() < 0.3:
+        rule["probability"] = rng.choice([0.25, 0.5, 0.75])
+    if rng.random() < 0.3:
+        rule["route"] = "random_one"
+    return rule
+
+
+# --------------------------------------------------------------------------- #
+# Lockstep comparison
+
+
+def _observe(sim: IRREPnetSim) -> torch.Tensor:
+    original = getattr(sim, "original_counts", None)  # engines that step a transformed graph
+    return (original() if original is not None else sim.export_counts()).cpu()
+
+
+def _record(sim: IRREPnetSim) -> List[torch.Tensor]:
+    """Snapshot the exported counts after every layer application of `sim`."""
+    snapshots: List[torch.Tensor] = []
+    advance = sim._advance
+
+    def recorded() -> None:
+        advance()
+        snapshots.append(_observe(sim))
+
+    sim._advance = recorded  # type: ignore[method-assign]
+    return snapshots
+
+
+def _first_difference(
+    scenario: Scenario, step: int, layer: Optional[int], expected: torch.Tensor, actual: torch.Tensor
+) -> Optional[Divergence]:
+    if torch.equal(expected, actual):
+        return None
+    position, channel, phase = (expected != actual).nonzero()[0].tolist()
+    edge = scenario.directed_edges[scenario.edge_order.index(position)]
+    return Divergence(
+        step=step,
+        layer=layer,
+        edge=edge.id,
+        channel=scenario.channels[channel].name,
+        phase=phase,
+        expected=int(expected[position, channel, phase]),
+        actual=int(actual[position, channel, phase]),
+    )
+
+
+def compare(
+    source: Dict[str, Any] | Scenario,
+    candidate: str | Engine,
+    steps: int = 4,
+    *,
+    reference: Engine = REFERENCE,
+) -> Optional[Divergence]:
+    """
+    Step the reference and `candidate` (a `CANDIDATES` name or a Scenario -> sim factory) side by
+    side for `steps` steps; None when counts and readouts agree throughout. Raises
+    `ReferenceFailure` when the reference itself raises.
+    """
+    engine = CANDIDATES[candidate] if isinstance(candidate, str) else candidate
+    scenario = parse_scenario(source) if isinstance(source, dict) else source
+    with _reference_errors():
+        expected_sim = reference(copy.deepcopy(scenario))
+    expected = _record(expected_sim)
+    try:  # a crashing candidate is a divergence too
+        actual_sim = engine(copy.deepcopy(scenario))
+        actual = _record(actual_sim)
+        initial = _observe(actual_sim)
+    except Exception as exc:
+        return Divergence(step=0, layer=None, error=_error(exc))
+    found = _first_difference(scenario, 0, None, _observe(expected_sim), initial)
+    if found is not None:
+        return found
+    for step in range(steps):
+        expected.clear()
+        actual.clear()
+        with _reference_errors():
+            expected_sim.step()
+        try:
+            actual_sim.step()
+        except Exception as exc:
+            return Divergence(step=step, layer=len(actual), error=_error(exc))
+        for layer, (want, got) in enumerate(zip(expected, actual)):
+            found = _first_difference(scenario, step, layer, want, got)
+            if found is not None:
+                return found
+        if len(expected) != len(actual):
+            return Divergence(step=step, layer=None, expected=len(expected), actual=len(actual))
+        with _reference_errors():
+            want_readouts = expected_sim.measure()
+        try:
+            got_readouts = actual_sim.measure()
+        except Exception as exc:
+            return Divergence(step=step, layer=None, error=_error(exc))
+        for name, value in want_readouts.items():
+            if not math.isclose(value, got_readouts.get(name, math.nan), rel_tol=1e-9, abs_tol=1e-9):
+                return Divergence(step=step, layer=None, readout=name, expected=value, actual=got_readouts.get(name))
+    return None
+
+
+def _error(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+@contextlib.contextmanager
+def _reference_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as exc:
+        raise ReferenceFailure(_error(exc)) from exc
+
+
+def fuzz(
+    candidate: str | Engine,
+    cases: int = 100,
+    steps: int = 4,
+    seed: int = 0,
+    skipped: Optional[List[int]] = None,
+    **generator: Any,
+) -> Optional[Tuple[Dict[str, Any], Divergence]]:
+    """
+    First random scenario (seeds `seed`, `seed + 1`, ...) on which `candidate` diverges. Seeds the
+    reference fails on are passed over and appended to `skipped`.
+    """
+    for case in range(seed, seed + cases):
+        raw = random_scenario(case, **generator)
+        try:
+            found = compare(raw, candidate, steps)
+        except ReferenceFailure:
+            if skipped is not None:
+                skipped.append(case)
+            continue
+        if found is not None:
+            return raw, found
+    return None
+
+
+# --------------------------------------------------------------------------- #
+# Shrinking
+
+
+def shrink(raw: Dict[str, Any], fails: Callable[[Dict[str, Any]], bool], max_attempts: int = 5000) -> Dict[str, Any]:
+    """
+    Greedily minimize a failing raw scenario: drop rules, layers, edges, nodes, channels, start
+    counts and readouts, then simplify what is left (k, gauges, offsets, masks, tags, rule
+    options), keeping each change for which `fails` still holds. Variants the loader or the
+    reference rejects count as passing.
+    """
+    current = copy.deepcopy(raw)
+    attempts, position, changed = 0, 0, False
+    while attempts < max_attempts:
+        edits = list(_reductions(current))
+        if position >= len(edits):
+            if not changed:
+                break
+            position, changed = 0, False
+            continue
+        smaller = _edited(current, edits[position])
+        if smaller != current:
+            attempts += 1
+            if _still_fails(fails, smaller):
+                current, changed = smaller, True
+                continue  # a dropped item's successor now sits at `position`
+        position += 1
+    return current
+
+
+def _still_fails(fails: Callable[[Dict[str, Any]], bool], raw: Dict[str, Any]) -> bool:
+    try:
+        parse_scenario(copy.deepcopy(raw))
+        return fails(raw)
+    except Exception:
+        return False
+
+
+def _reductions(raw: Dict[str, Any]) -> Iterator[Edit]:
+    """In-place edits that make `raw` smaller, then simpler."""
+    for index in range(len(raw.get("coupling_rules") or [])):
+        yield lambda new, i=index: new["coupling_rules"].pop(i)
+    if len(raw["dag"]["layers"]) > 1:
+        for index in range(len(raw["dag"]["layers"])):
+            yield lambda new, i=index: new["dag"]["layers"].pop(i)
+    for entry in raw["directed_edges"]:
+        yield lambda new, edge_id=entry["id"]: _drop_edges(new, {edge_id})
+    for node in reversed(range(len(raw["nodes"]))):
+        yield lambda new, n=node: _drop_node(new, n)
+    if len(raw["channels"]) > 1:
+        for channel in raw["channels"]:
+            yield lambda new, name=channel["name"]: _drop_channel(new, name)
+    for key, items in (("counts_init", raw.get("counts_init") or []), ("outputs", raw["measurement"]["outputs"])):
+        for index in range(len(items)):
+            yield lambda new, key=key, i=index: _items(new, key).pop(i)
+
+    k = raw["phase_group"]["k"]
+    for smaller_k in sorted({2, k // 2}):
+        if 2 <= smaller_k < k:
+            yield lambda new, size=smaller_k: _set_k(new, size)
+    yield lambda new: new["dag"].update(repeat=1)
+    yield lambda new: new.update(seed=0)
+    for index in range(len(raw.get("coupling_rules") or [])):
+        for option in ("probability", "route", "scope", "nonconservative"):
+            yield lambda new, i=index, key=option: new["coupling_rules"][i].pop(key, None)
+    for index in range(len(raw.get("counts_init") or [])):
+        yield lambda new, i=index: new["counts_init"][i].update(value=1)
+        yield lambda new, i=index: new["counts_init"][i].update(phase=0)
+    for index in range(len(raw["nodes"])):
+        yield lambda new, i=index: new["nodes"][i].update(gauge_phase=0, tags=[])
+    for index in range(len(raw["directed_edges"])):
+        yield lambda new, i=index: new["directed_edges"][i].update(phase_offset=0, tags=[])
+        for channel, row in enumerate(raw["fusion_mask"][index]):
+            # blocked < open < partial, so repeated passes cannot cycle
+            fills = (0, 1) if any(row) and not all(row) else (0,) if any(row) else ()
+            for fill in fills:
+                yield lambda new, i=index, c=channel, v=fill: _fill_mask(new, i, c, v)
+
+
+def _edited(raw: Dict[str, Any], edit: Edit) -> Dict[str, Any]:
+    new = copy.deepcopy(raw)
+    edit(new)
+    return new
+
+
+def _items(raw: Dict[str, Any], key: str) -> List[Any]:
+    return raw["measurement"]["outputs"] if key == "outputs" else raw[key]
+
+
+def _fill_mask(raw: Dict[str, Any], edge: int, channel: int, value: int) -> None:
+    row = raw["fusion_mask"][edge][channel]
+    row[:] = [value] * len(row)
+
+
+def _set_k(raw: Dict[str, Any], k: int) -> None:
+    raw["phase_group"]["k"] = k
+    for node in raw["nodes"]:
+        node["gauge_phase"] = node.get("gauge_phase", 0) % k
+    for entry in raw["directed_edges"]:
+        entry["phase_offset"] = entry.get("phase_offset", 0) % k
+    raw["fusion_mask"] = [[row[:k] for row in per_edge] for per_edge in raw["fusion_mask"]]
+
+
+def _drop_edges(raw: Dict[str, Any], edge_ids: set) -> None:
+    kept = [idx for idx, entry in enumerate(raw["directed_edges"]) if entry["id"] not in edge_ids]
+    raw["fusion_mask"] = [raw["fusion_mask"][idx] for idx in kept]
+    raw["directed_edges"] = [raw["directed_edges"][idx] for idx in kept]
+    refs = {entry["edge_ref"] for entry in raw["directed_edges"]}
+    raw["edges"] = [entry for entry in raw["edges"] if entry["id"] in refs]
+    for layer in raw["dag"]["layers"]:
+        layer["edges"] = [edge_id for edge_id in layer["edges"] if edge_id not in edge_ids]
+    raw["dag"]["layers"] = [layer for layer in raw["dag"]["layers"] if layer["edges"]]
+    raw["counts_init"] = [entry for entry in raw.get("counts_init") or [] if entry["edge"] not in edge_ids]
+    for output in raw["measurement"]["outputs"]:
+        output["readout_edges"] = [edge_id for edge_id in output["readout_edges"] if edge_id not in edge_ids]
+    raw["measurement"]["outputs"] = [output for output in raw["measurement"]["outputs"] if output["readout_edges"]]
+
+
+def _drop_node(raw: Dict[str, Any], node: int) -> None:
+    _drop_edges(raw, {entry["id"] for entry in raw["directed_edges"] if node in (entry["src"], entry["dst"])})
+    raw["nodes"] = [entry for entry in raw["nodes"] if entry["id"] != node]
+
+    def renumber(value: int) -> int:
+        return value - 1 if value > node else value
+
+    for entry in raw["nodes"]:
+        entry["id"] = renumber(entry["id"])
+    for entry in raw["directed_edges"]:
+        entry["src"], entry["dst"] = renumber(entry["src"]), renumber(entry["dst"])
+    for entry in raw["edges"]:
+        entry["u"], entry["v"] = renumber(entry["u"]), renumber(entry["v"])
+
+
+def _drop_channel(raw: Dict[str, Any], name: str) -> None:
+    index = next(idx for idx, channel in enumerate(raw["channels"]) if channel["name"] == name)
+    raw["channels"].pop(index)
+    for per_edge in raw["fusion_mask"]:
+        per_edge.pop(index)
+    raw["counts_init"] = [entry for entry in raw.get("counts_init") or [] if entry["channel"] != name]
+
+    def mentions(rule: Dict[str, Any]) -> bool:
+        used = {entry["ch"] for entry in rule.get("in") or []} | {entry["ch"] for entry in rule.get("out") or []}
+        used |= set(rule.get("phase") or {})
+        used |= {str(value).split(":", 1)[-1] for value in (rule.get("phase") or {}).values()}
+        return name in used
+
+    raw["coupling_rules"] = [rule for rule in raw.get("coupling_rules") or [] if not mentions(rule)]
+    outputs = []
+    for output in raw["measurement"]["outputs"]:
+        if "channels" in output:
+            output["channels"] = [channel for channel in output["channels"] if channel != name]
+            if not output["channels"]:
+                continue
+        outputs.append(output)
+    raw["measurement"]["outputs"] = outputs
+
+
+# --------------------------------------------------------------------------- #
+# CLI
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="irrepnet difftest", description="Check an engine against the reference IRREPnetSim."
+    )
+    parser.add_argument("--candidate", default="numpy", choices=sorted(CANDIDATES), help="Engine under test")
+    parser.add_argument("--cases", type=int, default=100, help="Random scenarios to try")
+    parser.add_argument("--steps", type=int, default=4, help="Steps per scenario")
+    parser.add_argument("--seed", type=int, default=0, help="First scenario seed")
+    parser.add_argument("--no-shrink", action="store_true", help="Report the failing scenario as generated")
+    parser.add_argument("--out", default=None, help="Write the (shrunk) failing scenario YAML here")
+    args = parser.parse_args(argv)
+
+    skipped: List[int] = []
+    failure = fuzz(args.candidate, cases=args.cases, steps=args.steps, seed=args.seed, skipped=skipped)
+    if skipped:
+        print(f"skipped {len(skipped)} scenarios the reference fails on (seeds {', '.join(map(str, skipped))})")
+    if failure is None:
+        print(f"{args.candidate}: {args.cases - len(skipped)} scenarios agree with the reference")
+        return 0
+    raw, found = failure
+    print(f"{args.candidate}: {found.report()}")
+    if not args.no_shrink:
+        raw = shrink(raw, lambda smaller: compare(smaller, args.candidate, args.steps) is not None)
+        found = compare(raw, args.candidate, args.steps) or found
+        size = f"{len(raw['directed_edges'])} edges, {len(raw.get('coupling_rules') or [])} rules"
+        print(f"shrunk to {size}: {found.report()}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            yaml.safe_dump(raw, handle, sort_keys=False)
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import itertools
+import math
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+from .measure import _real_dtype_for_device, roots_of_unity
+
+GAUGE_METHODS = ("auto", "winding", "batched", "brute_force")
+
+
+@dataclass
+class GaugeResponse:
+    """
+    Readouts for every joint gauge assignment of `nodes`:
+    `values[name][g_0, ..., g_{m-1}]` is the measurement with `gauge[nodes[j]] = g_j`.
+    """
+
+    nodes: Tuple[int, ...]
+    k: int
+    steps: int
+    method: str
+    values: Dict[str, torch.Tensor] = field(default_factory=dict)
+
+    def curve(self, name: str) -> List[float]:
+        """Flattened values for one readout (the scan order of `itertools.product(range(k), ...)`)."""
+        return [float(v) for v in self.values[name].reshape(-1).tolist()]
+
+
+class _NotInvariant(Exception):
+    """A history with nonzero winding reached a mask that is not invariant under its gauge shifts."""
+
+
+def gauge_response(
+    sim: Any,
+    nodes: int | Sequence[int],
+    steps: int = 1,
+    *,
+    outputs: Optional[Sequence[str]] = None,
+    method: str = "auto",
+) -> GaugeResponse:
+    """
+    Measurements after `steps` steps from the sim's current state for all k**m gauge values
+    of the m swept nodes, without mutating the sim.
+
+    Without coupling, propagation is linear and a node's gauge only shifts charged channels
+    by +g on its out-edges and -g on its in-edges. Visits to a node alternate in/out, so each
+    history carries a winding w in {-1, 0, 1} per swept node and ends at phase a + w.g.
+    `winding` tracks counts per (phase, winding) in one pass: exact as long as every mask met
+    by a history with w != 0 is invariant under shifts by gcd(w, k) (checked as it runs).
+    `batched` propagates all k**m assignments side by side, which is exact for any mask.
+    `brute_force` reruns copies of the state per assignment and is the only option with coupling rules.
+    `auto` picks the first of these that applies.
+    """
+    if method not in GAUGE_METHODS:
+        raise ValueError(f"E_GAUGE_METHOD: {method}")
+    node_ids = (nodes,) if isinstance(nodes, int) else tuple(int(node) for node in nodes)
+    if not node_ids or len(set(node_ids)) != len(node_ids):
+        raise ValueError("E_GAUGE_NODES: expected distinct node IDs")
+    swept = tuple(sim.node_index(node) for node in node_ids)
+    if steps < 0:
+        raise ValueError("E_GAUGE_STEPS_RANGE")
+    readouts = [r for r in sim.readouts if outputs is None or r.name in outputs]
+    with sim.expanded_phases():  # the sweep covers all of Z_k
+        return _respond(sim, node_ids, swept, steps, readouts, method)
+
+
+def _respond(
+    sim: Any,
+    node_ids: Tuple[int, ...],
+    swept: Tuple[int, ...],
+    steps: int,
+    readouts: Sequence[Any],
+    method: str,
+) -> GaugeResponse:
+    if method == "auto":
+        if sim.coupling_rules:
+            method = "brute_force"
+        else:
+            try:
+                values = _linear_response(sim, swept, steps, readouts, winding=True)
+                return GaugeResponse(node_ids, sim.k, steps, "winding", values)
+            except _NotInvariant:
+                method = "batched"
+    elif method != "brute_force" and sim.coupling_rules:
+        raise ValueError(f"E_GAUGE_NONLINEAR: method '{method}' requires a scenario without coupling rules")
+
+    if method == "brute_force":
+        values = _brute_force(sim, swept, steps, readouts)
+    elif method == "winding":
+        try:
+            values = _linear_response(sim, swept, steps, readouts, winding=True)
+        except _NotInvariant as exc:
+            raise ValueError(f"E_GAUGE_MASK_NOT_INVARIANT: {exc}") from exc
+    else:
+        values = _linear_response(sim, swept, steps, readouts, winding=False)
+    return GaugeResponse(node_ids, sim.k, steps, method, values)
+
+
+# --------------------------------------------------------------------------- #
+# Linear propagation with an extra slot axis
+
+
+def _linear_response(
+    sim: Any,
+    swept: Tuple[int, ...],
+    steps: int,
+    readouts: Sequence[Any],
+    *,
+    winding: bool,
+) -> Dict[str, torch.Tensor]:
+    """
+    Slots are winding vectors in {-1, 0, 1}^m (winding=True) or gauge assignments in Z_k^m.
+    State is [E, C, k, S]; each edge traversal shifts the phase axis and, for windings,
+    moves counts along the slot axis.
+    """
+    device = sim.device
+    k = sim.k
+    m = len(swept)
+    if winding:
+        slot_values = torch.tensor(list(itertools.product((-1, 0, 1), repeat=m)), dtype=torch.int64, device=device)
+    else:
+        slot_values = torch.tensor(list(itertools.product(range(k), repeat=m)), dtype=torch.int64, device=device)
+    slot_count = slot_values.shape[0]
+
+    swept_index = torch.tensor(swept, dtype=torch.int64, device=device)
+    base_gauge = sim.gauge.to(torch.int64).clone()
+    base_gauge[swept_index] = 0
+    # per edge and swept node: +1 leaving it, -1 entering it (0 on self-loops)
+    edge_winding = (sim.src.unsqueeze(1) == swept_index).to(torch.int64) - (
+        sim.dst.unsqueeze(1) == swept_index
+    ).to(torch.int64)  # [E, m]
+    charged = (~sim.channel_is_neutral).to(torch.int64)  # [C]
+
+    if winding:
+        radix = torch.tensor([3**(m - 1 - j) for j in range(m)], dtype=torch.int64, device=device)
+        period_ok = _mask_slot_ok(sim, slot_values)
+        zero_slot = int(radix.sum())  # w = (0, ..., 0)
+
+    state = torch.zeros((sim.num_edges, sim.num_channels, k, slot_count), dtype=torch.int64, device=device)
+    if winding:
+        state[..., zero_slot] = sim.counts.to(torch.int64)
+    else:
+        state[...] = sim.counts.to(torch.int64).unsqueeze(-1)
+
+    if winding:
+
+        def moved(edge_idx: torch.Tensor, shifted: torch.Tensor) -> torch.Tensor:
+            shifted = _move_slots(shifted, edge_winding.index_select(0, edge_idx), charged, slot_values, radix)
+            ok = period_ok.index_select(0, edge_idx)  # [R, C, S]
+            bad = (shifted != 0) & ~ok.unsqueeze(2)
+            if bool(bad.any()):
+                edge = int(edge_idx[bad.any(dim=3).any(dim=2).any(dim=1)][0])
+                raise _NotInvariant(f"edge {sim.scenario.directed_edges[edge].id}")
+            return shifted
+
+        state = sim._propagate_slots(state, steps, gauge=base_gauge, moved=moved)
+    else:
+        gauge_shift = (edge_winding.unsqueeze(1) * slot_values.unsqueeze(0)).sum(dim=-1)  # [E, S]
+        slot_shift = gauge_shift.unsqueeze(1) * charged.view(1, -1, 1)  # [E, C, S]
+        state = sim._propagate_slots(state, steps, gauge=base_gauge, slot_shift=slot_shift)
+
+    values: Dict[str, torch.Tensor] = {}
+    real_dtype = _real_dtype_for_device(device)
+    complex_dtype = torch.complex64 if real_dtype == torch.float32 else torch.complex128
+    chi = roots_of_unity(k, device=device, real_dtype=real_dtype).to(complex_dtype)
+    if winding:
+        gauges = torch.tensor(list(itertools.product(range(k), repeat=m)), dtype=torch.int64, device=device)
+        rotation = chi[(slot_values.unsqueeze(1) * gauges.unsqueeze(0)).sum(dim=-1) % k]  # [S, G]
+    for readout in readouts:
+        if not readout.edges:
+            values[readout.name] = torch.zeros((k,) * m, dtype=torch.float64)
+            continue
+        selected = state.index_select(0, torch.tensor(readout.edges, dtype=torch.int64, device=device))
+        if readout.channels is not None:
+            selected = selected.index_select(1, torch.tensor(readout.channels, dtype=torch.int64, device=device))
+        histogram = selected.sum(dim=(0, 1)).to(complex_dtype)  # [k, S]
+        amplitude = chi @ histogram  # [S]
+        if winding:
+            amplitude = amplitude @ rotation  # [G]
+        intensity = amplitude.abs().pow(2).to(torch.float64).cpu()
+        values[readout.name] = intensity.view((k,) * m)
+    return values
+
+
+def _move_slots(
+    shifted: torch.Tensor,
+    step_winding: torch.Tensor,
+    charged: torch.Tensor,
+    slot_values: torch.Tensor,
+    radix: torch.Tensor,
+) -> torch.Tensor:
+    """Add each row's winding step to the slot of charged channels: [R, C, k, S] -> [R, C, k, S]."""
+    rows, channels, k, slot_count = shifted.shape
+    step = step_winding.unsqueeze(1) * charged.view(1, -1, 1)  # [R, C, m]
+    source = slot_values.view(1, 1, slot_count, -1) - step.unsqueeze(2)  # [R, C, S, m]
+    valid = ((source >= -1) & (source <= 1)).all(dim=-1)
+    source_slot = ((source.clamp(-1, 1) + 1) * radix).sum(dim=-1)  # [R, C, S]
+    padded = torch.cat([shifted, torch.zeros_like(shifted[..., :1])], dim=-1)
+    source_slot = torch.where(valid, source_slot, torch.full_like(source_slot, slot_count))
+    index = source_slot.unsqueeze(2).expand(rows, channels, k, slot_count)
+    moved = padded.gather(3, index)
+    # counts whose winding would leave {-1, 0, 1} cannot exist (visits alternate in/out)
+    if bool(moved.sum() != shifted.sum()):
+        raise RuntimeError("E_GAUGE_WINDING_RANGE")
+    return moved
+
+
+def _mask_slot_ok(sim: Any, slot_values: torch.Tensor) -> torch.Tensor:
+    """[E, C, S]: mask row is invariant under shifts by gcd(w_1, ..., w_m, k) for slot w."""
+    k = sim.k
+    masks = sim.fusion_mask.to(torch.int64)  # [E, C, k]
+    invariant = {}
+    for divisor in range(1, k + 1):
+        if k % divisor == 0:
+            invariant[divisor] = (masks == torch.roll(masks, shifts=divisor, dims=2)).all(dim=2)
+    columns = []
+    for slot in slot_values.tolist():
+        step = k
+        for w in slot:
+            step = math.gcd(step, abs(int(w)))
+        columns.append(invariant[step])
+    return torch.stack(columns, dim=-1)
+
+
+# --------------------------------------------------------------------------- #
+# Brute force over packed copies of the sim
+
+# gauge assignments per `MultiScenarioSim`, each holding a full copy of the state
+BRUTE_FORCE_BATCH = 64
+
+
+def _brute_force(
+    sim: Any,
+    swept: Tuple[int, ...],
+    steps: int,
+    readouts: Sequence[Any],
+) -> Dict[str, torch.Tensor]:
+    """
+    Rerun the current state once per assignment, side by side as the packed scenarios of a
+    `MultiScenarioSim` (whose stochastic draws are those of the sim alone). The sim is only read.
+    """
+    from .multi import MultiScenarioSim  # multi imports sim, which imports this module
+
+    k = sim.k
+    # the live tensors, so direct writes (`sim.gauge[n] = g`) are included
+    edges = [
+        replace(edge, phase_offset=int(offset))
+        for edge, offset in zip(sim.scenario.directed_edges, sim.edge_offset.tolist())
+    ]
+    snapshot = replace(
+        sim.scenario,
+        node_gauge=sim.gauge.tolist(),
+        directed_edges=edges,
+        fusion_mask=sim.fusion_mask.tolist(),
+        counts_init=[],
+    )
+    disabled = [edge.id for edge, enabled in zip(snapshot.directed_edges, sim.edge_enabled) if not enabled]
+    assignments = list(itertools.product(range(k), repeat=len(swept)))
+    names = [readout.name for readout in readouts]
+    results: Dict[str, List[float]] = {name: [] for name in names}
+    for start in range(0, len(assignments), BRUTE_FORCE_BATCH):
+        group = assignments[start : start + BRUTE_FORCE_BATCH]
+        copies = []
+        for assignment in group:
+            gauge = list(snapshot.node_gauge)
+            for node, phase in zip(swept, assignment):
+                gauge[node] = phase
+            copies.append(replace(snapshot, node_gauge=gauge))
+        packed = MultiScenarioSim(copies, sim.device, count_dtype=sim.count_dtype)
+        for index in range(len(group)):
+            for edge_id in disabled:
+                packed.enable_edge(packed.edge_id(index, edge_id), False)
+        packed._set_counts(sim.counts.repeat(len(group), 1, 1))
+        packed.step_count = sim.step_count  # with the layer applications per step, keys the draws
+        for _ in range(steps):
+            packed.step()
+        for measured in packed.measure_scenarios():
+            for name in names:
+                results[name].append(float(measured.get(name, 0.0)))
+    shape = (k,) * len(swept)
+    return {name: torch.tensor(vals, dtype=torch.float64).view(shape) for name, vals in results.items()}
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from .measure import phasor_intensity
+
+Source = Tuple[int, int, int]  # (edge index, channel, phase)
+
+
+def response_key(sim: Any) -> str:
+    """Hash of everything a coupling-free response depends on (current gauges, offsets, masks, plans, readouts)."""
+    digest = hashlib.sha256()
+    for tensor in (sim.gauge, sim.src, sim.dst, sim.edge_offset, sim.fusion_mask, sim.channel_is_neutral):
+        digest.update(tensor.cpu().numpy().tobytes())
+    digest.update(repr((sim.k, sim.repeat, sim.edge_enabled)).encode())
+    digest.update(repr([[chunk.edge_idx.tolist() for chunk in chunks] for chunks in sim._plans]).encode())
+    digest.update(repr([(r.name, r.edges, r.channels) for r in sim.readouts]).encode())
+    return digest.hexdigest()[:24]
+
+
+class ResponseLibrary:
+    """
+    Green's functions of a coupling-free scenario: the readout phase histograms (and optionally
+    the full final state) after `steps` steps for unit sources (edge, channel, phase).
+
+    Propagation without coupling is linear in the start counts, so any `counts_init` is answered
+    by a weighted sum of cached unit responses. Missing sources are propagated together in one
+    batched pass. When every mask of a channel is invariant under a phase shift d, sources of that
+    channel are only run for phases 0..d-1 and the rest are cyclic rotations. With `cache_dir`,
+    responses persist in `<key>-<steps>.npz`, keyed by `response_key(sim)`. The key is checked
+    on every query, so after a mutation of the sim the library switches to the new key.
+    """
+
+    def __init__(
+        self,
+        sim: Any,
+        steps: int,
+        *,
+        cache_dir: Optional[str] = None,
+        states: bool = False,
+        batch: int = 256,
+    ):
+        if sim.coupling_rules:
+            raise ValueError("E_GREEN_NONLINEAR: coupling rules make the response nonlinear")
+        if steps < 0:
+            raise ValueError("E_GREEN_STEPS_RANGE")
+        if batch < 1:
+            raise ValueError("E_GREEN_BATCH_RANGE")
+        self.sim = sim
+        self.steps = steps
+        self.states = states
+        self.batch = batch
+        self.cache_dir = cache_dir
+        self.readouts = [readout.name for readout in sim.readouts]
+        self.key = ""
+        self._sync()
+
+    def _sync(self) -> None:
+        """Follow the live sim: when its response key changed, drop the responses held for the old one."""
+        with self.sim.expanded_phases():  # keys and periods are taken over the declared Z_k
+            key = response_key(self.sim)
+            if key == self.key:
+                return
+            self.key = key
+            self._periods = _channel_periods(self.sim)
+        self._index: Dict[Source, int] = {}
+        self._histograms: List[np.ndarray] = []  # per source: [R, k] int64
+        self._states: List[np.ndarray] = []  # per source: [E, C, k] int64, load order
+        self.path = os.path.join(self.cache_dir, f"{key}-{self.steps}.npz") if self.cache_dir else None
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # ------------------------------------------------------------------ #
+
+    def _load(self) -> None:
+        assert self.path is not None
+        with np.load(self.path) as data:
+            if list(data["readouts"]) != self.readouts:
+                return
+            if self.states and "states" not in data:
+                return
+            histograms = data["histograms"]  # each `data[...]` access decompresses the whole array
+            states = data["states"] if self.states else None
+            for position, source in enumerate(data["sources"].tolist()):
+                self._index[tuple(source)] = position  # type: ignore[index]
+                self._histograms.append(histograms[position])
+                if states is not None:
+                    self._states.append(states[position])
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        sources = sorted(self._index, key=self._index.get)  # type: ignore[arg-type]
+        arrays: Dict[str, np.ndarray] = {
+            "readouts": np.array(self.readouts),
+            "sources": np.array(sources, dtype=np.int64).reshape(-1, 3),
+            "histograms": np.stack(self._histograms) if self._histograms else np.zeros((0, len(self.readouts), self.sim.k)),
+        }
+        if self.states and self._states:
+            arrays["states"] = np.stack(self._states)
+        tmp = self.path + ".tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------ #
+
+    def _sources(self, counts_init: Iterable[Any]) -> List[Tuple[Source, int]]:
+        sim = self.sim
+        weighted: Dict[Source, int] = {}
+        for entry in counts_init:
+            if isinstance(entry, dict):
+                edge_id, channel, phase, value = entry["edge"], entry["channel"], entry["phase"], entry["value"]
+            elif hasattr(entry, "value"):
+                # CountInitEntry from a loaded scenario already holds internal indices
+                source = (entry.edge, entry.channel, entry.phase % sim.k)
+                weighted[source] = weighted.get(source, 0) + int(entry.value)
+                continue
+            else:
+                edge_id, channel, phase, value = entry
+            source = (sim.edge_index(int(edge_id)), sim._channel(channel), int(phase) % sim.k)
+            weighted[source] = weighted.get(source, 0) + int(value)
+        return [(source, value) for source, value in weighted.items() if value]
+
+    def _base(self, source: Source) -> Tuple[Source, int]:
+        edge, channel, phase = source
+        period = self._periods[channel]
+        return (edge, channel, phase % period), phase - phase % period
+
+    def prepare(self, counts_init: Iterable[Any]) -> None:
+        """Compute (in one batched pass) and cache the responses `counts_init` needs."""
+        self._sync()
+        missing = sorted({self._base(source)[0] for source, _ in self._sources(counts_init)} - set(self._index))
+        if not missing:
+            return
+        with self.sim.expanded_phases():  # sources may sit at any declared phase
+            for start in range(0, len(missing), self.batch):
+                group = missing[start : start + self.batch]
+                histograms, states = _propagate_sources(self.sim, group, self.steps, self.states)
+                for position, source in enumerate(group):
+                    self._index[source] = len(self._histograms)
+                    self._histograms.append(histograms[position])
+                    if states is not None:
+                        self._states.append(states[position])
+        self.save()
+
+    def histograms(self, counts_init: Iterable[Any]) -> Dict[str, np.ndarray]:
+        """Readout phase histograms [k] after `steps` steps from `counts_init`."""
+        counts_init = list(counts_init)
+        self.prepare(counts_init)
+        total = np.zeros((len(self.readouts), self.sim.k), dtype=np.int64)
+        for source, value in self._sources(counts_init):
+            base, shift = self._base(source)
+            total += value * np.roll(self._histograms[self._index[base]], shift, axis=-1)
+        return {name: total[position] for position, name in enumerate(self.readouts)}
+
+    def measure(self, counts_init: Iterable[Any]) -> Dict[str, float]:
+        """What `sim.measure()` reports after `steps` steps started from `counts_init` alone."""
+        return {
+            name: phasor_intensity(torch.from_numpy(histogram), self.sim.k)
+            for name, histogram in self.histograms(counts_init).items()
+        }
+
+    def state(self, counts_init: Iterable[Any]) -> np.ndarray:
+        """Final [E, C, k] counts (load order); needs `states=True`."""
+        if not self.states:
+            raise ValueError("E_GREEN_NO_STATES: build the library with states=True")
+        counts_init = list(counts_init)
+        self.prepare(counts_init)
+        sim = self.sim
+        total = np.zeros((sim.num_edges, sim.num_channels, sim.k), dtype=np.int64)
+        for source, value in self._sources(counts_init):
+            base, shift = self._base(source)
+            channel = source[1]
+            total[:, channel] += value * np.roll(self._states[self._index[base]][:, channel], shift, axis=-1)
+        return total
+
+
+def _channel_periods(sim: Any) -> List[int]:
+    """Per channel, the smallest d dividing k such that every mask row is invariant under a shift by d."""
+    masks = sim.fusion_mask.to(torch.int64)  # [E, C, k]
+    periods = []
+    for channel in range(sim.num_channels):
+        rows = masks[:, channel]
+        for divisor in range(1, sim.k + 1):
+            if sim.k % divisor == 0 and torch.equal(rows, torch.roll(rows, shifts=divisor, dims=1)):
+                periods.append(divisor)
+                break
+    return periods
+
+
+@torch.no_grad()
+def _propagate_sources(
+    sim: Any,
+    sources: Sequence[Source],
+    steps: int,
+    keep_states: bool,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Run unit sources side by side on a trailing slot axis: state [E, C, k, S]."""
+    device = sim.device
+    k = sim.k
+    count = len(sources)
+    state = torch.zeros((sim.num_edges, sim.num_channels, k, count), dtype=torch.int64, device=device)
+    for slot, (edge, channel, phase) in enumerate(sources):
+        state[edge, channel, phase, slot] = 1
+
+    state = sim._propagate_slots(state, steps)
+
+    histograms = torch.zeros((count, len(sim.readouts), k), dtype=torch.int64, device=device)
+    for position, readout in enumerate(sim.readouts):
+        if not readout.edges:
+            continue
+        selected = state.index_select(0, torch.tensor(readout.edges, dtype=torch.int64, device=device))
+        if readout.channels is not None:
+            selected = selected.index_select(1, torch.tensor(readout.channels, dtype=torch.int64, device=device))
+        histograms[:, position] = selected.sum(dim=(0, 1)).T  # [S, k]
+    states = None
+    if keep_states:
+        final = state if sim.export_index is None else state.index_select(0, sim.export_index)
+        states = final.permute(3, 0, 1, 2).cpu().numpy()
+    return histograms.cpu().numpy(), states
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .loader import Scenario
+
+SignedEdge = Tuple[int, int]  # (edge index, +1 along its direction / -1 against it)
+
+
+@dataclass(frozen=True)
+class BasisCycle:
+    edges: Tuple[SignedEdge, ...]
+    chord: int  # the non-tree edge that closes the cycle (traversed with sign +1)
+
+
+class HolonomyIndex:
+    """
+    Cycle basis of a scenario's directed graph (as an undirected multigraph) and the holonomy
+    mod k of each basis cycle, computed from the `Scenario` arrays without stepping.
+
+    The phase a history picks up on edge e is `g_src - g_dst + offset` for charged channels and
+    `offset` for neutral ones. Around a closed loop the gauge terms telescope, so both channel
+    classes see the same holonomy `sum(sign * offset)`; gauges only act at a route's open ends.
+    Offsets can be updated in place (`set_edge_offset`), touching only the cycles through the edge.
+    """
+
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.k = scenario.k
+        self.offsets = [edge.phase_offset % self.k for edge in scenario.directed_edges]
+        self.cycles: List[BasisCycle] = []
+        self._tree_parent: Dict[int, Optional[SignedEdge]] = {}  # node -> edge to its parent
+        self._depth: Dict[int, int] = {}
+        self._chord_index: Dict[int, int] = {}  # chord edge -> cycle
+        self._cycles_by_edge: Dict[int, List[Tuple[int, int]]] = {}  # edge -> [(cycle, sign)]
+        self._build()
+        self.holonomy = [self._cycle_sum(cycle.edges) for cycle in self.cycles]
+
+    def _build(self) -> None:
+        scenario = self.scenario
+        adjacency: List[List[Tuple[int, int, int]]] = [[] for _ in range(scenario.node_count)]
+        for edge_idx, edge in enumerate(scenario.directed_edges):
+            adjacency[edge.src].append((edge.dst, edge_idx, 1))
+            adjacency[edge.dst].append((edge.src, edge_idx, -1))
+        tree_edges: Set[int] = set()
+        for root in range(scenario.node_count):
+            if root in self._depth:
+                continue
+            self._depth[root] = 0
+            self._tree_parent[root] = None
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                for other, edge_idx, sign in adjacency[node]:
+                    if other in self._depth:
+                        continue
+                    self._depth[other] = self._depth[node] + 1
+                    self._tree_parent[other] = (edge_idx, -sign)  # from `other` back up to `node`
+                    tree_edges.add(edge_idx)
+                    queue.append(other)
+        for edge_idx, edge in enumerate(scenario.directed_edges):
+            if edge_idx in tree_edges:
+                continue
+            # chord src -> dst, then back through the tree from dst to src
+            path = [(edge_idx, 1)] + self._tree_path(edge.dst, edge.src)
+            self._chord_index[edge_idx] = len(self.cycles)
+            for member, sign in path:
+                self._cycles_by_edge.setdefault(member, []).append((len(self.cycles), sign))
+            self.cycles.append(BasisCycle(edges=tuple(path), chord=edge_idx))
+
+    def _tree_path(self, start: int, end: int) -> List[SignedEdge]:
+        """Signed tree edges walking from `start` to `end` (nodes of one component)."""
+        up: List[SignedEdge] = []
+        down: List[SignedEdge] = []
+        a, b = start, end
+        while self._depth[a] > self._depth[b]:
+            step = self._tree_parent[a]
+            assert step is not None
+            up.append(step)
+            a = self._other_end(step[0], a)
+        while self._depth[b] > self._depth[a]:
+            step = self._tree_parent[b]
+            assert step is not None
+            down.append((step[0], -step[1]))
+            b = self._other_end(step[0], b)
+        while a != b:
+            step_a, step_b = self._tree_parent[a], self._tree_parent[b]
+            assert step_a is not None and step_b is not None
+            up.append(step_a)
+            down.append((step_b[0], -step_b[1]))
+            a = self._other_end(step_a[0], a)
+            b = self._other_end(step_b[0], b)
+        return up + down[::-1]
+
+    def _other_end(self, edge_idx: int, node: int) -> int:
+        edge = self.scenario.directed_edges[edge_idx]
+        return edge.dst if edge.src == node else edge.src
+
+    def _cycle_sum(self, edges: Sequence[SignedEdge]) -> int:
+        return sum(sign * self.offsets[edge] for edge, sign in edges) % self.k
+
+    # ------------------------------------------------------------------ #
+
+    def set_edge_offset(self, edge_id: int, offset: int) -> None:
+        edge_idx = self._edge(edge_id)
+        change = (int(offset) - self.offsets[edge_idx]) % self.k
+        self.offsets[edge_idx] = int(offset) % self.k
+        for cycle, sign in self._cycles_by_edge.get(edge_idx, []):
+            self.holonomy[cycle] = (self.holonomy[cycle] + sign * change) % self.k
+
+    def _edge(self, edge_id: int) -> int:
+        if edge_id not in self.scenario.edge_index_by_id:
+            raise ValueError(f"E_EDGE_UNKNOWN: {edge_id}")
+        return self.scenario.edge_index_by_id[edge_id]
+
+    def _route(self, edge_ids: Sequence[int]) -> List[int]:
+        edges = [self._edge(edge_id) for edge_id in edge_ids]
+        if not edges:
+            raise ValueError("E_HOLONOMY_ROUTE: empty route")
+        directed = self.scenario.directed_edges
+        for first, second in zip(edges, edges[1:]):
+            if directed[first].dst != directed[second].src:
+                raise ValueError(f"E_HOLONOMY_ROUTE: edge {directed[second].id} does not continue the route")
+        return edges
+
+    def route_phase(self, edge_ids: Sequence[int], *, charged: bool = True) -> int:
+        """Phase a history picks up along consecutive directed edges (current gauges for charged)."""
+        edges = self._route(edge_ids)
+        phase = sum(self.offsets[edge] for edge in edges)
+        if charged:
+            directed = self.scenario.directed_edges
+            gauge = self.scenario.node_gauge
+            phase += gauge[directed[edges[0]].src] - gauge[directed[edges[-1]].dst]
+        return phase % self.k
+
+    def cycle_coordinates(self, edges: Sequence[SignedEdge]) -> Dict[int, int]:
+        """Coordinates of a closed signed edge walk in the cycle basis (chord multiplicities)."""
+        coordinates: Dict[int, int] = {}
+        for edge_idx, sign in edges:
+            cycle = self._chord_index.get(edge_idx)
+            if cycle is not None:
+                coordinates[cycle] = coordinates.get(cycle, 0) + sign
+        return {cycle: value for cycle, value in coordinates.items() if value}
+
+    def phase_difference(self, route_a: Sequence[int], route_b: Sequence[int]) -> int:
+        """
+        Phase of `route_a` minus `route_b` (edge IDs, same start and end nodes) mod k, the same for
+        both channel classes: the holonomy of the loop a - b, read off the basis.
+        """
+        a, b = self._route(route_a), self._route(route_b)
+        directed = self.scenario.directed_edges
+        if directed[a[0]].src != directed[b[0]].src or directed[a[-1]].dst != directed[b[-1]].dst:
+            raise ValueError("E_HOLONOMY_ROUTE: routes must share their start and end nodes")
+        loop = [(edge, 1) for edge in a] + [(edge, -1) for edge in reversed(b)]
+        coordinates = self.cycle_coordinates(loop)
+        return sum(value * self.holonomy[cycle] for cycle, value in coordinates.items()) % self.k
+
+    # ------------------------------------------------------------------ #
+    # Gauge redundancy
+
+    def _mask_period(self, edge_idx: int, channel: int) -> int:
+        row = self.scenario.fusion_mask[edge_idx][channel]
+        for divisor in range(1, self.k + 1):
+            if self.k % divisor == 0 and all(row[g] == row[(g + divisor) % self.k] for g in range(self.k)):
+                return divisor
+        return self.k  # pragma: no cover
+
+    def redundant_step(self, node_id: int, readout: str) -> int:
+        """
+        Smallest d such that changing the gauge of `node_id` by any multiple of d cannot change
+        `readout` (1: the gauge is pure redundancy; k: no change is provably redundant), so a
+        sweep over this gauge only needs the values 0..d-1.
+
+        Sufficient conditions, from the start counts, the graph and the masks: the gauge change is
+        a global phase for every (start edge, readout edge) pair, and every charged mask row that
+        sees the shifted phase is invariant under it. With coupling rules nothing is claimed.
+        """
+        scenario = self.scenario
+        if node_id not in scenario.node_index_by_id:
+            raise ValueError(f"E_NODE_UNKNOWN: {node_id}")
+        node = scenario.node_index_by_id[node_id]
+        matches = [r for r in scenario.measurement if r.name == readout]
+        if not matches:
+            raise ValueError(f"E_HOLONOMY_READOUT_UNKNOWN: {readout}")
+        selected = matches[0]
+        channels = range(len(scenario.channels)) if selected.channels is None else selected.channels
+        charged = [channel for channel in channels if not scenario.channels[channel].neutral]
+        if not charged:
+            return 1
+        if scenario.coupling_rules:
+            return self.k
+
+        directed = scenario.directed_edges
+        out_edges: List[List[int]] = [[] for _ in range(scenario.node_count)]
+        in_edges: List[List[int]] = [[] for _ in range(scenario.node_count)]
+        for edge_idx, edge in enumerate(directed):
+            out_edges[edge.src].append(edge_idx)
+            in_edges[edge.dst].append(edge_idx)
+        reaches_readout = _closure(selected.edges, lambda e: in_edges[directed[e].src])
+        starts = {entry.edge for entry in scenario.counts_init if entry.channel in charged and entry.value}
+        starts &= reaches_readout
+
+        step = 1
+        # end windings [src(start) == n] - [src(readout edge) == n] must agree across pairs
+        windings: Set[int] = set()
+        for start in starts:
+            reached = _closure([start], lambda e: out_edges[directed[e].dst])
+            for end in set(selected.edges) & reached:
+                windings.add(int(directed[start].src == node) - int(directed[end].src == node))
+        for w in windings:
+            for v in windings:
+                if w != v:
+                    step = _lcm(step, self.k // math.gcd(self.k, abs(w - v)))
+        # masks that see the shifted phase: rows entering n on histories that did not start at n,
+        # rows not entering n on histories that did
+        for from_node, entering in ((False, True), (True, False)):
+            group = [start for start in starts if (directed[start].src == node) == from_node]
+            for edge_idx in _closure(group, lambda e: out_edges[directed[e].dst]) & reaches_readout:
+                if (directed[edge_idx].dst == node) != entering:
+                    continue
+                for channel in charged:
+                    step = _lcm(step, self._mask_period(edge_idx, channel))
+        return step
+
+    def gauge_invariant(self, readout: str) -> bool:
+        """True when no node's gauge can change `readout`."""
+        return all(self.redundant_step(node_id, readout) == 1 for node_id in self.scenario.node_ids)
+
+
+def _closure(seeds: Sequence[int], neighbours) -> Set[int]:  # type: ignore[no-untyped-def]
+    seen = set(seeds)
+    queue = deque(seeds)
+    while queue:
+        for other in neighbours(queue.popleft()):
+            if other not in seen:
+                seen.add(other)
+                queue.append(other)
+    return seen
+
+
+def _lcm(a: int, b: int) -> int:
+    return a * b // math.gcd(a, b)
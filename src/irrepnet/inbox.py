@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from typing import Dict
+
+import torch
+
+
+class InboxState:
+    """
+    Node-inbox form of the [E, C, k] count state (`MemoryLayout(state="inbox")`).
+
+    A layer fans each node's masked incoming rows out to every enabled out-edge, so all those
+    rows hold the same histogram. Here that histogram is stored once per node: an out-edge's row
+    is `inbox[src]` if the edge was enabled when the node was filled, plus a sparse per-edge
+    `residual` for what is not a plain fan-out copy (start counts, rule emissions, `add_counts`).
+    Shifts and masks stay where they are in the edge layout, applied when a layer reads the row.
+    """
+
+    def __init__(
+        self,
+        src: torch.Tensor,
+        num_nodes: int,
+        num_channels: int,
+        bins: int,
+        dtype: torch.dtype,
+        device: torch.device,
+    ):
+        self.src = src
+        self.inbox = torch.zeros((num_nodes, num_channels, bins), dtype=dtype, device=device)
+        self.inbox_next = torch.zeros_like(self.inbox)
+        self.enabled = torch.ones(src.numel(), dtype=torch.bool, device=device)
+        self.fed = torch.zeros_like(self.enabled)  # edges that receive their source node's inbox
+        self.rows = torch.zeros(0, dtype=torch.int64, device=device)  # residual edges, ascending
+        self.residual = torch.zeros((0, num_channels, bins), dtype=dtype, device=device)
+        self._pending: Dict[int, torch.Tensor] = {}  # next layer's residual rows
+
+    @property
+    def num_edges(self) -> int:
+        return self.src.numel()
+
+    def read(self, edge_idx: torch.Tensor) -> torch.Tensor:
+        """Materialized rows [R, C, k] of the given edges."""
+        fed = self.fed.index_select(0, edge_idx).to(self.inbox.dtype).view(-1, 1, 1)
+        rows = self.inbox.index_select(0, self.src.index_select(0, edge_idx)) * fed
+        if self.rows.numel():
+            position = torch.searchsorted(self.rows, edge_idx).clamp_(max=self.rows.numel() - 1)
+            hit = (self.rows.index_select(0, position) == edge_idx).to(rows.dtype).view(-1, 1, 1)
+            rows = rows + self.residual.index_select(0, position) * hit
+        return rows
+
+    def materialize(self) -> torch.Tensor:
+        """The full [E, C, k] state, as the edge layout would hold it."""
+        return self.read(torch.arange(self.num_edges, dtype=torch.int64, device=self.src.device))
+
+    def deliver(self, dst: torch.Tensor, allowed: torch.Tensor) -> None:
+        """Add a chunk's masked rows into their destination nodes' next inbox."""
+        self.inbox_next.index_add_(0, dst, allowed)
+
+    def emit(self, edge_idx: int, channel: int, histogram: torch.Tensor) -> None:
+        """Add a rule emission onto one out-edge of the next state."""
+        row = self._pending.get(edge_idx)
+        if row is None:
+            row = self._pending[edge_idx] = torch.zeros_like(self.inbox[0])
+        row[channel] += histogram
+
+    def advance(self) -> None:
+        """The next state becomes current (end of a layer application)."""
+        self.inbox, self.inbox_next = self.inbox_next, self.inbox
+        self.inbox_next.zero_()
+        self.fed.copy_(self.enabled)
+        pending, self._pending = self._pending, {}
+        self._set_residual(pending)
+
+    def add(self, edge_idx: int, channel: int, phase: int, value: int) -> None:
+        """Add `value` to one bin of the current state."""
+        delta = torch.zeros_like(self.inbox[0])
+        delta[channel, phase] = value
+        residual = self._residual_dict()
+        residual[edge_idx] = residual[edge_idx] + delta if edge_idx in residual else delta
+        self._set_residual(residual)
+
+    def load(self, counts: torch.Tensor) -> None:
+        """Replace the state with [E, C, k] `counts` (kept as residual rows until the next layer)."""
+        self.inbox.zero_()
+        self.inbox_next.zero_()
+        self.fed.zero_()
+        self._pending = {}
+        self.rows = counts.flatten(1).any(dim=1).nonzero().flatten()
+        self.residual = counts.index_select(0, self.rows).clone()
+
+    def set_enabled(self, edge_idx: int, enabled: bool) -> None:
+        """Track an edge toggle; a disabled edge keeps the row it already holds."""
+        if not enabled and bool(self.fed[edge_idx]):
+            index = torch.tensor([edge_idx], dtype=torch.int64, device=self.src.device)
+            row = self.read(index)[0]
+            residual = self._residual_dict()
+            residual[edge_idx] = row
+            self.fed[edge_idx] = False
+            self._set_residual(residual)
+        self.enabled[edge_idx] = enabled
+
+    def _residual_dict(self) -> Dict[int, torch.Tensor]:
+        return {int(edge): self.residual[position] for position, edge in enumerate(self.rows.tolist())}
+
+    def _set_residual(self, rows: Dict[int, torch.Tensor]) -> None:
+        order = sorted(rows)
+        self.rows = torch.tensor(order, dtype=torch.int64, device=self.src.device)
+        if order:
+            self.residual = torch.stack([rows[edge] for edge in order])
+        else:
+            self.residual = self.inbox.new_zeros((0,) + tuple(self.inbox.shape[1:]))
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import torch
+
+PHASES = ("propagate", "coupling", "consume", "emit", "measure")
+
+
+@dataclass
+class PhaseRecord:
+    name: str
+    step: int
+    layer: int
+    start_ns: int
+    wall_ns: int
+    events: Any = None  # (start, end) device events when timing on CUDA/MPS
+
+    def device_ms(self) -> Optional[float]:
+        if self.events is None:
+            return None
+        start, end = self.events
+        end.synchronize()
+        return float(start.elapsed_time(end))
+
+
+class SimProfiler:
+    """
+    Opt-in instrumentation for `IRREPnetSim` (see `IRREPnetSim.enable_profiling`).
+    Records wall time (and device time on CUDA/MPS) for each propagate / coupling /
+    consume / emit / measure phase, tagged with step and layer, plus activity counters.
+
+    `sync=True` synchronizes the device around every phase so wall time is attributed to
+    the phase that queued the work; the extra syncs are not counted in `host_syncs`.
+    Phases are also wrapped in `torch.profiler.record_function`, so they show up as
+    named ranges when the run is under `torch.profiler.profile`.
+    """
+
+    def __init__(self, device: torch.device, *, sync: bool = True, device_timing: bool = True, record_functions: bool = True):
+        self.device = device
+        self.sync = sync
+        self.device_timing = device_timing and device.type in ("cuda", "mps")
+        self.record_functions = record_functions
+        self.step = 0
+        self.layer = 0
+        self.records: List[PhaseRecord] = []
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.rules_fired: Dict[str, int] = defaultdict(int)
+        self.rule_multiplicity: Dict[str, int] = defaultdict(int)
+        self._origin_ns = time.perf_counter_ns()
+
+    def reset(self) -> None:
+        self.records.clear()
+        self.counters.clear()
+        self.rules_fired.clear()
+        self.rule_multiplicity.clear()
+        self._origin_ns = time.perf_counter_ns()
+
+    # ------------------------------------------------------------------ #
+    # Hooks called by the simulator
+
+    def begin_layer(self, step: int, layer: int) -> None:
+        self.step = step
+        self.layer = layer
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def rule_fired(self, name: str, multiplicity: int) -> None:
+        self.rules_fired[name] += 1
+        self.rule_multiplicity[name] += multiplicity
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if self.sync:
+            _synchronize(self.device)
+        events = self._device_events() if self.device_timing else None
+        if events is not None:
+            events[0].record()
+        ranged = torch.profiler.record_function(f"irrepnet::{name}") if self.record_functions else contextlib.nullcontext()
+        start = time.perf_counter_ns()
+        try:
+            with ranged:
+                yield
+        finally:
+            if events is not None:
+                events[1].record()
+            if self.sync:
+                _synchronize(self.device)
+            end = time.perf_counter_ns()
+            self.records.append(PhaseRecord(name, self.step, self.layer, start, end - start, events))
+
+    def _device_events(self) -> Any:
+        if self.device.type == "cuda":
+            return (torch.cuda.Event(enable_timing=True), torch.cuda.Event(enable_timing=True))
+        return (torch.mps.event.Event(enable_timing=True), torch.mps.event.Event(enable_timing=True))
+
+    # ------------------------------------------------------------------ #
+    # Reports
+
+    def summary(self) -> Dict[str, Any]:
+        phases: Dict[str, Dict[str, Any]] = {}
+        for record in self.records:
+            entry = phases.setdefault(record.name, {"calls": 0, "wall_ms": 0.0, "device_ms": None})
+            entry["calls"] += 1
+            entry["wall_ms"] += record.wall_ns / 1e6
+            device_ms = record.device_ms()
+            if device_ms is not None:
+                entry["device_ms"] = (entry["device_ms"] or 0.0) + device_ms
+        return {
+            "phases": phases,
+            "counters": dict(self.counters),
+            "rules_fired": dict(self.rules_fired),
+            "rule_multiplicity": dict(self.rule_multiplicity),
+        }
+
+    def per_step(self) -> Dict[int, Dict[str, float]]:
+        """step -> phase -> wall ms."""
+        result: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            result[record.step][record.name] += record.wall_ns / 1e6
+        return {step: dict(phases) for step, phases in result.items()}
+
+    def per_layer(self) -> Dict[int, Dict[str, float]]:
+        """layer index within the schedule -> phase -> wall ms (summed over steps)."""
+        result: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            result[record.layer][record.name] += record.wall_ns / 1e6
+        return {layer: dict(phases) for layer, phases in result.items()}
+
+    def table(self) -> str:
+        """Phase times are inclusive: consume/emit are nested inside coupling."""
+        summary = self.summary()
+        phases = summary["phases"]
+        top_level = sum(entry["wall_ms"] for name, entry in phases.items() if name not in ("consume", "emit"))
+        lines = [f"{'phase':<12}{'calls':>8}{'wall ms':>12}{'mean us':>10}{'device ms':>12}{'share':>8}"]
+        ordered = [name for name in PHASES if name in phases] + sorted(set(phases) - set(PHASES))
+        for name in ordered:
+            entry = phases[name]
+            device = f"{entry['device_ms']:.3f}" if entry["device_ms"] is not None else "-"
+            share = 100.0 * entry["wall_ms"] / top_level if top_level else 0.0
+            mean_us = 1000.0 * entry["wall_ms"] / entry["calls"]
+            lines.append(
+                f"{name:<12}{entry['calls']:>8}{entry['wall_ms']:>12.3f}{mean_us:>10.1f}{device:>12}{share:>7.1f}%"
+            )
+        if summary["counters"]:
+            lines.append("")
+            for name, value in sorted(summary["counters"].items()):
+                lines.append(f"{name:<24}{value:>12}")
+        if summary["rules_fired"]:
+            lines.append("")
+            lines.append(f"{'rule':<24}{'fired':>12}{'multiplicity':>14}")
+            for name, fired in sorted(summary["rules_fired"].items()):
+                lines.append(f"{name:<24}{fired:>12}{summary['rule_multiplicity'][name]:>14}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Write Chrome trace-event JSON (the format of `torch.profiler` traces)."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = []
+        for record in self.records:
+            args: Dict[str, Any] = {"step": record.step, "layer": record.layer}
+            device_ms = record.device_ms()
+            if device_ms is not None:
+                args["device_ms"] = device_ms
+            events.append(
+                {
+                    "name": record.name,
+                    "cat": "irrepnet",
+                    "ph": "X",
+                    "ts": (record.start_ns - self._origin_ns) / 1000.0,
+                    "dur": record.wall_ns / 1000.0,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": args,
+                }
+            )
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    elif device.type == "mps":
+        torch.mps.synchronize()
@@ -1,7 +1,9 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import math
+from collections import deque
+from dataclasses import dataclass, field, replace
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import yaml
@@ -37,6 +39,8 @@ class CouplingRule:
     out_edge_tags_any: Optional[Tuple[str, ...]]
     nonconservative: bool
     charge_balance: int
+    probability: float = 1.0
+    route: str = "all"
 
 
 @dataclass(frozen=True)
@@ -88,17 +92,268 @@ class Scenario:
     repeat: int
     measurement: List[MeasurementReadout]
     coupling_rules: List[CouplingRule]
+    seed: int = 0
+    # internal node index -> user-facing node id, and the inverse
+    node_ids: List[int] = field(default_factory=list)
+    node_index_by_id: Dict[int, int] = field(default_factory=dict)
+    # internal edge index -> position among the loaded directed edges (YAML order)
+    edge_order: List[int] = field(default_factory=list)
 
 
-def load_scenario(path: str) -> Scenario:
-    with open(path, "r", encoding="utf-8") as handle:
-        raw: Dict[str, Any] = yaml.safe_load(handle)
+@dataclass(frozen=True)
+class SignedCountEntry:
+    edge: int
+    channel: int
+    value: int
+
+
+@dataclass(frozen=True)
+class TritRule:
+    kind: str
+    name: str
+    channels: Tuple[int, ...]
+    inputs: Tuple[RuleInput, ...]
+    outputs: Tuple[RuleOutput, ...]
+    node_tags_any: Optional[Tuple[str, ...]]
+    out_edge_tags_any: Optional[Tuple[str, ...]]
+    parity: bool
+    toggle_tag: bool
+    charge_balance: int
+    mode: str = "even"
+    probability: float = 1.0
+
+
+@dataclass
+class TritScenario:
+    version: str
+    node_count: int
+    node_tags: List[Tuple[str, ...]]
+    directed_edges: List[DirectedEdge]
+    edge_index_by_id: Dict[int, int]
+    channels: List[ChannelSpec]
+    channel_index: Dict[str, int]
+    signed_counts_init: List[SignedCountEntry]
+    gamma_channel: Optional[int]
+    gamma_ttl: int
+    tag_group: int
+    tag_character: Tuple[int, ...]
+    edge_tag_init: List[int]
+    arrival_mod_k: int
+    rules: List[TritRule]
+    measurement: List[MeasurementReadout]
+    seed: int = 0
+
+
+TRIT_RULE_KINDS = ("scatter_onehop", "gamma_walk_ttl", "bind_emit_gamma", "unbind_absorb_gamma")
+RULE_ROUTES = ("all", "random_one")
+REORDER_METHODS = ("rcm", "bfs")
+TRIT_RULE_MODES = ("even", "random")
+
 
+def load_scenario(path: str, reorder: Optional[str] = None) -> Scenario:
+    return parse_scenario(_read_yaml(path), reorder=reorder)
+
+
+def parse_scenario(raw: Dict[str, Any], reorder: Optional[str] = None) -> Scenario:
     version = str(raw.get("irrepnet_dm", ""))
     if version != "0.2":
         raise ValueError("E_VERSION_MISMATCH: irrepnet_dm must be '0.2'")
 
-    return _parse_v02(raw)
+    scenario = _parse_v02(raw)
+    if reorder is not None:
+        scenario = reorder_scenario(scenario, reorder)
+    return scenario
+
+
+def reorder_scenario(scenario: Scenario, method: str = "rcm") -> Scenario:
+    """
+    Renumber nodes (reverse Cuthill-McKee or BFS over the undirected graph) and edges
+    (grouped by first layer, then destination, then source) for memory locality.
+    User-facing node and edge IDs are unchanged; `node_ids` / `edge_order` record the mapping.
+    """
+    if method not in REORDER_METHODS:
+        raise ValueError(f"E_REORDER_METHOD: {method}")
+    adjacency: List[set[int]] = [set() for _ in range(scenario.node_count)]
+    for edge in scenario.directed_edges:
+        if edge.src != edge.dst:
+            adjacency[edge.src].add(edge.dst)
+            adjacency[edge.dst].add(edge.src)
+    node_order = _rcm_order(adjacency) if method == "rcm" else _bfs_order(adjacency)
+    new_node = {old: new for new, old in enumerate(node_order)}
+
+    first_layer: Dict[int, int] = {}
+    for layer_idx, layer in enumerate(scenario.layers):
+        for edge_idx in layer:
+            first_layer.setdefault(edge_idx, layer_idx)
+    unscheduled = len(scenario.layers)
+    edges = scenario.directed_edges
+    edge_order = sorted(
+        range(len(edges)),
+        key=lambda e: (first_layer.get(e, unscheduled), new_node[edges[e].dst], new_node[edges[e].src], e),
+    )
+    new_edge = {old: new for new, old in enumerate(edge_order)}
+
+    directed_edges = [
+        replace(edges[old], src=new_node[edges[old].src], dst=new_node[edges[old].dst]) for old in edge_order
+    ]
+    node_ids = [scenario.node_ids[old] for old in node_order]
+    return replace(
+        scenario,
+        node_gauge=[scenario.node_gauge[old] for old in node_order],
+        node_tags=[scenario.node_tags[old] for old in node_order],
+        directed_edges=directed_edges,
+        edge_index_by_id={edge.id: idx for idx, edge in enumerate(directed_edges)},
+        fusion_mask=[scenario.fusion_mask[old] for old in edge_order],
+        counts_init=[replace(entry, edge=new_edge[entry.edge]) for entry in scenario.counts_init],
+        layers=[sorted(new_edge[e] for e in layer) for layer in scenario.layers],
+        measurement=[
+            replace(readout, edges=tuple(new_edge[e] for e in readout.edges)) for readout in scenario.measurement
+        ],
+        node_ids=node_ids,
+        node_index_by_id={node_id: idx for idx, node_id in enumerate(node_ids)},
+        edge_order=[scenario.edge_order[old] for old in edge_order],
+    )
+
+
+@dataclass(frozen=True)
+class PhaseReduction:
+    """Declared phase `shift + d * j` of Z_k is internal phase j of Z_{k/d}."""
+
+    k: int
+    d: int
+    shift: int
+
+    @property
+    def internal_k(self) -> int:
+        return self.k // self.d
+
+    def internal(self, phase: int) -> Optional[int]:
+        """Internal phase of a declared one, or None outside the coset."""
+        offset = (int(phase) - self.shift) % self.k
+        return None if offset % self.d else offset // self.d
+
+    def declared(self, phase: int) -> int:
+        return (self.shift + self.d * int(phase)) % self.k
+
+
+def detect_phase_reduction(scenario: Scenario) -> Optional[PhaseReduction]:
+    """
+    Largest d such that the dynamics stay in one coset `shift + d*Z` of Z_k: every gauge and
+    offset (phase differences) is a multiple of d, and every start phase and `fixed:` emission
+    is congruent to one `shift` mod d (`delta` emissions start at phase 0, forcing shift 0).
+    Masks never see the other phases, so they impose nothing. None when d is 1.
+    """
+    if any(instr.kind == "sum" for rule in scenario.coupling_rules for instr in rule.phase.values()):
+        return None
+    d = scenario.k
+    for gauge in scenario.node_gauge:
+        d = math.gcd(d, gauge)
+    for edge in scenario.directed_edges:
+        d = math.gcd(d, edge.phase_offset)
+    phases = [entry.phase for entry in scenario.counts_init]
+    for rule in scenario.coupling_rules:
+        for instr in rule.phase.values():
+            if instr.kind == "fixed" and instr.value is not None:
+                phases.append(instr.value)
+            elif instr.kind == "delta":
+                phases.append(0)
+    for phase in phases:
+        d = math.gcd(d, phase - phases[0])
+    if d == 1:
+        return None
+    return PhaseReduction(k=scenario.k, d=d, shift=phases[0] % d if phases else 0)
+
+
+def reduce_scenario(scenario: Scenario, reduction: PhaseReduction) -> Scenario:
+    """The same scenario over Z_{k/d}, in the internal phases of `reduction`."""
+    d, k = reduction.d, reduction.internal_k
+
+    def internal(phase: int) -> int:
+        value = reduction.internal(phase)
+        if value is None:
+            raise ValueError(f"E_PHASE_REDUCTION: phase {phase} is outside the reduced coset")
+        return value
+
+    def instruction(instr: PhaseInstruction) -> PhaseInstruction:
+        if instr.kind == "fixed" and instr.value is not None:
+            return replace(instr, value=internal(instr.value))
+        return instr
+
+    rules = [
+        replace(rule, phase={channel: instruction(instr) for channel, instr in rule.phase.items()})
+        for rule in scenario.coupling_rules
+    ]
+    return replace(
+        scenario,
+        k=k,
+        node_gauge=[gauge % reduction.k // d for gauge in scenario.node_gauge],
+        directed_edges=[
+            replace(edge, phase_offset=edge.phase_offset % reduction.k // d) for edge in scenario.directed_edges
+        ],
+        fusion_mask=[
+            [[row[reduction.declared(j)] for j in range(k)] for row in mask] for mask in scenario.fusion_mask
+        ],
+        counts_init=[replace(entry, phase=internal(entry.phase)) for entry in scenario.counts_init],
+        coupling_rules=rules,
+    )
+
+
+def _bfs_order(adjacency: Sequence[set[int]]) -> List[int]:
+    visited = [False] * len(adjacency)
+    order: List[int] = []
+    for start in range(len(adjacency)):
+        if visited[start]:
+            continue
+        visited[start] = True
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbor in sorted(adjacency[node]):
+                if not visited[neighbor]:
+                    visited[neighbor] = True
+                    queue.append(neighbor)
+    return order
+
+
+def _rcm_order(adjacency: Sequence[set[int]]) -> List[int]:
+    degree = [len(neighbors) for neighbors in adjacency]
+
+    def by_degree(node: int) -> Tuple[int, int]:
+        return degree[node], node
+
+    visited = [False] * len(adjacency)
+    order: List[int] = []
+    for start in sorted(range(len(adjacency)), key=by_degree):
+        if visited[start]:
+            continue
+        visited[start] = True
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbor in sorted(adjacency[node], key=by_degree):
+                if not visited[neighbor]:
+                    visited[neighbor] = True
+                    queue.append(neighbor)
+    return order[::-1]
+
+
+def load_trit_scenario(path: str) -> TritScenario:
+    return parse_trit_scenario(_read_yaml(path))
+
+
+def parse_trit_scenario(raw: Dict[str, Any]) -> TritScenario:
+    version = str(raw.get("irrepnet_dm", ""))
+    if version != "0.3":
+        raise ValueError("E_VERSION_MISMATCH: irrepnet_dm must be '0.3'")
+
+    return _parse_v03(raw)
+
+
+def _read_yaml(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return yaml.safe_load(handle)
 
 
 # --------------------------------------------------------------------------- #
@@ -113,6 +368,110 @@ def _parse_v02(raw: Dict[str, Any]) -> Scenario:
     if not (2 <= k <= 256):
         raise ValueError("E_PHASE_K_INVALID: k must be in [2..256]")
 
+    node_entries = _parse_nodes(raw)
+    node_gauge: List[int] = []
+    node_tags: List[Tuple[str, ...]] = []
+    for entry in node_entries:
+        gauge = int(entry.get("gauge_phase", 0))
+        if not (0 <= gauge < k):
+            raise ValueError("E_GAUGE_PHASE_RANGE")
+        node_gauge.append(gauge)
+        node_tags.append(_normalize_tags(entry.get("tags") or entry.get("tag")))
+
+    directed_edges, edge_index_by_id = _parse_directed_edges(raw, len(node_gauge), k)
+    channels, channel_index = _parse_channels(raw)
+
+    fusion_mask = _build_fusion_mask(raw, directed_edges, channels, channel_index, k)
+    counts_init = _parse_counts_init(raw.get("counts_init"), edge_index_by_id, channel_index, k)
+    layers, repeat = _parse_dag(raw.get("dag"), edge_index_by_id)
+    measurement = _parse_measurement(raw.get("measurement"), edge_index_by_id, channel_index)
+    coupling_rules = _parse_coupling_rules(
+        raw.get("coupling_rules"),
+        channel_index,
+        channels,
+        k,
+    )
+
+    return Scenario(
+        version="0.2",
+        k=k,
+        node_count=len(node_gauge),
+        node_gauge=node_gauge,
+        node_tags=node_tags,
+        directed_edges=directed_edges,
+        edge_index_by_id=edge_index_by_id,
+        fusion_mask=fusion_mask,
+        channels=channels,
+        channel_index=channel_index,
+        counts_init=counts_init,
+        layers=layers,
+        repeat=repeat,
+        measurement=measurement,
+        coupling_rules=coupling_rules,
+        seed=_parse_seed(raw),
+        node_ids=list(range(len(node_gauge))),
+        node_index_by_id={node_id: node_id for node_id in range(len(node_gauge))},
+        edge_order=list(range(len(directed_edges))),
+    )
+
+
+def _parse_v03(raw: Dict[str, Any]) -> TritScenario:
+    node_entries = _parse_nodes(raw)
+    node_tags = [_normalize_tags(entry.get("tags") or entry.get("tag")) for entry in node_entries]
+    directed_edges, edge_index_by_id = _parse_directed_edges(raw, len(node_entries), None)
+    channels, channel_index = _parse_channels(raw)
+
+    gamma_cfg = raw.get("gamma") or {}
+    gamma_channel: Optional[int] = None
+    if "channel" in gamma_cfg:
+        gamma_channel = _resolve_channel_index(gamma_cfg["channel"], channel_index)
+    elif "gamma" in channel_index:
+        gamma_channel = channel_index["gamma"]
+    gamma_ttl = int(gamma_cfg.get("ttl", 0))
+    if gamma_ttl < 0:
+        raise ValueError("E_GAMMA_TTL_RANGE")
+
+    tag_group, tag_character, edge_tag_init = _parse_edge_tags(raw.get("edge_tags"), edge_index_by_id)
+    signed_counts_init = _parse_signed_counts_init(
+        raw.get("signed_counts_init"), edge_index_by_id, channel_index
+    )
+    rules = _parse_trit_rules(raw.get("rules"), channel_index, channels, gamma_channel)
+
+    measurement_raw = raw.get("measurement") or {}
+    arrival_mod_k = int(measurement_raw.get("arrival_mod_k", 0))
+    if arrival_mod_k < 0 or arrival_mod_k == 1:
+        raise ValueError("E_ARRIVAL_MOD_K_RANGE: arrival_mod_k must be 0 (off) or >= 2")
+    measurement = _parse_measurement(measurement_raw, edge_index_by_id, channel_index)
+
+    return TritScenario(
+        version="0.3",
+        node_count=len(node_entries),
+        node_tags=node_tags,
+        directed_edges=directed_edges,
+        edge_index_by_id=edge_index_by_id,
+        channels=channels,
+        channel_index=channel_index,
+        signed_counts_init=signed_counts_init,
+        gamma_channel=gamma_channel,
+        gamma_ttl=gamma_ttl,
+        tag_group=tag_group,
+        tag_character=tag_character,
+        edge_tag_init=edge_tag_init,
+        arrival_mod_k=arrival_mod_k,
+        rules=rules,
+        measurement=measurement,
+        seed=_parse_seed(raw),
+    )
+
+
+def _parse_seed(raw: Dict[str, Any]) -> int:
+    seed = int(raw.get("seed", 0))
+    if not (0 <= seed < 2**32):
+        raise ValueError("E_SEED_RANGE: seed must be in [0..2**32)")
+    return seed
+
+
+def _parse_nodes(raw: Dict[str, Any]) -> List[Dict[str, Any]]:
     nodes = raw.get("nodes") or []
     if not nodes:
         raise ValueError("E_NODES_EMPTY")
@@ -126,17 +485,14 @@ def _parse_v02(raw: Dict[str, Any]) -> Scenario:
     node_ids = sorted(node_index.keys())
     if node_ids != list(range(len(node_ids))):
         raise ValueError("E_NODE_ID_GAP: node IDs must be contiguous starting at 0")
+    return [node_index[nid] for nid in node_ids]
 
-    node_gauge: List[int] = []
-    node_tags: List[Tuple[str, ...]] = []
-    for nid in node_ids:
-        entry = node_index[nid]
-        gauge = int(entry.get("gauge_phase", 0))
-        if not (0 <= gauge < k):
-            raise ValueError("E_GAUGE_PHASE_RANGE")
-        node_gauge.append(gauge)
-        node_tags.append(_normalize_tags(entry.get("tags") or entry.get("tag")))
 
+def _parse_directed_edges(
+    raw: Dict[str, Any],
+    node_count: int,
+    k: Optional[int],
+) -> Tuple[List[DirectedEdge], Dict[int, int]]:
     edges = raw.get("edges") or []
     if not edges:
         raise ValueError("E_EDGES_EMPTY")
@@ -161,13 +517,15 @@ def _parse_v02(raw: Dict[str, Any]) -> Scenario:
             raise ValueError("E_DUP_DIRECTED_EDGE_ID")
         src = int(entry["src"])
         dst = int(entry["dst"])
-        if src >= len(node_gauge) or dst >= len(node_gauge):
+        if src >= node_count or dst >= node_count:
             raise ValueError("E_DIRECTED_EDGE_NODE_RANGE")
         edge_ref = int(entry["edge_ref"])
         if edge_ref not in undirected_by_id:
             raise ValueError(f"E_DIRECTED_EDGE_REF_INVALID: {edge_ref}")
-        base = int(undirected_by_id[edge_ref].get("phase_offset", 0))
-        phase_offset = int(entry.get("phase_offset", base)) % k
+        phase_offset = 0
+        if k is not None:
+            base = int(undirected_by_id[edge_ref].get("phase_offset", 0))
+            phase_offset = int(entry.get("phase_offset", base)) % k
 
         tags = _normalize_tags(entry.get("tags"))
         inherited = _normalize_tags(
@@ -189,7 +547,10 @@ def _parse_v02(raw: Dict[str, Any]) -> Scenario:
 
     if not directed_edges:
         raise ValueError("E_DIRECTED_EDGES_DISABLED")
+    return directed_edges, edge_index_by_id
 
+
+def _parse_channels(raw: Dict[str, Any]) -> Tuple[List[ChannelSpec], Dict[str, int]]:
     channels_raw = raw.get("channels") or []
     if not channels_raw:
         raise ValueError("E_CHANNELS_EMPTY")
@@ -203,35 +564,7 @@ def _parse_v02(raw: Dict[str, Any]) -> Scenario:
         neutral = bool(entry.get("neutral", False))
         channel_index[name] = len(channels)
         channels.append(ChannelSpec(name=name, charge=charge, neutral=neutral))
-
-    fusion_mask = _build_fusion_mask(raw, directed_edges, channels, channel_index, k)
-    counts_init = _parse_counts_init(raw.get("counts_init"), edge_index_by_id, channel_index, k)
-    layers, repeat = _parse_dag(raw.get("dag"), edge_index_by_id)
-    measurement = _parse_measurement(raw.get("measurement"), edge_index_by_id, channel_index)
-    coupling_rules = _parse_coupling_rules(
-        raw.get("coupling_rules"),
-        channel_index,
-        channels,
-        k,
-    )
-
-    return Scenario(
-        version="0.2",
-        k=k,
-        node_count=len(node_gauge),
-        node_gauge=node_gauge,
-        node_tags=node_tags,
-        directed_edges=directed_edges,
-        edge_index_by_id=edge_index_by_id,
-        fusion_mask=fusion_mask,
-        channels=channels,
-        channel_index=channel_index,
-        counts_init=counts_init,
-        layers=layers,
-        repeat=repeat,
-        measurement=measurement,
-        coupling_rules=coupling_rules,
-    )
+    return channels, channel_index
 
 
 def _build_fusion_mask(
@@ -432,6 +765,10 @@ def _parse_coupling_rules(
         if charge_balance != 0 and not nonconservative:
             raise ValueError(f"E_RULE_CHARGE_IMBALANCE: {name}")
 
+        route = str(rule.get("route", "all"))
+        if route not in RULE_ROUTES:
+            raise ValueError(f"E_RULE_ROUTE_UNKNOWN: {name} ({route})")
+
         result.append(
             CouplingRule(
                 name=name,
@@ -442,6 +779,142 @@ def _parse_coupling_rules(
                 out_edge_tags_any=out_edge_tags_any if out_edge_tags_any else None,
                 nonconservative=nonconservative,
                 charge_balance=charge_balance,
+                probability=_parse_probability(rule, name),
+                route=route,
+            )
+        )
+    return result
+
+
+def _parse_edge_tags(
+    edge_tags: Optional[Dict[str, Any]],
+    edge_index_by_id: Dict[int, int],
+) -> Tuple[int, Tuple[int, ...], List[int]]:
+    initial = [0] * len(edge_index_by_id)
+    if not edge_tags:
+        return 1, (1,), initial
+    group = int(edge_tags.get("group", 2))
+    if not (1 <= group <= 16):
+        raise ValueError("E_EDGE_TAG_GROUP_RANGE: group must be in [1..16]")
+    character_raw = edge_tags.get("character")
+    if character_raw is None:
+        character = tuple(1 if tag % 2 == 0 else -1 for tag in range(group))
+    else:
+        character = tuple(int(value) for value in character_raw)
+    if len(character) != group or any(value not in (-1, 1) for value in character):
+        raise ValueError("E_EDGE_TAG_CHARACTER: character must list +1/-1 for every tag")
+    for entry in edge_tags.get("init") or []:
+        edge_id = int(entry["edge"])
+        if edge_id not in edge_index_by_id:
+            raise ValueError(f"E_EDGE_TAG_EDGE_UNKNOWN: {edge_id}")
+        tag = int(entry.get("tag", 0))
+        if not (0 <= tag < group):
+            raise ValueError("E_EDGE_TAG_RANGE")
+        initial[edge_index_by_id[edge_id]] = tag
+    return group, character, initial
+
+
+def _parse_signed_counts_init(
+    counts_init: Optional[Sequence[Dict[str, Any]]],
+    edge_index_by_id: Dict[int, int],
+    channel_index: Dict[str, int],
+) -> List[SignedCountEntry]:
+    if not counts_init:
+        return []
+    result: List[SignedCountEntry] = []
+    for entry in counts_init:
+        edge_id = int(entry["edge"])
+        if edge_id not in edge_index_by_id:
+            raise ValueError(f"E_COUNTS_INIT_EDGE_UNKNOWN: {edge_id}")
+        channel_raw = entry.get("channel")
+        if channel_raw is None:
+            raise ValueError("E_COUNTS_INIT_CHANNEL_REQUIRED")
+        channel = _resolve_channel_index(channel_raw, channel_index)
+        result.append(
+            SignedCountEntry(edge=edge_index_by_id[edge_id], channel=channel, value=int(entry.get("value", 0)))
+        )
+    return result
+
+
+def _parse_trit_rules(
+    rules: Optional[Sequence[Dict[str, Any]]],
+    channel_index: Dict[str, int],
+    channels: Sequence[ChannelSpec],
+    gamma_channel: Optional[int],
+) -> List[TritRule]:
+    if not rules:
+        return []
+    result: List[TritRule] = []
+    for rule in rules:
+        kind = str(rule.get("kind", ""))
+        if kind not in TRIT_RULE_KINDS:
+            raise ValueError(f"E_RULE_KIND_UNKNOWN: {kind}")
+        name = str(rule.get("name", kind))
+        scope = rule.get("scope") or {}
+        node_tags_any = _normalize_tags(scope.get("nodes_any"))
+        out_edge_tags_any = _normalize_tags(scope.get("out_edges_any"))
+        if kind != "scatter_onehop" and gamma_channel is None:
+            raise ValueError(f"E_RULE_GAMMA_CHANNEL_MISSING: {name}")
+
+        inputs = tuple(
+            RuleInput(channel=_resolve_channel_index(entry["ch"], channel_index), minimum=1, sum_over_phases=True)
+            for entry in rule.get("in") or []
+        )
+        outputs_raw = rule.get("out")
+        if outputs_raw is None and kind == "bind_emit_gamma":
+            outputs_raw = [{"ch": gamma_channel, "add": 1}]
+        outputs: List[RuleOutput] = []
+        for entry in outputs_raw or []:
+            add = int(entry.get("add", 1))
+            if add < 0:
+                raise ValueError(f"E_RULE_OUTPUT_NEGATIVE: {name}")
+            outputs.append(RuleOutput(channel=_resolve_channel_index(entry["ch"], channel_index), add=add))
+
+        if kind == "scatter_onehop":
+            channels_raw = rule.get("channels")
+            if channels_raw is None:
+                routed = tuple(idx for idx in range(len(channels)) if idx != gamma_channel)
+            else:
+                routed = tuple(_resolve_channel_index(ch, channel_index) for ch in channels_raw)
+            if gamma_channel is not None and gamma_channel in routed:
+                raise ValueError(f"E_RULE_SCATTER_GAMMA: {name} routes gamma; use gamma_walk_ttl")
+        elif kind == "gamma_walk_ttl":
+            routed = (gamma_channel,)
+        else:
+            routed = ()
+
+        if kind == "bind_emit_gamma":
+            if not inputs:
+                raise ValueError(f"E_RULE_INPUT_EMPTY: {name}")
+            if any(out.channel != gamma_channel for out in outputs):
+                raise ValueError(f"E_RULE_BIND_OUTPUT: {name} may only create gamma")
+
+        charge_balance = 0
+        if kind == "unbind_absorb_gamma":
+            charge_balance = sum(channels[out.channel].charge * out.add for out in outputs)
+            if charge_balance != 0 and not bool(rule.get("nonconservative", False)):
+                raise ValueError(f"E_RULE_CHARGE_IMBALANCE: {name}")
+
+        mode = str(rule.get("mode", "even"))
+        if mode not in TRIT_RULE_MODES:
+            raise ValueError(f"E_RULE_MODE_UNKNOWN: {name} ({mode})")
+        if mode == "random" and kind not in ("scatter_onehop", "gamma_walk_ttl"):
+            raise ValueError(f"E_RULE_MODE_UNSUPPORTED: {name} ({kind})")
+
+        result.append(
+            TritRule(
+                kind=kind,
+                name=name,
+                channels=routed,
+                inputs=inputs,
+                outputs=tuple(outputs),
+                node_tags_any=node_tags_any if node_tags_any else None,
+                out_edge_tags_any=out_edge_tags_any if out_edge_tags_any else None,
+                parity=bool(rule.get("parity", False)),
+                toggle_tag=bool(rule.get("toggle_tag", False)),
+                charge_balance=charge_balance,
+                mode=mode,
+                probability=_parse_probability(rule, name),
             )
         )
     return result
@@ -451,6 +924,13 @@ def _parse_coupling_rules(
 # Utility helpers
 
 
+def _parse_probability(rule: Dict[str, Any], name: str) -> float:
+    probability = float(rule.get("probability", 1.0))
+    if not (0.0 < probability <= 1.0):
+        raise ValueError(f"E_RULE_PROBABILITY_RANGE: {name} requires 0 < probability <= 1")
+    return probability
+
+
 def _normalize_tags(raw: Any) -> Tuple[str, ...]:
     if raw is None:
         return tuple()
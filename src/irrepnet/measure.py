@@ -31,9 +31,6 @@ def measure_counts(
         return 0.0
 
     device = counts.device
-    real_dtype = _real_dtype_for_device(device)
-    complex_dtype = torch.complex64 if real_dtype == torch.float32 else torch.complex128
-
     edge_idx = torch.tensor(readout_edges, dtype=torch.long, device=device)
     selected = counts.index_select(0, edge_idx)  # [E_sel, C, k]
 
@@ -43,7 +40,16 @@ def measure_counts(
         channel_idx = torch.tensor(list(channels), dtype=torch.long, device=device)
         selected = selected.index_select(1, channel_idx)
 
-    n_g = selected.sum(dim=(0, 1)).to(real_dtype)  # [k]
+    return phasor_intensity(selected.sum(dim=(0, 1)), k)
+
+
+def phasor_intensity(histogram: torch.Tensor, k: int) -> float:
+    """|sum_g n_g * chi(g)|^2 for a [k] histogram of phase (or arrival-tick) bins."""
+    device = histogram.device
+    real_dtype = _real_dtype_for_device(device)
+    complex_dtype = torch.complex64 if real_dtype == torch.float32 else torch.complex128
+
+    n_g = histogram.to(real_dtype)  # [k]
     chi = roots_of_unity(k, device=device, real_dtype=real_dtype).to(complex_dtype)  # [k]
     amplitude = (n_g.to(complex_dtype) * chi).sum()
     return float(amplitude.abs().pow(2).item())
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import mmap
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .loader import Scenario, detect_phase_reduction, load_scenario, reduce_scenario
+from .plan import min_chunk_rows, plan_layer
+
+MASK_LAYOUTS = ("dense", "compact")
+STORAGE_KINDS = ("memory", "mmap")
+STATE_KINDS = ("edges", "inbox")
+COUNT_DTYPES = (torch.int16, torch.int32, torch.int64)
+
+_INDEX_BYTES = 8  # int64 index tensors
+
+
+@dataclass(frozen=True)
+class MemoryLayout:
+    """
+    Storage choices for `IRREPnetSim`:
+    `masks="compact"` keeps one row per distinct [C, k] edge mask plus an edge -> row index,
+    `chunk_rows` bounds the number of layer edges propagated at once,
+    `storage="mmap"` keeps `counts` and `counts_next` in memory-mapped files under `storage_dir`
+    (a temporary directory when None) for states larger than RAM (CPU only),
+    `state="inbox"` keeps one [C, k] histogram per node instead of one per edge (see
+    `inbox.InboxState`), for graphs whose mean out-degree is well above 1 (torch backend only).
+    """
+
+    count_dtype: torch.dtype = torch.int32
+    masks: str = "dense"
+    chunk_rows: Optional[int] = None
+    storage: str = "memory"
+    storage_dir: Optional[str] = None
+    state: str = "edges"
+
+
+@dataclass
+class MemoryEstimate:
+    layout: MemoryLayout
+    batch: int
+    components: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.components.values())
+
+    def fits(self, budget: int) -> bool:
+        return self.total_bytes <= budget
+
+    def report(self) -> str:
+        layout = self.layout
+        chunk = layout.chunk_rows if layout.chunk_rows else "full layer"
+        lines = [
+            f"layout: counts={str(layout.count_dtype).replace('torch.', '')} masks={layout.masks} "
+            f"chunk={chunk} storage={layout.storage} state={layout.state} batch={self.batch}"
+        ]
+        for name, size in self.components.items():
+            lines.append(f"  {name:<22}{_format_bytes(size):>12}")
+        lines.append(f"  {'peak':<22}{_format_bytes(self.total_bytes):>12}")
+        return "\n".join(lines)
+
+
+def _format_bytes(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024.0 or unit == "GiB":
+            return f"{value:.1f} {unit}" if unit != "B" else f"{int(value)} B"
+        value /= 1024.0
+    return f"{value:.1f} GiB"  # pragma: no cover
+
+
+def _as_scenario(scenario: str | Scenario, reduce_phases: bool = False) -> Scenario:
+    scenario = scenario if isinstance(scenario, Scenario) else load_scenario(scenario)
+    reduction = detect_phase_reduction(scenario) if reduce_phases else None
+    return scenario if reduction is None else reduce_scenario(scenario, reduction)
+
+
+def _itemsize(dtype: torch.dtype) -> int:
+    return torch.empty((), dtype=dtype).element_size()
+
+
+def estimate_memory(
+    scenario: str | Scenario,
+    *,
+    batch: int = 1,
+    dtype: torch.dtype = torch.int32,
+    layout: Optional[MemoryLayout] = None,
+    reduce_phases: bool = False,
+) -> MemoryEstimate:
+    """
+    Upper bound on peak device bytes of an `IRREPnetSim` for `scenario`, without allocating.
+    `batch` replicas share masks, edge tables and plans; state and layer temporaries scale with it.
+    With `reduce_phases` the state is sized at k/d, as the sim runs a reducible scenario.
+    """
+    scenario = _as_scenario(scenario, reduce_phases)
+    layout = layout or MemoryLayout(count_dtype=dtype)
+    if layout.masks not in MASK_LAYOUTS:
+        raise ValueError(f"E_MEMORY_MASK_LAYOUT: {layout.masks}")
+    if layout.count_dtype not in COUNT_DTYPES:
+        raise ValueError(f"E_MEMORY_DTYPE: {layout.count_dtype}")
+    if layout.storage not in STORAGE_KINDS:
+        raise ValueError(f"E_MEMORY_STORAGE: {layout.storage}")
+    if layout.state not in STATE_KINDS:
+        raise ValueError(f"E_MEMORY_STATE: {layout.state}")
+    if layout.state == "inbox" and layout.storage != "memory":
+        raise ValueError("E_MEMORY_STATE: the inbox state is kept in memory")
+    if batch < 1:
+        raise ValueError("E_MEMORY_BATCH_RANGE")
+
+    edges = len(scenario.directed_edges)
+    channels = len(scenario.channels)
+    k = scenario.k
+    cell = channels * k
+    count_bytes = _itemsize(layout.count_dtype)
+    edge_dst = [edge.dst for edge in scenario.directed_edges]
+    out_index: List[List[int]] = [[] for _ in range(scenario.node_count)]
+    for edge_idx, edge in enumerate(scenario.directed_edges):
+        out_index[edge.src].append(edge_idx)
+
+    components: Dict[str, int] = {}
+    components["counts"] = 2 * batch * edges * cell * count_bytes  # counts + counts_next
+    staged_rows = 0
+    if layout.masks == "dense":
+        components["fusion_mask"] = edges * cell
+    else:
+        distinct = len({tuple(tuple(row) for row in mask) for mask in scenario.fusion_mask})
+        components["fusion_mask"] = distinct * cell + edges * _INDEX_BYTES
+    # src, dst (int64), edge_offset (uint8), gauge (uint8), node keys (int64)
+    components["edge_tables"] = edges * (2 * _INDEX_BYTES + 1) + scenario.node_count * (1 + _INDEX_BYTES)
+
+    plan_bytes = 0
+    temp_peak = 0
+    coupled = bool(scenario.coupling_rules)
+    for layer in scenario.layers:
+        for chunk in plan_layer(layer, edge_dst, out_index, layout.chunk_rows):
+            rows = chunk.rows
+            fan = len(chunk.fan_rows)
+            staged_rows = max(staged_rows, rows)
+            plan_bytes += (2 * rows + 2 * fan) * _INDEX_BYTES
+            temp = rows * (2 * _INDEX_BYTES + 4 * 2)  # src/dst gathers, int16 offsets and gauges
+            temp += rows * channels * _INDEX_BYTES  # per-channel delta
+            temp += rows * cell * 2 * _INDEX_BYTES  # shift index and its modulo temporary
+            temp += rows * cell * (1 + 3 * count_bytes)  # mask, gathered and shifted counts, allowed
+            if layout.state == "edges":
+                temp += fan * cell * count_bytes  # fan-out gather
+            if coupled:
+                temp += len(chunk.nodes) * cell * count_bytes  # per-node incoming
+            temp_peak = max(temp_peak, temp)
+    components["plans"] = plan_bytes
+    components["layer_temporaries"] = batch * temp_peak
+    if layout.state == "inbox":
+        # node inboxes (current and next) plus the enabled/fed edge flags; the sparse residual
+        # (start counts, rule emissions) is not bounded here
+        components["counts"] = 2 * batch * scenario.node_count * cell * count_bytes + 2 * edges
+    if layout.storage == "mmap":
+        # only the rows of the chunk being propagated are staged, and its gather indices and masks
+        # (built per chunk, counted in the layer temporaries) are dropped after it; the files live
+        # in the page cache
+        components["counts"] = batch * staged_rows * cell * count_bytes
+    return MemoryEstimate(layout=layout, batch=batch, components=components)
+
+
+def choose_layout(
+    scenario: str | Scenario,
+    budget: int,
+    *,
+    batch: int = 1,
+    dtype: torch.dtype = torch.int32,
+    max_count: Optional[int] = None,
+    reduce_phases: bool = False,
+) -> MemoryEstimate:
+    """
+    Cheapest-to-run layout whose estimate fits `budget` bytes. Tried in order: as requested,
+    compact masks, compact masks with decreasing chunk sizes, then narrower count dtypes, the
+    same with node-inbox state, and finally with memory-mapped counts (batch 1 only).
+    A narrower dtype is only considered when `max_count` bounds every count bin.
+    Raises `E_MEMORY_BUDGET` with the smallest estimate when nothing fits.
+    """
+    scenario = _as_scenario(scenario, reduce_phases)
+    edge_dst = [edge.dst for edge in scenario.directed_edges]
+    widest = max((len(layer) for layer in scenario.layers), default=1)
+    smallest = min_chunk_rows(scenario.layers, edge_dst)
+    chunk_sizes: List[Optional[int]] = [None]
+    size = widest // 2
+    while size > smallest:
+        chunk_sizes.append(size)
+        size //= 2
+    if smallest < widest:
+        chunk_sizes.append(smallest)
+
+    dtypes = [dtype]
+    if max_count is not None:
+        for candidate in sorted(COUNT_DTYPES, key=_itemsize, reverse=True):
+            if _itemsize(candidate) < _itemsize(dtype) and max_count <= torch.iinfo(candidate).max:
+                dtypes.append(candidate)
+
+    base = MemoryLayout(count_dtype=dtype)
+    candidates = [base, replace(base, masks="compact")]
+    for count_dtype in dtypes:
+        for chunk in chunk_sizes[1:] if count_dtype == dtype else chunk_sizes:
+            candidates.append(MemoryLayout(count_dtype=count_dtype, masks="compact", chunk_rows=chunk))
+    for count_dtype in dtypes:
+        for chunk in chunk_sizes:
+            candidates.append(MemoryLayout(count_dtype=count_dtype, masks="compact", chunk_rows=chunk, state="inbox"))
+    if batch == 1:
+        for count_dtype in dtypes:
+            for chunk in chunk_sizes:
+                mapped = MemoryLayout(count_dtype=count_dtype, masks="compact", chunk_rows=chunk, storage="mmap")
+                candidates.append(mapped)
+
+    best: Optional[MemoryEstimate] = None
+    for layout in candidates:
+        estimate = estimate_memory(scenario, batch=batch, layout=layout)
+        if estimate.fits(budget):
+            return estimate
+        if best is None or estimate.total_bytes < best.total_bytes:
+            best = estimate
+    assert best is not None
+    raise ValueError(
+        f"E_MEMORY_BUDGET: need at least {_format_bytes(best.total_bytes)}, budget {_format_bytes(budget)}\n"
+        f"{best.report()}"
+    )
+
+
+class MappedCounts:
+    """
+    One [E, C, k] count buffer backed by a file mapped into memory: the OS pages rows in and out,
+    so the state may exceed RAM. `tensor` is a CPU tensor sharing the mapping.
+    """
+
+    def __init__(self, path: str, shape: Tuple[int, int, int], dtype: torch.dtype):
+        self.path = path
+        self.shape = shape
+        self.row_bytes = shape[1] * shape[2] * _itemsize(dtype)
+        size = shape[0] * self.row_bytes
+        with open(path, "wb") as handle:
+            handle.truncate(max(size, 1))  # sparse: reads as zeros
+        with open(path, "r+b") as handle:
+            self._map = mmap.mmap(handle.fileno(), max(size, 1))
+        numpy_dtype = torch.empty((), dtype=dtype).numpy().dtype
+        array = np.frombuffer(self._map, dtype=numpy_dtype, count=shape[0] * shape[1] * shape[2])
+        self.tensor = torch.from_numpy(array.reshape(shape))
+
+    def prefetch(self, lo: int, hi: int) -> None:
+        """Ask the OS to start reading rows [lo, hi) in the background."""
+        if hi <= lo or not hasattr(mmap, "MADV_WILLNEED"):
+            return
+        start = (lo * self.row_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        self._map.madvise(mmap.MADV_WILLNEED, start, hi * self.row_bytes - start)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+# violation bits, in report order
+NEGATIVE = 1
+SATURATED = 2
+CONSERVATION = 4
+_VIOLATIONS = ((NEGATIVE, "NEGATIVE"), (SATURATED, "SATURATED"), (CONSERVATION, "CONSERVATION"))
+
+
+@dataclass
+class InvariantReport:
+    step: int
+    violations: Dict[str, int] = field(default_factory=dict)  # name -> first step it was seen
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+
+class InvariantMonitor:
+    """
+    On-device invariant checks for `IRREPnetSim`, run from a step hook every `every` steps:
+    counts are non-negative, below the count dtype's maximum (saturation / overflow guard),
+    and, optionally, `conserve` quantities ("charge" via `channel_charges`, or channel names)
+    keep the value they had at the first observation.
+
+    Checks are device reductions OR-ed into a latched flag; nothing is read back until
+    `checkpoint()` (one sync), which raises `E_INVARIANT_<KIND>` on a violation.
+    `checkpoint_every` runs checkpoints automatically. Per-channel totals and net charge of the
+    last `history` observations are kept in a device ring buffer.
+    """
+
+    def __init__(
+        self,
+        sim: Any,
+        *,
+        every: int = 1,
+        conserve: Sequence[str] = (),
+        checkpoint_every: Optional[int] = None,
+        history: int = 256,
+    ):
+        if every < 1:
+            raise ValueError("E_MONITOR_EVERY_RANGE")
+        if checkpoint_every is not None and checkpoint_every < 1:
+            raise ValueError("E_MONITOR_CHECKPOINT_RANGE")
+        if history < 1:
+            raise ValueError("E_MONITOR_HISTORY_RANGE")
+        self.sim = sim
+        self.every = every
+        self.checkpoint_every = checkpoint_every
+        self.conserve = tuple(conserve)
+        self.conserve_charge = "charge" in self.conserve
+        conserve_channels: List[int] = []
+        for name in self.conserve:
+            if name == "charge":
+                continue
+            if name not in sim.scenario.channel_index:
+                raise ValueError(f"E_MONITOR_CHANNEL_UNKNOWN: {name}")
+            conserve_channels.append(sim.scenario.channel_index[name])
+
+        device = sim.device
+        self._conserve_index = torch.tensor(conserve_channels, dtype=torch.int64, device=device)
+        self._charges = sim.channel_charges.to(torch.int64)
+        self._limit = torch.iinfo(sim.counts.dtype).max
+        self._flags = torch.zeros((), dtype=torch.int64, device=device)
+        self._first = torch.full((len(_VIOLATIONS),), -1, dtype=torch.int64, device=device)
+        self._bits = torch.tensor([bit for bit, _ in _VIOLATIONS], dtype=torch.int64, device=device)
+        self._step = torch.zeros((), dtype=torch.int64, device=device)
+        self._baseline: Optional[torch.Tensor] = None
+        self._totals = torch.zeros((history, sim.num_channels), dtype=torch.int64, device=device)
+        self._charge = torch.zeros(history, dtype=torch.int64, device=device)
+        self._steps = [0] * history  # ring of observed step counts, slot = observation % history
+        self._observed = 0
+        self._history = history
+        self._attached = False
+
+    def attach(self) -> "InvariantMonitor":
+        if not self._attached:
+            self.sim.add_step_hook(self._on_step)
+            self._attached = True
+        return self
+
+    def detach(self) -> None:
+        if self._attached:
+            self.sim.remove_step_hook(self._on_step)
+            self._attached = False
+
+    def _on_step(self, sim: Any) -> None:
+        if sim.step_count % self.every == 0:
+            self.observe()
+        if self.checkpoint_every is not None and sim.step_count % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    @torch.no_grad()
+    def observe(self) -> None:
+        """Reduce the current counts and latch any violation; never synchronizes."""
+        counts = self.sim.counts
+        totals = counts.sum(dim=(0, 2), dtype=torch.int64)  # [C]
+        charge = (totals * self._charges).sum()
+
+        bits = (counts.amin() < 0).to(torch.int64) * NEGATIVE
+        bits = bits | (counts.amax() >= self._limit).to(torch.int64) * SATURATED
+        if self.conserve:
+            conserved = totals.index_select(0, self._conserve_index)
+            if self.conserve_charge:
+                conserved = torch.cat([conserved, charge.view(1)])
+            if self._baseline is None:
+                self._baseline = conserved.clone()
+            else:
+                bits = bits | (conserved != self._baseline).any().to(torch.int64) * CONSERVATION
+
+        self._step.fill_(self.sim.step_count)
+        newly = ((bits & ~self._flags) & self._bits) != 0
+        self._first = torch.where(newly & (self._first < 0), self._step, self._first)
+        self._flags |= bits
+
+        slot = self._observed % self._history
+        self._totals[slot].copy_(totals)
+        self._charge[slot].copy_(charge)
+        self._steps[slot] = self.sim.step_count
+        self._observed += 1
+
+    def reset(self) -> None:
+        """Clear latched violations, history and the conservation baseline."""
+        self._flags.zero_()
+        self._first.fill_(-1)
+        self._baseline = None
+        self._observed = 0
+
+    def checkpoint(self, raise_on_violation: bool = True) -> InvariantReport:
+        """Read the latched flags back (one host sync)."""
+        flags, *first = torch.cat([self._flags.view(1), self._first]).tolist()
+        report = InvariantReport(step=self.sim.step_count)
+        for (bit, name), seen in zip(_VIOLATIONS, first):
+            if flags & bit:
+                report.violations[name] = seen
+        if raise_on_violation and not report.ok:
+            name = next(iter(report.violations))
+            details = ", ".join(f"{kind} at step {step}" for kind, step in report.violations.items())
+            raise RuntimeError(f"E_INVARIANT_{name}: {details}")
+        return report
+
+    def history(self) -> Tuple[List[int], torch.Tensor, torch.Tensor]:
+        """(steps, per-channel totals [H, C], net charge [H]) of the retained observations, oldest first."""
+        count = min(self._observed, self._history)
+        start = self._observed - count
+        order = [(start + offset) % self._history for offset in range(count)]
+        index = torch.tensor(order, dtype=torch.int64, device=self._totals.device)
+        return (
+            [self._steps[slot] for slot in order],
+            self._totals.index_select(0, index).cpu(),
+            self._charge.index_select(0, index).cpu(),
+        )
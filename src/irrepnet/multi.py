@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+from .loader import (
+    ChannelSpec,
+    CountInitEntry,
+    DirectedEdge,
+    MeasurementReadout,
+    PhaseInstruction,
+    Scenario,
+    load_scenario,
+)
+from .rng import CounterRNG
+from .sim import IRREPnetSim
+
+# the gauge and offset tensors are uint8
+MAX_MERGED_K = 256
+
+
+@dataclass(frozen=True)
+class ScenarioSlice:
+    """Where one packed scenario lives in the merged graph (merged phase = `scale` * own phase)."""
+
+    index: int
+    name: str
+    k: int
+    scale: int
+    node_base: int
+    node_count: int
+    edge_base: int
+    edge_count: int
+    channels: Tuple[int, ...]  # merged channel index per own channel
+    applications: int  # non-empty layer applications per step
+    rule_base: int
+    rule_count: int
+    seed: int
+
+
+def merge_scenarios(
+    scenarios: Sequence[Scenario],
+    names: Optional[Sequence[str]] = None,
+) -> Tuple[Scenario, List[ScenarioSlice]]:
+    """
+    Disjoint union of `scenarios` as one `Scenario`. Nodes and edges are offset per scenario;
+    channels with the same (name, charge, neutral) spec share an index; phases are scaled to the
+    lcm of the k's. Application j of the merged step runs the j-th non-empty layer application
+    (over `repeat`) of every scenario that has one, so the merged scenario has `repeat` 1.
+    Readouts, rules and tags are prefixed with "<index>:", and every node carries the tag
+    "<index>:" that scopes its scenario's rules.
+    """
+    if not scenarios:
+        raise ValueError("E_MULTI_EMPTY: no scenarios to pack")
+    names = list(names) if names is not None else [f"scenario{i}" for i in range(len(scenarios))]
+    k = 1
+    for scenario in scenarios:
+        k = k * scenario.k // math.gcd(k, scenario.k)
+    if k > MAX_MERGED_K:
+        raise ValueError(f"E_MULTI_K: lcm of k values is {k} (max {MAX_MERGED_K})")
+
+    channels: List[ChannelSpec] = []
+    channel_index: Dict[str, int] = {}
+    by_spec: Dict[Tuple[str, int, bool], int] = {}
+    channel_maps: List[Tuple[int, ...]] = []
+    for index, scenario in enumerate(scenarios):
+        mapping = []
+        for spec in scenario.channels:
+            key = (spec.name, spec.charge, spec.neutral)
+            if key not in by_spec:
+                name = spec.name if spec.name not in channel_index else f"{index}:{spec.name}"
+                by_spec[key] = len(channels)
+                channel_index[name] = len(channels)
+                channels.append(replace(spec, name=name))
+            mapping.append(by_spec[key])
+        channel_maps.append(tuple(mapping))
+
+    slices: List[ScenarioSlice] = []
+    node_gauge: List[int] = []
+    node_tags: List[Tuple[str, ...]] = []
+    node_ids: List[int] = []
+    directed_edges: List[DirectedEdge] = []
+    fusion_mask: List[List[List[int]]] = []
+    counts_init: List[CountInitEntry] = []
+    measurement: List[MeasurementReadout] = []
+    coupling_rules = []
+    edge_order: List[int] = []
+    applications: List[List[List[int]]] = []
+    for index, scenario in enumerate(scenarios):
+        scale = k // scenario.k
+        node_base, edge_base = len(node_gauge), len(directed_edges)
+        chan = channel_maps[index]
+        tag = f"{index}:"
+        node_gauge.extend(gauge * scale for gauge in scenario.node_gauge)
+        node_tags.extend((tag,) + tuple(tag + name for name in tags) for tags in scenario.node_tags)
+        node_ids.extend(range(node_base, node_base + scenario.node_count))
+        for edge_idx, edge in enumerate(scenario.directed_edges):
+            position = edge_base + scenario.edge_order[edge_idx]
+            directed_edges.append(
+                DirectedEdge(
+                    id=position,
+                    src=node_base + edge.src,
+                    dst=node_base + edge.dst,
+                    edge_ref=position,
+                    phase_offset=edge.phase_offset * scale,
+                    tags=tuple(tag + name for name in edge.tags),
+                )
+            )
+            edge_order.append(position)
+            mask = [[0] * k for _ in channels]
+            for channel, row in enumerate(scenario.fusion_mask[edge_idx]):
+                for phase, allowed in enumerate(row):
+                    mask[chan[channel]][phase * scale] = allowed
+            fusion_mask.append(mask)
+        counts_init.extend(
+            CountInitEntry(edge=edge_base + e.edge, channel=chan[e.channel], phase=e.phase * scale, value=e.value)
+            for e in scenario.counts_init
+        )
+        for readout in scenario.measurement:
+            own_channels = range(len(scenario.channels)) if readout.channels is None else readout.channels
+            measurement.append(
+                MeasurementReadout(
+                    name=tag + readout.name,
+                    edges=tuple(edge_base + edge for edge in readout.edges),
+                    channels=tuple(chan[c] for c in own_channels),
+                )
+            )
+        rule_base = len(coupling_rules)
+        for rule in scenario.coupling_rules:
+            coupling_rules.append(
+                replace(
+                    rule,
+                    name=tag + rule.name,
+                    inputs=tuple(replace(inp, channel=chan[inp.channel]) for inp in rule.inputs),
+                    outputs=tuple(replace(out, channel=chan[out.channel]) for out in rule.outputs),
+                    phase={chan[c]: _scale_instruction(instr, chan, scale) for c, instr in rule.phase.items()},
+                    node_tags_any=tuple(tag + name for name in rule.node_tags_any) if rule.node_tags_any else (tag,),
+                    out_edge_tags_any=(
+                        tuple(tag + name for name in rule.out_edge_tags_any) if rule.out_edge_tags_any else None
+                    ),
+                )
+            )
+        own = [
+            [edge_base + edge for edge in layer] for _ in range(scenario.repeat) for layer in scenario.layers if layer
+        ]
+        applications.append(own)
+        slices.append(
+            ScenarioSlice(
+                index=index,
+                name=names[index],
+                k=scenario.k,
+                scale=scale,
+                node_base=node_base,
+                node_count=scenario.node_count,
+                edge_base=edge_base,
+                edge_count=len(scenario.directed_edges),
+                channels=chan,
+                applications=len(own),
+                rule_base=rule_base,
+                rule_count=len(scenario.coupling_rules),
+                seed=scenario.seed,
+            )
+        )
+
+    depth = max(len(own) for own in applications)
+    layers = [sorted(edge for own in applications if j < len(own) for edge in own[j]) for j in range(depth)]
+    merged = Scenario(
+        version=scenarios[0].version,
+        k=k,
+        node_count=len(node_gauge),
+        node_gauge=node_gauge,
+        node_tags=node_tags,
+        directed_edges=directed_edges,
+        edge_index_by_id={edge.id: idx for idx, edge in enumerate(directed_edges)},
+        fusion_mask=fusion_mask,
+        channels=channels,
+        channel_index=channel_index,
+        counts_init=counts_init,
+        layers=layers,
+        repeat=1,
+        measurement=measurement,
+        coupling_rules=coupling_rules,
+        node_ids=node_ids,
+        node_index_by_id={node_id: idx for idx, node_id in enumerate(node_ids)},
+        edge_order=edge_order,
+    )
+    return merged, slices
+
+
+def _scale_instruction(instr: PhaseInstruction, chan: Sequence[int], scale: int) -> PhaseInstruction:
+    return replace(
+        instr,
+        sources=tuple(chan[source] for source in instr.sources),
+        value=None if instr.value is None else instr.value * scale,
+    )
+
+
+class MultiScenarioSim(IRREPnetSim):
+    """
+    Many small scenarios stepped together as one disjoint-union graph (see `merge_scenarios`),
+    so each layer application is one set of kernels for all of them.
+
+    Every scenario evolves exactly as it would alone, including stochastic rules: node keys use
+    the scenario's own seed and node IDs, rule streams its own rule order, and draws its own layer
+    tick. A scenario with fewer layer applications per step than the deepest one keeps its counts
+    unchanged through the extra applications. The mutation API takes merged IDs (`edge_id`,
+    `node_id` translate) and merged phases (own phase * `slices[i].scale`).
+    """
+
+    def __init__(
+        self,
+        scenarios: Sequence[str | Scenario],
+        device: torch.device | None = None,
+        *,
+        count_dtype: torch.dtype = torch.int32,
+        backend: str = "auto",
+    ):
+        loaded = [load_scenario(item) if isinstance(item, str) else item for item in scenarios]
+        names = [item if isinstance(item, str) else f"scenario{i}" for i, item in enumerate(scenarios)]
+        merged, self.slices = merge_scenarios(loaded, names)
+        self._own_node_ids = [list(scenario.node_ids) for scenario in loaded]
+        self._own_node_index = [dict(scenario.node_index_by_id) for scenario in loaded]
+        self._own_edge_positions = [
+            {edge.id: scenario.edge_order[idx] for idx, edge in enumerate(scenario.directed_edges)}
+            for scenario in loaded
+        ]
+        super().__init__(merged, device, count_dtype=count_dtype, backend=backend)
+
+    def _build(self) -> None:
+        super()._build()
+        scenario_of_node: List[int] = []
+        keys = []
+        for part in self.slices:
+            scenario_of_node.extend([part.index] * part.node_count)
+            own_ids = torch.tensor(self._own_node_ids[part.index], dtype=torch.int64, device=self.device)
+            keys.append(CounterRNG(part.seed, self.device).entity_keys(own_ids))
+            self.rule_streams[part.rule_base : part.rule_base + part.rule_count] = range(part.rule_count)
+        self.node_keys = torch.cat(keys) if keys else self.node_keys
+        self._node_scenario = scenario_of_node
+        self._application = 0
+        self._held: List[Optional[torch.Tensor]] = []
+        for application in range(len(self.layers)):
+            held = [
+                edge
+                for part in self.slices
+                if part.applications <= application
+                for edge in range(part.edge_base, part.edge_base + part.edge_count)
+            ]
+            self._held.append(torch.tensor(held, dtype=torch.int64, device=self.device) if held else None)
+
+    def _step(self, schedule: Optional[Sequence[Sequence[Any]]]) -> None:
+        if schedule is not None and any(held is not None for held in self._held):
+            raise ValueError("E_MULTI_SCHEDULE: pruned schedules need equal layer applications per scenario")
+        for application, chunks in enumerate(self._plans):
+            active = chunks if schedule is None else schedule[application]
+            if not self.layers[application]:
+                continue
+            self._application = application
+            if self.profiler is not None:
+                self.profiler.begin_layer(self.step_count, application)
+            self._backend.apply_layer(application, active)
+            held = self._held[application]
+            if held is not None:
+                self.counts_next.index_copy_(0, held, self.counts.index_select(0, held))
+            self._advance()
+            self.layer_tick += 1
+        self.step_count += 1
+        for hook in self._step_hooks:
+            hook(self)
+
+    def _node_tick(self, node_idx: int) -> int:
+        part = self.slices[self._node_scenario[node_idx]]
+        return self.step_count * part.applications + self._application
+
+    # ------------------------------------------------------------------ #
+
+    def edge_id(self, scenario: int, edge_id: int) -> int:
+        """Merged ID of edge `edge_id` of packed scenario `scenario`."""
+        part = self.slices[scenario]
+        if edge_id not in self._own_edge_positions[scenario]:
+            raise ValueError(f"E_EDGE_UNKNOWN: {edge_id}")
+        return part.edge_base + self._own_edge_positions[scenario][edge_id]
+
+    def node_id(self, scenario: int, node_id: int) -> int:
+        """Merged ID of node `node_id` of packed scenario `scenario`."""
+        if node_id not in self._own_node_index[scenario]:
+            raise ValueError(f"E_NODE_UNKNOWN: {node_id}")
+        return self.slices[scenario].node_base + self._own_node_index[scenario][node_id]
+
+    def measure_scenarios(self) -> List[Dict[str, float]]:
+        """`measure()` split back out per packed scenario, with the scenarios' own readout names."""
+        measured = self.measure()
+        results: List[Dict[str, float]] = [{} for _ in self.slices]
+        for name, value in measured.items():
+            index, own = name.split(":", 1)
+            results[int(index)][own] = value
+        return results
+
+    def scenario_counts(self, scenario: int) -> torch.Tensor:
+        """Counts [E, C, k] of one packed scenario in its own load order, channels and phases."""
+        part = self.slices[scenario]
+        exported = self.export_counts()[part.edge_base : part.edge_base + part.edge_count]
+        channels = torch.tensor(part.channels, dtype=torch.int64, device=exported.device)
+        return exported.index_select(1, channels)[..., :: part.scale]
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import torch
+
+from .measure import measure_counts
+
+
+@dataclass
+class PipelineFrame:
+    step: int
+    counts: Optional[torch.Tensor]
+    readouts: Dict[str, float]
+
+
+@dataclass
+class _Slot:
+    counts: Optional[torch.Tensor]
+    readout_counts: Optional[torch.Tensor]
+
+
+@dataclass
+class _Pending:
+    step: int
+    slot: _Slot
+    event: Any
+
+
+@dataclass
+class _Failure:
+    error: BaseException
+
+
+_DONE = object()
+
+
+class SimulationPipeline:
+    """
+    Overlaps `step()` with host-side measurement, logging and disk writes.
+    A producer thread steps the sim and copies snapshots/readout slices into a
+    fixed pool of (pinned, on CUDA) host buffers; frames come back in step order
+    through a bounded queue, so a slow consumer throttles the producer.
+
+    Frame buffers are recycled once the consumer moves on: copy `frame.counts`
+    if it must outlive the iteration.
+    """
+
+    def __init__(
+        self,
+        sim: Any,
+        *,
+        every: int = 1,
+        max_pending: int = 4,
+        snapshots: bool = True,
+        measure: bool = True,
+        include_initial: bool = False,
+    ):
+        if every < 1:
+            raise ValueError("E_PIPELINE_EVERY_RANGE")
+        if max_pending < 1:
+            raise ValueError("E_PIPELINE_PENDING_RANGE")
+        self.sim = sim
+        self.every = every
+        self.max_pending = max_pending
+        self.snapshots = snapshots
+        self.measure = measure and bool(sim.readouts)
+        self.include_initial = include_initial
+
+        device = sim.counts.device
+        self._pin = device.type == "cuda"
+        readout_edges = sorted({edge for readout in sim.readouts for edge in readout.edges})
+        local = {edge: row for row, edge in enumerate(readout_edges)}
+        self._readout_rows = [[local[edge] for edge in readout.edges] for readout in sim.readouts]
+        self._readout_index = torch.tensor(readout_edges, dtype=torch.int64, device=device)
+        # snapshots use load order when the sim renumbered its edges
+        self._export_index = getattr(sim, "export_index", None)
+
+        self._free: "queue.Queue[_Slot]" = queue.Queue()
+        for _ in range(max_pending + 1):
+            self._free.put(self._allocate_slot())
+
+    def frames(self, steps: int) -> Iterator[PipelineFrame]:
+        pending: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce,
+            args=(steps, pending, stop),
+            name="irrepnet-pipeline",
+            daemon=True,
+        )
+        producer.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                if item.event is not None:
+                    item.event.synchronize()
+                yield PipelineFrame(
+                    step=item.step,
+                    counts=item.slot.counts,
+                    readouts=self._measure_slot(item.slot),
+                )
+                self._free.put(item.slot)
+        finally:
+            stop.set()
+            producer.join()
+
+    def run(self, steps: int, consumer: Callable[[PipelineFrame], Any]) -> List[Any]:
+        return [consumer(frame) for frame in self.frames(steps)]
+
+    # ------------------------------------------------------------------ #
+
+    def _produce(self, steps: int, pending: "queue.Queue[Any]", stop: threading.Event) -> None:
+        try:
+            if self.include_initial:
+                self._emit(0, pending, stop)
+            for index in range(1, steps + 1):
+                if stop.is_set():
+                    return
+                self.sim.step()
+                if index % self.every == 0 or index == steps:
+                    self._emit(index, pending, stop)
+        except BaseException as exc:  # surfaced on the consumer side
+            _put(pending, _Failure(exc), stop)
+        finally:
+            _put(pending, _DONE, stop)
+
+    def _emit(self, step: int, pending: "queue.Queue[Any]", stop: threading.Event) -> None:
+        slot = _get(self._free, stop)
+        if slot is None:
+            return
+        counts = self.sim.counts
+        if slot.counts is not None:
+            snapshot = counts if self._export_index is None else counts.index_select(0, self._export_index)
+            slot.counts.copy_(snapshot, non_blocking=self._pin)
+        if slot.readout_counts is not None:
+            slot.readout_counts.copy_(counts.index_select(0, self._readout_index), non_blocking=self._pin)
+        _put(pending, _Pending(step=step, slot=slot, event=_record_event(counts.device)), stop)
+
+    def _allocate_slot(self) -> _Slot:
+        counts = self.sim.counts
+        snapshot = None
+        if self.snapshots:
+            snapshot = torch.empty(counts.shape, dtype=counts.dtype, pin_memory=self._pin)
+        readout_counts = None
+        if self.measure:
+            shape = (int(self._readout_index.numel()),) + tuple(counts.shape[1:])
+            readout_counts = torch.empty(shape, dtype=counts.dtype, pin_memory=self._pin)
+        return _Slot(counts=snapshot, readout_counts=readout_counts)
+
+    def _measure_slot(self, slot: _Slot) -> Dict[str, float]:
+        results: Dict[str, float] = {}
+        if slot.readout_counts is None:
+            return results
+        for readout, rows in zip(self.sim.readouts, self._readout_rows):
+            results[readout.name] = measure_counts(
+                slot.readout_counts,
+                rows,
+                self.sim.bins,
+                channels=list(readout.channels) if readout.channels is not None else None,
+            )
+        return results
+
+
+def _record_event(device: torch.device) -> Any:
+    if device.type == "cuda":
+        event = torch.cuda.Event()
+        event.record()
+        return event
+    if device.type == "mps":
+        event = torch.mps.event.Event()
+        event.record()
+        return event
+    return None
+
+
+def _put(target: "queue.Queue[Any]", item: Any, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.05)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(source: "queue.Queue[Any]", stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.05)
+        except queue.Empty:
+            continue
+    return None
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+
+@dataclass
+class ChunkPlan:
+    """
+    Host-side description of one propagation chunk of a layer.
+    Rows are layer edges grouped by destination node; a node's incoming rows never
+    straddle two chunks, so coupling can run per chunk.
+    """
+
+    edges: List[int]  # edge index per row
+    local_node: List[int]  # row -> position in `nodes`
+    nodes: List[int]  # destination nodes, ascending
+    fan_rows: List[int] = field(default_factory=list)  # fan-out source row ...
+    fan_targets: List[int] = field(default_factory=list)  # ... and the edge it is copied onto
+
+    @property
+    def rows(self) -> int:
+        return len(self.edges)
+
+
+def plan_layer(
+    edges: Sequence[int],
+    edge_dst: Sequence[int],
+    out_index: Sequence[Sequence[int]],
+    chunk_rows: Optional[int] = None,
+) -> List[ChunkPlan]:
+    """Split one layer into chunks of at most `chunk_rows` rows (a node with more in-edges gets its own chunk)."""
+    by_node: Dict[int, List[int]] = {}
+    for edge in edges:
+        by_node.setdefault(edge_dst[edge], []).append(edge)
+    limit = chunk_rows if chunk_rows else len(edges)
+
+    chunks: List[ChunkPlan] = []
+    current = ChunkPlan(edges=[], local_node=[], nodes=[])
+    for node in sorted(by_node):
+        incoming = by_node[node]
+        if current.edges and current.rows + len(incoming) > limit:
+            chunks.append(current)
+            current = ChunkPlan(edges=[], local_node=[], nodes=[])
+        local = len(current.nodes)
+        current.nodes.append(node)
+        for edge in incoming:
+            row = current.rows
+            current.edges.append(edge)
+            current.local_node.append(local)
+            for target in out_index[node]:
+                current.fan_rows.append(row)
+                current.fan_targets.append(target)
+    if current.edges:
+        chunks.append(current)
+    return chunks
+
+
+def min_chunk_rows(layers: Sequence[Sequence[int]], edge_dst: Sequence[int]) -> int:
+    """Smallest chunk limit that is honoured exactly: the largest per-layer in-degree."""
+    largest = 1
+    for layer in layers:
+        degree: Dict[int, int] = {}
+        for edge in layer:
+            node = edge_dst[edge]
+            degree[node] = degree.get(node, 0) + 1
+        if degree:
+            largest = max(largest, max(degree.values()))
+    return largest
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Sequence, Set, Tuple
+
+# one step: a chunk list per layer application (repeat x layers, empty layers included)
+StepSchedule = List[Sequence[Any]]
+
+
+@dataclass
+class LightCone:
+    """
+    Per-step layer schedules restricted to the backward reachability cone of `readout_edges`
+    at the end of a `steps`-step run. `rows[s]` is the number of edge rows step `s` propagates.
+    """
+
+    steps: int
+    readout_edges: Tuple[int, ...]
+    schedule: List[StepSchedule] = field(default_factory=list)
+    rows: List[int] = field(default_factory=list)
+
+
+def light_cone(sim: Any, steps: int, readout_edges: Sequence[int]) -> LightCone:
+    """
+    Walk the layer schedule backwards from the readout edges. A layer writes an edge only by
+    fan-out or coupling at the edge's source node, and both depend only on that node's incoming
+    rows, so a layer needs exactly the rows entering nodes that feed a live edge; everything it
+    does not write is zero afterwards. Schedules are memoized by the live set at the step's end,
+    so once the cone stops changing further steps cost a dictionary lookup.
+    """
+    if steps < 0:
+        raise ValueError("E_PRUNE_STEPS_RANGE")
+    src = [edge.src for edge in sim.scenario.directed_edges]
+    applications = [layer_idx for _ in range(sim.repeat) for layer_idx in range(len(sim._plans))]
+    incoming: List[Dict[int, List[int]]] = []
+    for chunks in sim._plans:
+        by_node: Dict[int, List[int]] = {}
+        for chunk in chunks:
+            for row, local in zip(chunk.edge_idx.tolist(), chunk.local_node.tolist()):
+                by_node.setdefault(chunk.nodes[local], []).append(row)
+        incoming.append(by_node)
+
+    plans: Dict[Tuple[int, FrozenSet[int]], Sequence[Any]] = {}
+
+    def pruned(layer_idx: int, nodes: FrozenSet[int]) -> Sequence[Any]:
+        if len(nodes) == len(incoming[layer_idx]):
+            return sim._plans[layer_idx]
+        key = (layer_idx, nodes)
+        if key not in plans:
+            rows = [row for node in sorted(nodes) for row in incoming[layer_idx][node]]
+            plans[key] = sim._plan_layer(rows)
+        return plans[key]
+
+    # a step's schedule depends only on the live set at its end
+    memo: Dict[FrozenSet[int], Tuple[StepSchedule, int, FrozenSet[int]]] = {}
+
+    def step_schedule(end: FrozenSet[int]) -> Tuple[StepSchedule, int, FrozenSet[int]]:
+        if end in memo:
+            return memo[end]
+        live: Set[int] = set(end)
+        schedule: StepSchedule = []
+        rows = 0
+        for layer_idx in reversed(applications):
+            by_node = incoming[layer_idx]
+            if not sim.layers[layer_idx]:
+                schedule.append(sim._plans[layer_idx])  # skipped by step(); leaves counts alone
+                continue
+            nodes = frozenset(src[edge] for edge in live if src[edge] in by_node)
+            schedule.append(pruned(layer_idx, nodes))
+            live = {row for node in nodes for row in by_node[node]}
+            rows += sum(len(by_node[node]) for node in nodes)
+        schedule.reverse()
+        memo[end] = (schedule, rows, frozenset(live))
+        return memo[end]
+
+    cone = LightCone(steps=steps, readout_edges=tuple(readout_edges))
+    live_end = frozenset(readout_edges)
+    for _ in range(steps):
+        schedule, rows, live_end = step_schedule(live_end)
+        cone.schedule.append(schedule)
+        cone.rows.append(rows)
+    cone.schedule.reverse()
+    cone.rows.reverse()
+    return cone
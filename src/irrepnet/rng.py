@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from typing import Tuple, Union
+
+import torch
+
+_MASK32 = 0xFFFFFFFF
+_GOLDEN = 0x9E3779B9
+
+Word = Union[int, torch.Tensor]
+
+
+def _mul32(x: torch.Tensor, constant: int) -> torch.Tensor:
+    """(x * constant) mod 2**32 for x in [0, 2**32), without overflowing int64 lanes."""
+    low = (x & 0xFFFF) * constant
+    high = (((x >> 16) * constant) & 0xFFFF) << 16
+    return (low + high) & _MASK32
+
+
+def mix32(x: torch.Tensor) -> torch.Tensor:
+    """lowbias32 finalizer on int64 tensors holding 32-bit words."""
+    x = x & _MASK32
+    x = x ^ (x >> 16)
+    x = _mul32(x, 0x7FEB352D)
+    x = x ^ (x >> 15)
+    x = _mul32(x, 0x846CA68B)
+    x = x ^ (x >> 16)
+    return x
+
+
+class CounterRNG:
+    """
+    Counter-based PRNG: every draw is a pure hash of (seed, step, stream, entity, counter).
+    Draws therefore do not depend on evaluation order, device, partitioning or batching;
+    entities are keyed by user-facing IDs, never by internal indices.
+    """
+
+    def __init__(self, seed: int, device: torch.device):
+        self.seed = int(seed) & _MASK32
+        self.device = device
+
+    def entity_keys(self, ids: torch.Tensor) -> torch.Tensor:
+        """Per-entity base keys (seed folded in) for a tensor of user-facing IDs."""
+        seed = torch.full_like(ids, self.seed, dtype=torch.int64)
+        return mix32(seed ^ mix32(ids.to(torch.int64) + _GOLDEN))
+
+    def bits(
+        self,
+        keys: torch.Tensor,
+        step: int,
+        stream: int,
+        counter: Word = 0,
+        lane: int = 0,
+    ) -> torch.Tensor:
+        """Uniform 32-bit words (int64 tensor) broadcast over `keys` and `counter`."""
+        h = mix32(keys.to(torch.int64) ^ ((int(step) * _GOLDEN) & _MASK32))
+        h = mix32(h ^ ((int(stream) * 0x85EBCA6B + int(lane) * 0xC2B2AE35) & _MASK32))
+        if isinstance(counter, torch.Tensor):
+            counter = counter.to(torch.int64)
+        return mix32(h + counter)
+
+    def uniform(self, keys: torch.Tensor, step: int, stream: int, counter: Word = 0, lane: int = 0) -> torch.Tensor:
+        return (self.bits(keys, step, stream, counter, lane) >> 8).to(torch.float32) * (1.0 / (1 << 24))
+
+    def bernoulli(
+        self,
+        keys: torch.Tensor,
+        probability: float,
+        step: int,
+        stream: int,
+        counter: Word = 0,
+        lane: int = 0,
+    ) -> torch.Tensor:
+        threshold = int(round(float(probability) * (1 << 32)))
+        return self.bits(keys, step, stream, counter, lane) < threshold
+
+    def randint(
+        self,
+        keys: torch.Tensor,
+        high: Word,
+        step: int,
+        stream: int,
+        counter: Word = 0,
+        lane: int = 0,
+    ) -> torch.Tensor:
+        """Integers in [0, high) by multiply-shift (high < 2**31)."""
+        if isinstance(high, torch.Tensor):
+            high = high.to(torch.int64)
+        return (self.bits(keys, step, stream, counter, lane) * high) >> 32
+
+    def binomial(
+        self,
+        keys: torch.Tensor,
+        count: Word,
+        probability: Union[float, torch.Tensor],
+        step: int,
+        stream: int,
+        counter: Word = 0,
+        lane: int = 0,
+    ) -> torch.Tensor:
+        """
+        Binomial(count, probability) draws (int64) broadcast over `keys`, `count`, `probability`
+        and `counter`, so a histogram bin is thinned or split with one draw rather than one per
+        token. Small means use geometric inversion, the rest BTRS (Hormann 1993) rejection; both
+        consume a per-draw sequence of uniforms hashed from the draw's key, so results keep the
+        order and partition independence of `bits` (up to float64 rounding across devices).
+        """
+        work = torch.device("cpu") if self.device.type == "mps" else self.device  # no float64 on MPS
+        count = torch.as_tensor(count, device=work).to(torch.int64)
+        prob = torch.as_tensor(probability, device=work).to(torch.float64)
+        if isinstance(counter, torch.Tensor):
+            counter = counter.to(work)
+        base = self.bits(keys.to(work), step, stream, counter, lane)
+        base, count, prob = torch.broadcast_tensors(base, count, prob)
+        flip = prob > 0.5
+        prob = torch.where(flip, 1.0 - prob, prob).clamp(0.0, 0.5)
+        draws = torch.zeros_like(count)
+        live = (count > 0) & (prob > 0)
+        large = live & (count * prob >= 10)
+        small = live & ~large
+        if bool(small.any()):
+            draws[small] = _geometric_inversion(base[small], count[small], prob[small])
+        if bool(large.any()):
+            draws[large] = _btrs(base[large], count[large], prob[large])
+        return torch.where(flip, count - draws, draws).to(self.device)
+
+
+def _unit(base: torch.Tensor, draw: int) -> torch.Tensor:
+    """The `draw`-th uniform in (0, 1) (53 bits, float64) of every key word in `base`."""
+    high = mix32(base + ((2 * draw + 1) * _GOLDEN & _MASK32)) >> 5
+    low = mix32(base + ((2 * draw + 2) * _GOLDEN & _MASK32)) >> 6
+    return ((high * 67108864 + low).to(torch.float64) + 0.5) * (1.0 / 2**53)
+
+
+def _geometric_inversion(base: torch.Tensor, count: torch.Tensor, prob: torch.Tensor) -> torch.Tensor:
+    """Successes = geometric waiting times that fit in `count` trials; a few rounds when count * prob < 10."""
+    log_q = torch.log1p(-prob)
+    waited = torch.zeros_like(prob)
+    successes = torch.zeros_like(count)
+    pending = torch.ones_like(count, dtype=torch.bool)
+    draw = 0
+    while bool(pending.any()):
+        waited = waited + torch.ceil(torch.log(_unit(base, draw)) / log_q)
+        pending = pending & (waited <= count)
+        successes = successes + pending.to(torch.int64)
+        draw += 1
+    return successes
+
+
+def _btrs(base: torch.Tensor, count: torch.Tensor, prob: torch.Tensor) -> torch.Tensor:
+    """Transformed rejection with squeeze for count * prob >= 10, prob <= 0.5 (as in torch.binomial)."""
+    n = count.to(torch.float64)
+    spq = torch.sqrt(n * prob * (1 - prob))
+    b = 1.15 + 2.53 * spq
+    a = -0.0873 + 0.0248 * b + 0.01 * prob
+    c = n * prob + 0.5
+    v_r = 0.92 - 4.2 / b
+    r = prob / (1 - prob)
+    alpha = (2.83 + 5.1 / b) * spq
+    m = torch.floor((n + 1) * prob)
+    result = torch.full_like(count, -1)
+    draw = 0
+    while bool((result < 0).any()):
+        u = _unit(base, 2 * draw) - 0.5
+        v = _unit(base, 2 * draw + 1)
+        draw += 1
+        us = 0.5 - u.abs()
+        k = torch.floor((2 * a / us + b) * u + c)
+        inside = (k >= 0) & (k <= n)
+        k = k.clamp(torch.zeros_like(n), n)
+        log_v = torch.log(v * alpha / (a / (us * us) + b))
+        bound = (
+            (m + 0.5) * torch.log((m + 1) / (r * (n - m + 1)))
+            + (n + 1) * torch.log((n - m + 1) / (n - k + 1))
+            + (k + 0.5) * torch.log(r * (n - k + 1) / (k + 1))
+            + _stirling_tail(m)
+            + _stirling_tail(n - m)
+            - _stirling_tail(k)
+            - _stirling_tail(n - k)
+        )
+        accepted = inside & (((us >= 0.07) & (v <= v_r)) | (log_v <= bound)) & (result < 0)
+        result = torch.where(accepted, k.to(torch.int64), result)
+    return result
+
+
+def _stirling_tail(k: torch.Tensor) -> torch.Tensor:
+    """log(k!) minus its Stirling approximation, for k >= 0 (float64)."""
+    table = torch.tensor(_STIRLING_TAIL, dtype=torch.float64, device=k.device)
+    kp1sq = (k + 1) * (k + 1)
+    series = (1.0 / 12 - (1.0 / 360 - 1.0 / 1260 / kp1sq) / kp1sq) / (k + 1)
+    return torch.where(k <= 9, table.index_select(0, k.clamp(0, 9).to(torch.int64)), series)
+
+
+_STIRLING_TAIL = (
+    0.0810614667953272,
+    0.0413406959554092,
+    0.0276779256849983,
+    0.02079067210376509,
+    0.0166446911898211,
+    0.0138761288230707,
+    0.0118967099458917,
+    0.0104112652619720,
+    0.00925546218271273,
+    0.00833056343336287,
+)
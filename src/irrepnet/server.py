@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import torch
+
+from .sim import IRREPnetSim
+
+OVERRIDE_KINDS = ("gauge", "edge_offset", "mask", "disable_edges", "counts")
+_MAX_BODY = 16 * 1024 * 1024
+_MAX_STEPS = 1_000_000
+
+
+@dataclass
+class SimRequest:
+    """
+    One query: run `scenario` for `steps` steps from its initial state after applying `overrides`,
+    then return `readouts` (all when None) and, if asked, the final counts in load order.
+
+    overrides:
+      gauge:         {node_id: phase}
+      edge_offset:   {edge_id: offset}
+      mask:          [{edge, channel, allow: [phase, ...]}]
+      disable_edges: [edge_id, ...]
+      counts:        [{edge, channel, phase, value}]  (added to counts_init)
+    """
+
+    scenario: str
+    steps: int = 0
+    overrides: Dict[str, Any] = field(default_factory=dict)
+    readouts: Optional[List[str]] = None
+    counts: bool = False
+
+    @classmethod
+    def from_json(cls, payload: Dict[str, Any]) -> "SimRequest":
+        if not isinstance(payload, dict) or "scenario" not in payload:
+            raise ValueError("E_SERVE_REQUEST: expected an object with 'scenario'")
+        unknown = set(payload) - {"scenario", "steps", "overrides", "readouts", "counts"}
+        if unknown:
+            raise ValueError(f"E_SERVE_REQUEST: unknown fields {sorted(unknown)}")
+        steps = int(payload.get("steps", 0))
+        if not 0 <= steps <= _MAX_STEPS:
+            raise ValueError(f"E_SERVE_STEPS_RANGE: steps must be in [0, {_MAX_STEPS}]")
+        overrides = payload.get("overrides") or {}
+        bad = set(overrides) - set(OVERRIDE_KINDS)
+        if bad:
+            raise ValueError(f"E_SERVE_OVERRIDE_UNKNOWN: {sorted(bad)}")
+        readouts = payload.get("readouts")
+        return cls(
+            scenario=str(payload["scenario"]),
+            steps=steps,
+            overrides=overrides,
+            readouts=list(readouts) if readouts is not None else None,
+            counts=bool(payload.get("counts", False)),
+        )
+
+    def override_key(self) -> str:
+        return json.dumps(self.overrides, sort_keys=True)
+
+
+@dataclass
+class SimResult:
+    step: int
+    readouts: Dict[str, float]
+    counts: Optional[np.ndarray] = None
+    batched: int = 1  # requests served by the same run
+
+    def to_json(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"step": self.step, "readouts": self.readouts, "batched": self.batched}
+        if self.counts is not None:
+            payload["counts"] = self.counts.tolist()
+        return payload
+
+    def to_npz(self) -> bytes:
+        arrays: Dict[str, np.ndarray] = {
+            "step": np.array(self.step),
+            "readout_names": np.array(list(self.readouts)),
+            "readout_values": np.array(list(self.readouts.values()), dtype=np.float64),
+        }
+        if self.counts is not None:
+            arrays["counts"] = self.counts
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+
+class _Job:
+    def __init__(self, request: SimRequest):
+        self.request = request
+        self.done = threading.Event()
+        self.result: Optional[SimResult] = None
+        self.error: Optional[BaseException] = None
+
+
+class _WarmScenario:
+    """A built sim plus its initial state; runs restore that state instead of rebuilding."""
+
+    def __init__(self, path: str, device: Optional[torch.device], reduce_phases: bool = False):
+        self.sim = IRREPnetSim(path, device=device, reduce_phases=reduce_phases)
+        self.initial = self.sim.export_counts()
+        self.pending: List[_Job] = []
+        self.pending_lock = threading.Lock()
+        self.run_lock = threading.Lock()
+        self.runs = 0
+
+
+class SimulationService:
+    """
+    Keeps built scenarios resident and serves `SimRequest`s against them.
+
+    Concurrent requests for one scenario are coalesced: the first caller waits `batch_window`
+    seconds, then runs every pending request in one pass per distinct override set, stepping
+    to the largest `steps` and measuring at each requested step on the way. With `reduce_phases`
+    warm sims run phase-reduced, and go back to the reduction after an override that left it.
+    """
+
+    def __init__(
+        self,
+        *,
+        device: Optional[torch.device] = None,
+        batch_window: float = 0.002,
+        reduce_phases: bool = False,
+    ):
+        self.device = device
+        self.batch_window = batch_window
+        self.reduce_phases = reduce_phases
+        self._scenarios: Dict[str, _WarmScenario] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> _WarmScenario:
+        key = os.path.abspath(path)
+        with self._lock:
+            warm = self._scenarios.get(key)
+            if warm is None:
+                if not os.path.isfile(key):
+                    raise ValueError(f"E_SERVE_SCENARIO_NOT_FOUND: {path}")
+                warm = _WarmScenario(key, self.device, self.reduce_phases)
+                self._scenarios[key] = warm
+            return warm
+
+    def scenarios(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                path: {"edges": warm.sim.num_edges, "nodes": warm.sim.num_nodes, "runs": warm.runs}
+                for path, warm in self._scenarios.items()
+            }
+
+    def submit(self, request: SimRequest) -> SimResult:
+        warm = self.load(request.scenario)
+        job = _Job(request)
+        with warm.pending_lock:
+            warm.pending.append(job)
+        while not job.done.is_set():
+            if warm.run_lock.acquire(timeout=0.05):
+                try:
+                    if not job.done.is_set():
+                        if self.batch_window > 0:
+                            time.sleep(self.batch_window)
+                        with warm.pending_lock:
+                            batch, warm.pending = warm.pending, []
+                        self._run_batch(warm, batch)
+                finally:
+                    warm.run_lock.release()
+        if job.error is not None:
+            raise job.error
+        assert job.result is not None
+        return job.result
+
+    def _run_batch(self, warm: _WarmScenario, batch: Sequence[_Job]) -> None:
+        groups: Dict[str, List[_Job]] = {}
+        for job in batch:
+            groups.setdefault(job.request.override_key(), []).append(job)
+        for jobs in groups.values():
+            try:
+                self._run_group(warm, jobs)
+            except Exception as exc:
+                for job in jobs:
+                    job.error = exc
+            finally:
+                for job in jobs:
+                    job.done.set()
+
+    def _run_group(self, warm: _WarmScenario, jobs: Sequence[_Job]) -> None:
+        sim = warm.sim
+        undo = _apply_overrides(sim, jobs[0].request.overrides, warm.initial)
+        try:
+            by_step: Dict[int, List[_Job]] = {}
+            for job in jobs:
+                by_step.setdefault(job.request.steps, []).append(job)
+            for step in sorted(by_step):
+                while sim.step_count < step:
+                    sim.step()
+                measured = sim.measure()
+                counts = None
+                if any(job.request.counts for job in by_step[step]):
+                    counts = sim.export_counts().cpu().numpy()
+                for job in by_step[step]:
+                    names = job.request.readouts
+                    if names is not None:
+                        missing = [name for name in names if name not in measured]
+                        if missing:
+                            job.error = ValueError(f"E_SERVE_READOUT_UNKNOWN: {missing}")
+                            continue
+                    readouts = {name: value for name, value in measured.items() if names is None or name in names}
+                    job.result = SimResult(
+                        step=step,
+                        readouts=readouts,
+                        counts=counts if job.request.counts else None,
+                        batched=len(jobs),
+                    )
+            warm.runs += 1
+        finally:
+            for action in reversed(undo):
+                action()
+            _restore(sim, warm.initial)
+
+
+def _restore(sim: IRREPnetSim, initial: torch.Tensor) -> None:
+    """Back to the initial state (the next buffer included) once the overrides are undone."""
+    sim.import_counts(initial)
+    if sim.reduce_phases and sim.reduction is None:
+        sim._rebuild_phases(reduce=True)  # an out-of-coset override expanded the sim
+    sim.step_count = 0
+    sim.layer_tick = 0
+
+
+def _apply_overrides(sim: IRREPnetSim, overrides: Dict[str, Any], initial: torch.Tensor) -> List[Any]:
+    """Apply overrides through the mutation API; returns undo actions (applied in reverse)."""
+    undo: List[Any] = []
+    try:
+        _restore(sim, initial)
+        for node_id, phase in (overrides.get("gauge") or {}).items():
+            node = sim.node_index(int(node_id))
+            previous = sim.scenario.node_gauge[node]
+            sim.set_gauge(int(node_id), phase)
+            undo.append(lambda node_id=int(node_id), previous=previous: sim.set_gauge(node_id, previous))
+        for edge_id, offset in (overrides.get("edge_offset") or {}).items():
+            edge = sim.edge_index(int(edge_id))
+            previous = sim.scenario.directed_edges[edge].phase_offset
+            sim.set_edge_offset(int(edge_id), offset)
+            undo.append(lambda edge_id=int(edge_id), previous=previous: sim.set_edge_offset(edge_id, previous))
+        for entry in overrides.get("mask") or []:
+            edge_id, channel = int(entry["edge"]), entry["channel"]
+            row = sim.scenario.fusion_mask[sim.edge_index(edge_id)][sim._channel(channel)]
+            previous = [phase for phase, bit in enumerate(row) if bit]
+            sim.set_mask(edge_id, channel, entry["allow"])
+            undo.append(lambda edge_id=edge_id, channel=channel, previous=previous: sim.set_mask(edge_id, channel, previous))
+        for edge_id in overrides.get("disable_edges") or []:
+            sim.enable_edge(int(edge_id), False)
+            undo.append(lambda edge_id=int(edge_id): sim.enable_edge(edge_id, True))
+        for entry in overrides.get("counts") or []:
+            sim.add_counts(int(entry["edge"]), entry["channel"], int(entry["phase"]), int(entry["value"]))
+    except (KeyError, TypeError) as exc:
+        for action in reversed(undo):
+            action()
+        raise ValueError(f"E_SERVE_OVERRIDE_FORMAT: {exc}") from exc
+    except Exception:
+        for action in reversed(undo):
+            action()
+        raise
+    return undo
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: SimulationService
+    quiet = True
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path == "/scenarios":
+            self._send_json(200, self.service.scenarios())
+        else:
+            self._send_json(404, {"error": f"E_SERVE_NOT_FOUND: {self.path}"})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > _MAX_BODY:
+                raise ValueError("E_SERVE_REQUEST_TOO_LARGE")
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError(f"E_SERVE_REQUEST: expected a JSON object, got {type(payload).__name__}")
+            if url.path == "/load":
+                warm = self.service.load(str(payload.get("scenario", "")))
+                self._send_json(200, {"edges": warm.sim.num_edges, "nodes": warm.sim.num_nodes})
+            elif url.path == "/simulate":
+                result = self.service.submit(SimRequest.from_json(payload))
+                if parse_qs(url.query).get("format") == ["npz"]:
+                    self._send(200, result.to_npz(), "application/octet-stream")
+                else:
+                    self._send_json(200, result.to_json())
+            else:
+                self._send_json(404, {"error": f"E_SERVE_NOT_FOUND: {self.path}"})
+        except (ValueError, json.JSONDecodeError) as exc:
+            self._send_json(400, {"error": str(exc)})
+        except Exception as exc:  # a failed run must not drop the connection without a reply
+            self._send_json(500, {"error": f"E_SERVE_INTERNAL: {type(exc).__name__}: {exc}"})
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        self._send(status, json.dumps(payload, separators=(",", ":")).encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(
+    service: SimulationService,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    *,
+    quiet: bool = True,
+) -> ThreadingHTTPServer:
+    """HTTP front end for `service` (port 0 picks a free port: see `server.server_address`)."""
+    handler = type("Handler", (_Handler,), {"service": service, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="irrepnet serve", description="Serve warm IRREPnet scenarios over HTTP.")
+    parser.add_argument("scenarios", nargs="*", help="Scenario YAML files to load at startup")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--device", default=None, help="Torch device (default: auto)")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="Wait this long to coalesce requests")
+    parser.add_argument("--reduce-phases", action="store_true", help="Run reducible scenarios at k/d phases")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    device = torch.device(args.device) if args.device else None
+    service = SimulationService(
+        device=device, batch_window=args.batch_window_ms / 1000.0, reduce_phases=args.reduce_phases
+    )
+    for path in args.scenarios:
+        service.load(path)
+    server = make_server(service, args.host, args.port, quiet=not args.verbose)
+    host, port = server.server_address[:2]
+    print(f"irrepnet serve: http://{host}:{port} ({len(args.scenarios)} scenarios warm)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
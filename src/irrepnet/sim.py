@@ -1,7 +1,12 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List, Sequence, Tuple
+import contextlib
+import copy
+import dataclasses
+import os
+import tempfile
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import torch
 
@@ -12,10 +17,49 @@ from .loader import (
     DirectedEdge,
     MeasurementReadout,
     PhaseInstruction,
+    PhaseReduction,
     Scenario,
+    detect_phase_reduction,
     load_scenario,
+    reduce_scenario,
+    reorder_scenario,
 )
+from .adjoint import AdjointResult, adjoint
+from .backends import BACKENDS, resolve_backend
+from .gauge import GaugeResponse, gauge_response
+from .green import ResponseLibrary
+from .inbox import InboxState
+from .instrument import SimProfiler
 from .measure import measure_counts
+from .memory import MappedCounts, MemoryEstimate, MemoryLayout, choose_layout, estimate_memory
+from .plan import ChunkPlan, plan_layer
+from .prune import LightCone, light_cone
+from .rng import CounterRNG
+from .stability import StabilityResult, hash_weights, jump_to, run_until_stable, state_hash
+
+
+def select_device(device: torch.device | None) -> torch.device:
+    if device is not None:
+        return device
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+class _LayerChunk:
+    """Device-side index tensors for one `ChunkPlan`."""
+
+    def __init__(self, plan: ChunkPlan, device: torch.device):
+        self.edge_idx = torch.tensor(plan.edges, dtype=torch.int64, device=device)
+        self.local_node = torch.tensor(plan.local_node, dtype=torch.int64, device=device)
+        self.fan_rows = torch.tensor(plan.fan_rows, dtype=torch.int64, device=device)
+        self.fan_targets = torch.tensor(plan.fan_targets, dtype=torch.int64, device=device)
+        self.nodes = list(plan.nodes)
 
 
 class IRREPnetSim:
@@ -24,24 +68,90 @@ class IRREPnetSim:
     Supports multi-channel edges, deterministic coupling, and tag-scoped emissions.
     """
 
-    def __init__(self, scenario_file: str, device: torch.device | None = None):
-        self.scenario_path = scenario_file
-        self.scenario: Scenario = load_scenario(scenario_file)
+    def __init__(
+        self,
+        scenario_file: str | Scenario,
+        device: torch.device | None = None,
+        *,
+        count_dtype: torch.dtype = torch.int32,
+        memory_budget: Optional[int] = None,
+        max_count: Optional[int] = None,
+        layout: Optional[MemoryLayout] = None,
+        reorder: Optional[str] = None,
+        backend: str = "auto",
+        reduce_phases: bool = False,
+    ):
+        """
+        `reorder` ("rcm" or "bfs") renumbers nodes and edges for locality; IDs seen by the
+        user (edge and node IDs, readouts, `export_counts`) are unaffected.
+        `memory_budget` (bytes) picks the fastest layout whose estimate fits, or raises
+        `E_MEMORY_BUDGET` before anything is allocated; `max_count` (an upper bound on any
+        count bin) lets it narrow the count dtype. An explicit `layout` is used as is.
+        `backend` is "torch", "numpy" (CPU only) or "auto": NumPy on the CPU for scenarios of at
+        most `backends.NUMPY_AUTO_CELLS` count bins unless a non-CPU `device` is given. A layout
+        with `storage="mmap"` (also the last resort of `memory_budget`) runs the "mmap" backend;
+        one with `state="inbox"` keeps a histogram per node rather than per edge, and `counts` is
+        then materialized on access.
+        `reduce_phases` (opt-in) runs a scenario whose dynamics stay in a coset of a subgroup of Z_k
+        at k/d (see `loader.detect_phase_reduction`): the state then has `self.bins = k/d` phase
+        bins, while `self.k`, the mutation API, `export_counts`/`import_counts` and readouts keep
+        the declared Z_k. `counts` and `gauge` are then in internal units, so code that indexes
+        them directly by declared phase should leave it off.
+        A mutation or `import_counts` that leaves the coset expands the sim until `reset()`;
+        `expand_phases()` leaves the reduction for good.
+        """
+        self.reorder = reorder
+        self.reduce_phases = reduce_phases
+        self._reduce = reduce_phases
+        if isinstance(scenario_file, Scenario):
+            self.scenario_path = None
+            source = scenario_file if reorder is None else reorder_scenario(scenario_file, reorder)
+            self._source_scenario = copy.deepcopy(source)
+        else:
+            self.scenario_path = scenario_file
+            self._source_scenario = None
+        self.scenario: Scenario = self._load()
+        self.memory: Optional[MemoryEstimate] = None
+        if layout is None and memory_budget is not None:
+            self.memory = choose_layout(
+                self.scenario, memory_budget, dtype=count_dtype, max_count=max_count, reduce_phases=reduce_phases
+            )
+            layout = self.memory.layout
+        self.layout = layout or MemoryLayout(count_dtype=count_dtype)
+        cells = len(self.scenario.directed_edges) * len(self.scenario.channels) * self.scenario.k
+        self.backend, device = resolve_backend(backend, device, cells, self.layout.storage, self.layout.state)
         self.device = self._select_device(device)
+        self.profiler: Optional[SimProfiler] = None
+        self._step_hooks: List[Callable[["IRREPnetSim"], None]] = []
+        self.stability: Optional[StabilityResult] = None
+        self._stability_origin: Any = None
+        self._storage_tmp: Optional[tempfile.TemporaryDirectory] = None
         self._build()
 
+    @staticmethod
+    def estimate_memory(
+        scenario: str | Scenario,
+        batch: int = 1,
+        dtype: torch.dtype = torch.int32,
+        layout: Optional[MemoryLayout] = None,
+        reduce_phases: bool = False,
+    ) -> MemoryEstimate:
+        """Peak device bytes for state, masks, plans and layer temporaries, without allocating."""
+        return estimate_memory(scenario, batch=batch, dtype=dtype, layout=layout, reduce_phases=reduce_phases)
+
+    def _load(self) -> Scenario:
+        if self._source_scenario is not None:
+            return copy.deepcopy(self._source_scenario)
+        return load_scenario(self.scenario_path, reorder=self.reorder)
+
     def _select_device(self, device: torch.device | None) -> torch.device:
-        if device is not None:
-            return device
-        if torch.backends.mps.is_available():
-            return torch.device("mps")
-        if torch.cuda.is_available():
-            return torch.device("cuda")
-        return torch.device("cpu")
+        return select_device(device)
 
     def _build(self) -> None:
-        scenario = self.scenario
-        self.k = scenario.k
+        self.reduction: Optional[PhaseReduction] = detect_phase_reduction(self.scenario) if self._reduce else None
+        scenario = self.scenario if self.reduction is None else reduce_scenario(self.scenario, self.reduction)
+        self.k = self.scenario.k
+        self.bins = scenario.k  # phase bins of the state (k, or k/d under a phase reduction)
         self.num_channels = len(scenario.channels)
         self.num_edges = len(scenario.directed_edges)
         self.num_nodes = scenario.node_count
@@ -71,14 +181,38 @@ class IRREPnetSim:
         )
         self.any_neutral_channel = bool(self.channel_is_neutral.any().item())
 
-        self.fusion_mask = torch.tensor(scenario.fusion_mask, dtype=torch.uint8, device=self.device)
+        mask = torch.tensor(scenario.fusion_mask, dtype=torch.uint8)
+        if self.layout.masks == "compact":
+            table, mask_id = torch.unique(mask.view(self.num_edges, -1), dim=0, return_inverse=True)
+            self.mask_table = table.view(-1, self.num_channels, self.bins).to(self.device)
+            self.mask_id = mask_id.to(self.device)
+        else:
+            self.mask_table = mask.to(self.device)
+            self.mask_id = None
 
-        self.counts = torch.zeros(
-            (self.num_edges, self.num_channels, self.k),
-            dtype=torch.int32,
-            device=self.device,
-        )
-        self.counts_next = torch.zeros_like(self.counts)
+        self.count_dtype = self.layout.count_dtype
+        self._mapped: List[MappedCounts] = []
+        self.inbox: Optional[InboxState] = None
+        if self.layout.state == "inbox":
+            self.inbox = InboxState(
+                self.src, self.num_nodes, self.num_channels, self.bins, self.count_dtype, self.device
+            )
+            self._counts = None
+            self.counts_next = None
+        elif self.layout.storage == "mmap":
+            shape = (self.num_edges, self.num_channels, self.bins)
+            self._mapped = [
+                MappedCounts(os.path.join(self._storage_dir(), name), shape, self.count_dtype)
+                for name in ("counts-a.bin", "counts-b.bin")
+            ]
+            self.counts, self.counts_next = (mapped.tensor for mapped in self._mapped)
+        else:
+            self.counts = torch.zeros(
+                (self.num_edges, self.num_channels, self.bins),
+                dtype=self.count_dtype,
+                device=self.device,
+            )
+            self.counts_next = torch.zeros_like(self.counts)
 
         self._init_counts(scenario.counts_init)
 
@@ -87,80 +221,312 @@ class IRREPnetSim:
         self.readouts = list(scenario.measurement)
         self.coupling_rules = list(scenario.coupling_rules)
 
-        self.phase_range = torch.arange(self.k, dtype=torch.int64, device=self.device)
+        self.phase_range = torch.arange(self.bins, dtype=torch.int64, device=self.device)
 
+        # out-edges in load order, so routing draws do not depend on reordering
+        self.edge_enabled = [True] * self.num_edges
         self.out_index: List[List[int]] = [[] for _ in range(self.num_nodes)]
-        for edge_idx, edge in enumerate(scenario.directed_edges):
+        self.in_index: List[List[int]] = [[] for _ in range(self.num_nodes)]
+        for edge_idx in sorted(range(self.num_edges), key=lambda e: scenario.edge_order[e]):
+            edge = scenario.directed_edges[edge_idx]
             self.out_index[edge.src].append(edge_idx)
+            self.in_index[edge.dst].append(edge_idx)
+        self._out_all = [list(edges) for edges in self.out_index]  # including disabled edges
+        self.export_index: Optional[torch.Tensor] = None
+        if scenario.edge_order != list(range(self.num_edges)):
+            inverse = [0] * self.num_edges
+            for edge_idx, position in enumerate(scenario.edge_order):
+                inverse[position] = edge_idx
+            self.export_index = torch.tensor(inverse, dtype=torch.int64, device=self.device)
+        self._plans = [self._plan_layer(layer) for layer in self.layers]
+        self._layers_by_edge: Dict[int, List[int]] = {}
+        self._layers_by_dst: Dict[int, List[int]] = {}
+        for layer_idx, layer in enumerate(self.layers):
+            for edge_idx in layer:
+                self._layers_by_edge.setdefault(edge_idx, []).append(layer_idx)
+                self._layers_by_dst.setdefault(scenario.directed_edges[edge_idx].dst, []).append(layer_idx)
+        # host-side caches, invalidated by the mutation API
+        self._delta_cache: Dict[Tuple[int, bool], int] = {}
+        self._delta_version: Tuple[int, ...] = ()
+        self._target_cache: Dict[Tuple[int, int], List[int]] = {}
+        self._state_weights: Optional[torch.Tensor] = None
+
+        # Stochastic rules draw from a counter-based RNG keyed by (seed, layer tick, rule, node id),
+        # so draws do not depend on evaluation order.
+        self.rng = CounterRNG(scenario.seed, self.device)
+        self.node_keys = self.rng.entity_keys(torch.tensor(scenario.node_ids, dtype=torch.int64, device=self.device))
+        self.rule_streams = list(range(len(self.coupling_rules)))
+        self.step_count = 0
+        self.layer_tick = 0
+        self._backend = BACKENDS[self.backend](self)
+
+    def _storage_dir(self) -> str:
+        if self.layout.storage_dir is not None:
+            os.makedirs(self.layout.storage_dir, exist_ok=True)
+            return self.layout.storage_dir
+        if self._storage_tmp is None:
+            self._storage_tmp = tempfile.TemporaryDirectory(prefix="irrepnet-counts-")
+        return self._storage_tmp.name
+
+    def _plan_layer(self, edges: Sequence[int]) -> List[_LayerChunk]:
+        edge_dst = [edge.dst for edge in self.scenario.directed_edges]
+        active = [edge for edge in edges if self.edge_enabled[edge]]
+        chunks = plan_layer(active, edge_dst, self.out_index, self.layout.chunk_rows)
+        return [_LayerChunk(chunk, self.device) for chunk in chunks]
+
+    @property
+    def fusion_mask(self) -> torch.Tensor:
+        """Dense [E, C, k] uint8 mask (materialized when masks are compact)."""
+        if self.mask_id is None:
+            return self.mask_table
+        return self.mask_table.index_select(0, self.mask_id)
+
+    def _edge_masks(self, edge_idx: torch.Tensor) -> torch.Tensor:
+        if self.mask_id is None:
+            return self.mask_table.index_select(0, edge_idx)
+        return self.mask_table.index_select(0, self.mask_id.index_select(0, edge_idx))
+
+    def _edge_deltas(self, edge_idx: torch.Tensor, gauge: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        [R, C] int64 phase shift of the selected edges per channel, not yet taken mod k:
+        `g_src - g_dst + offset` on charged channels, `offset` on neutral ones. `gauge` replaces
+        the node gauges.
+        """
+        gauge = (self.gauge if gauge is None else gauge).to(torch.int64)
+        offsets = self.edge_offset.index_select(0, edge_idx).to(torch.int64)
+        base = gauge.index_select(0, self.src.index_select(0, edge_idx)) - gauge.index_select(
+            0, self.dst.index_select(0, edge_idx)
+        )
+        charged = (~self.channel_is_neutral).to(torch.int64)
+        return offsets.unsqueeze(1) + base.unsqueeze(1) * charged.unsqueeze(0)
+
+    @property
+    def counts(self) -> torch.Tensor:
+        """[E, C, k] count state (materialized when the state is node inboxes)."""
+        if self.inbox is None:
+            return self._counts
+        return self.inbox.materialize()
+
+    @counts.setter
+    def counts(self, value: torch.Tensor) -> None:
+        self._counts = value
 
     def _init_counts(self, counts_init: Sequence[CountInitEntry]) -> None:
         for entry in counts_init:
-            self.counts[entry.edge, entry.channel, entry.phase] += int(entry.value)
+            if self.inbox is not None:
+                self.inbox.add(entry.edge, entry.channel, entry.phase, int(entry.value))
+            else:
+                self.counts[entry.edge, entry.channel, entry.phase] += int(entry.value)
+
+    def _set_counts(self, counts: torch.Tensor) -> None:
+        """Replace the state with internal-order [E, C, bins] `counts` and clear the next buffer."""
+        if self.inbox is not None:
+            self.inbox.load(counts)
+            return
+        self.counts.copy_(counts)
+        self.counts_next.zero_()
 
     def reset(self) -> None:
-        self.scenario = load_scenario(self.scenario_path)
+        self.scenario = self._load()
         self._build()
 
-    def step(self) -> None:
-        for _ in range(self.repeat):
-            for edge_indices in self.layers:
-                if not edge_indices:
-                    continue
-                self._apply_layer(edge_indices)
-                self.counts, self.counts_next = self.counts_next, self.counts
-                self.counts_next.zero_()
+    def expand_phases(self) -> None:
+        """Leave a phase reduction for good: rebuild at the declared k, keeping counts, clocks and mutations."""
+        self._reduce = False
+        if self.reduction is not None:
+            self._rebuild_phases(reduce=False)
 
-    @torch.no_grad()
-    def _apply_layer(self, edges: Sequence[int]) -> None:
-        device = self.device
-        edge_idx = torch.tensor(edges, dtype=torch.int64, device=device)
-        src = self.src.index_select(0, edge_idx)
-        dst = self.dst.index_select(0, edge_idx)
-        offsets = self.edge_offset.index_select(0, edge_idx).to(torch.int16)
+    @contextlib.contextmanager
+    def expanded_phases(self) -> Iterator[None]:
+        """Run a block at the declared k, then return to the reduction if the state still allows it."""
+        reduced = self.reduction is not None
+        if reduced:
+            self._rebuild_phases(reduce=False)
+        try:
+            yield
+        finally:
+            if reduced:
+                self._rebuild_phases(reduce=True)
 
-        gauge_src = self.gauge.index_select(0, src).to(torch.int16)
-        gauge_dst = self.gauge.index_select(0, dst).to(torch.int16)
+    def _rebuild_phases(self, *, reduce: bool) -> None:
+        """Rebuild with or without the reduction; `self._reduce` (what `reset()` does) is kept."""
+        counts = self.export_counts()
+        clocks = (self.step_count, self.layer_tick)
+        disabled = [edge_idx for edge_idx, enabled in enumerate(self.edge_enabled) if not enabled]
+        policy, self._reduce = self._reduce, reduce
+        self._build()
+        self._reduce = policy
+        self.import_counts(counts)
+        self.step_count, self.layer_tick = clocks
+        for edge_idx in disabled:
+            self.enable_edge(self.scenario.directed_edges[edge_idx].id, False)
+        self._mutated()
 
-        delta_base = (gauge_src - gauge_dst + offsets) % self.k  # [E_sel]
-        delta_neutral = (offsets % self.k).to(torch.int64)
+    def _internal_step(self, value: int) -> int:
+        """A declared phase difference (gauge, offset) in internal units, expanding if it leaves the subgroup."""
+        if self.reduction is not None and value % self.reduction.d:
+            self._rebuild_phases(reduce=False)
+        return value if self.reduction is None else value // self.reduction.d
 
-        delta = delta_base.unsqueeze(1).repeat(1, self.num_channels).to(torch.int64)
-        if self.any_neutral_channel:
-            neutral_mask = self.channel_is_neutral
-            delta[:, neutral_mask] = delta_neutral.unsqueeze(1)
+    def _internal_phase(self, phase: int) -> int:
+        """A declared phase in internal units, expanding if it is outside the coset."""
+        if self.reduction is not None and self.reduction.internal(phase) is None:
+            self._rebuild_phases(reduce=False)
+        if self.reduction is None:
+            return phase
+        internal = self.reduction.internal(phase)
+        assert internal is not None
+        return internal
 
-        shift = (self.phase_range.view(1, 1, -1) - delta.unsqueeze(-1)) % self.k  # [E_sel, C, k]
+    def _declared_phases(self, counts: torch.Tensor) -> torch.Tensor:
+        """Scatter the internal phase axis (last) of `counts` onto the declared Z_k."""
+        if self.reduction is None:
+            return counts
+        declared = counts.new_zeros(counts.shape[:-1] + (self.reduction.k,))
+        phases = [self.reduction.declared(j) for j in range(self.bins)]
+        declared[..., phases] = counts
+        return declared
 
-        src_counts = self.counts.index_select(0, edge_idx)  # [E_sel, C, k]
-        shifted = src_counts.gather(2, shift)  # [E_sel, C, k]
+    def enable_profiling(self, **options: Any) -> SimProfiler:
+        """Attach a `SimProfiler` (options are forwarded to it) and return it."""
+        self.profiler = SimProfiler(self.device, **options)
+        return self.profiler
 
-        mask = self.fusion_mask.index_select(0, edge_idx).to(torch.int32)
-        allowed = shifted.to(torch.int32) * mask  # [E_sel, C, k]
-
-        node_incoming: Dict[int, torch.Tensor] = {}
-        nodes_touched: List[int] = []
-        for row, node in enumerate(dst.tolist()):
-            allowed_slice = allowed[row]
-            if node not in node_incoming:
-                node_incoming[node] = torch.zeros(
-                    (self.num_channels, self.k),
-                    dtype=torch.int32,
-                    device=device,
-                )
-                nodes_touched.append(node)
-            node_incoming[node].add_(allowed_slice)
+    def disable_profiling(self) -> Optional[SimProfiler]:
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
+    def add_step_hook(self, hook: Callable[["IRREPnetSim"], None]) -> None:
+        """Call `hook(sim)` at the end of every `step()` (after `step_count` advances)."""
+        self._step_hooks.append(hook)
+
+    def remove_step_hook(self, hook: Callable[["IRREPnetSim"], None]) -> None:
+        self._step_hooks.remove(hook)
+
+    def _phase(self, name: str) -> ContextManager[Any]:
+        if self.profiler is None:
+            return _NO_PHASE
+        return self.profiler.phase(name)
 
-            for target_edge in self.out_index[node]:
-                self.counts_next[target_edge] += allowed_slice
+    def _count(self, name: str, amount: int = 1) -> None:
+        if self.profiler is not None:
+            self.profiler.count(name, amount)
 
-        if not self.coupling_rules:
+    def step(self) -> None:
+        self._step(None)
+
+    def _step(self, schedule: Optional[Sequence[Sequence[_LayerChunk]]]) -> None:
+        """One step; `schedule` optionally replaces the chunks of each layer application (see `prune`)."""
+        application = 0
+        for _ in range(self.repeat):
+            for layer_idx, chunks in enumerate(self._plans):
+                active = chunks
+                if schedule is not None:
+                    active = schedule[application]
+                    application += 1
+                if not self.layers[layer_idx]:
+                    continue  # a layer whose edges are all disabled still runs and clears the state
+                if self.profiler is not None:
+                    self.profiler.begin_layer(self.step_count, layer_idx)
+                self._backend.apply_layer(layer_idx, active)
+                self._advance()
+                self.layer_tick += 1
+        self.step_count += 1
+        for hook in self._step_hooks:
+            hook(self)
+
+    def _advance(self) -> None:
+        """The next state becomes current after a layer application."""
+        if self.inbox is not None:
+            self.inbox.advance()
             return
+        self.counts, self.counts_next = self.counts_next, self.counts
+        self._backend.clear_next()
+
+    @torch.no_grad()
+    def _apply_layer(self, chunks: Sequence[_LayerChunk]) -> None:
+        for chunk in chunks:
+            with self._phase("propagate"):
+                allowed = self._propagate(chunk)
 
-        for node in nodes_touched:
-            incoming = node_incoming[node]
-            if incoming.sum().item() == 0:
+            if not self.coupling_rules:
                 continue
-            self._apply_coupling(node, incoming)
+
+            with self._phase("coupling"):
+                incoming = torch.zeros(
+                    (len(chunk.nodes), self.num_channels, self.bins),
+                    dtype=self.count_dtype,
+                    device=self.device,
+                )
+                incoming.index_add_(0, chunk.local_node, allowed)
+                totals = incoming.sum(dim=(1, 2)).tolist()
+                self._count("host_syncs")
+                for local, node in enumerate(chunk.nodes):
+                    if totals[local] == 0:
+                        continue
+                    self._apply_coupling(node, incoming[local])
+
+    def _propagate(self, chunk: _LayerChunk) -> torch.Tensor:
+        """Shift, mask and fan out one chunk into `counts_next`; returns the masked rows [R, C, k]."""
+        edge_idx = chunk.edge_idx
+        dst = self.dst.index_select(0, edge_idx)
+        delta = self._edge_deltas(edge_idx)  # [E_sel, C]
+        shift = (self.phase_range.view(1, 1, -1) - delta.unsqueeze(-1)) % self.bins  # [E_sel, C, k]
+
+        if self.inbox is not None:
+            src_counts = self.inbox.read(edge_idx)
+        else:
+            src_counts = self.counts.index_select(0, edge_idx)  # [E_sel, C, k]
+        shifted = src_counts.gather(2, shift)  # [E_sel, C, k]
+
+        mask = self._edge_masks(edge_idx).to(self.count_dtype)
+        allowed = shifted * mask  # [E_sel, C, k]
+
+        self._count("nodes_touched", len(chunk.nodes))
+        if self.inbox is not None:
+            self.inbox.deliver(dst, allowed)  # one inbox row per node instead of one row per out-edge
+        elif chunk.fan_rows.numel():
+            self.counts_next.index_add_(0, chunk.fan_targets, allowed.index_select(0, chunk.fan_rows))
+            self._count("edges_written", int(chunk.fan_rows.numel()))
+        return allowed
+
+    @torch.no_grad()
+    def _propagate_slots(
+        self,
+        state: torch.Tensor,
+        steps: int,
+        *,
+        gauge: Optional[torch.Tensor] = None,
+        slot_shift: Optional[torch.Tensor] = None,
+        moved: Optional[Callable[[torch.Tensor, torch.Tensor], torch.Tensor]] = None,
+    ) -> torch.Tensor:
+        """
+        `steps` coupling-free steps of a [E, C, k, S] state holding S independent copies on its
+        trailing slot axis. `gauge` replaces the node gauges, `slot_shift` [E, C, S] adds a shift
+        per copy, and `moved(edge_idx, shifted)` may remap the shifted rows before masking.
+        """
+        bins, slot_count = state.shape[2], state.shape[3]
+        phase = self.phase_range.view(1, 1, bins, 1)
+        for _ in range(steps):
+            for _ in range(self.repeat):
+                for layer, chunks in zip(self.layers, self._plans):
+                    if not layer:
+                        continue
+                    nxt = torch.zeros_like(state)
+                    for chunk in chunks:
+                        edge_idx = chunk.edge_idx
+                        shift = self._edge_deltas(edge_idx, gauge).unsqueeze(-1)  # [R, C, 1]
+                        if slot_shift is not None:
+                            shift = shift + slot_shift.index_select(0, edge_idx)  # [R, C, S]
+                        index = (phase - shift.unsqueeze(2)) % bins
+                        shifted = state.index_select(0, edge_idx).gather(2, index.expand(-1, -1, -1, slot_count))
+                        if moved is not None:
+                            shifted = moved(edge_idx, shifted)
+                        allowed = shifted * self._edge_masks(edge_idx).to(state.dtype).unsqueeze(-1)
+                        if chunk.fan_rows.numel():
+                            nxt.index_add_(0, chunk.fan_targets, allowed.index_select(0, chunk.fan_rows))
+                    state = nxt
+        return state
 
     def _apply_coupling(self, node_idx: int, incoming: torch.Tensor) -> None:
         node_tags = self.node_tags[node_idx]
@@ -168,15 +534,15 @@ class IRREPnetSim:
             return
 
         working = incoming.clone()
-        staged_outputs: List[Tuple[CouplingRule, List[int], List[Tuple[int, torch.Tensor, PhaseInstruction]]]] = []
+        staged_outputs: List[Tuple[CouplingRule, int, List[int], List[Tuple[int, torch.Tensor, PhaseInstruction]]]] = []
 
-        for rule in self.coupling_rules:
+        for rule_idx, rule in enumerate(self.coupling_rules):
             if rule.node_tags_any:
                 scope = set(rule.node_tags_any)
                 if node_tags.isdisjoint(scope):
                     continue
 
-            target_edges = self._select_target_edges(node_idx, rule)
+            target_edges = self._select_target_edges(node_idx, rule_idx, rule)
             if not target_edges:
                 continue
 
@@ -184,34 +550,103 @@ class IRREPnetSim:
             if multiplicity <= 0:
                 continue
 
-            consumed = self._consume_inputs(working, rule, multiplicity)
+            stream = self.rule_streams[rule_idx]
+            if rule.probability < 1.0:
+                multiplicity = self._thin_multiplicity(node_idx, stream, rule, multiplicity)
+                if multiplicity <= 0:
+                    continue
+
+            if self.profiler is not None:
+                self.profiler.rule_fired(rule.name, multiplicity)
+            with self._phase("consume"):
+                consumed = self._consume_inputs(working, rule, multiplicity)
             emissions = self._build_rule_emissions(rule, consumed, multiplicity)
             if not emissions:
                 continue
 
-            staged_outputs.append((rule, target_edges, emissions))
+            staged_outputs.append((rule, stream, target_edges, emissions))
+
+        if staged_outputs:
+            with self._phase("emit"):
+                self._emit(node_idx, staged_outputs)
 
-        for rule, target_edges, emissions in staged_outputs:
+    def _emit(
+        self,
+        node_idx: int,
+        staged_outputs: List[Tuple[CouplingRule, int, List[int], List[Tuple[int, torch.Tensor, PhaseInstruction]]]],
+    ) -> None:
+        for rule, stream, target_edges, emissions in staged_outputs:
             for channel_idx, hist, instr in emissions:
+                self._count("host_syncs")
                 if hist.sum().item() == 0:
                     continue
-                for edge_idx in target_edges:
-                    applied = self._apply_phase_instruction(channel_idx, hist, instr, edge_idx)
-                    self.counts_next[edge_idx, channel_idx, :] += applied
+                per_target = None
+                if rule.route == "random_one":
+                    per_target = self._route_random_one(node_idx, stream, channel_idx, hist, len(target_edges))
+                for position, edge_idx in enumerate(target_edges):
+                    source = hist if per_target is None else per_target[position]
+                    applied = self._apply_phase_instruction(channel_idx, source, instr, edge_idx)
+                    if self.inbox is not None:
+                        self.inbox.emit(edge_idx, channel_idx, applied)
+                    else:
+                        self.counts_next[edge_idx, channel_idx, :] += applied
+                self._count("edges_written", len(target_edges))
 
-    def _select_target_edges(self, node_idx: int, rule: CouplingRule) -> List[int]:
+    def _node_tick(self, node_idx: int) -> int:
+        """Layer tick that keys `node_idx`'s random draws (per packed scenario in `MultiScenarioSim`)."""
+        return self.layer_tick
+
+    def _thin_multiplicity(self, node_idx: int, stream: int, rule: CouplingRule, multiplicity: int) -> int:
+        """Each of the `multiplicity` firings happens independently with `rule.probability` (one binomial draw)."""
+        tick = self._node_tick(node_idx)
+        fired = self.rng.binomial(self.node_keys[node_idx], multiplicity, rule.probability, tick, stream)
+        self._count("host_syncs")
+        return int(fired.item())
+
+    def _route_random_one(
+        self,
+        node_idx: int,
+        stream: int,
+        channel: int,
+        histogram: torch.Tensor,
+        target_count: int,
+    ) -> torch.Tensor:
+        """
+        Send every emitted count to one uniformly drawn target edge -> [targets, k]: each phase bin
+        is split multinomially, as binomial draws over the targets not yet served, keyed by the
+        declared phase so that a phase-reduced sim routes like the full one.
+        """
+        reduction = self.reduction
+        phases = self.phase_range if reduction is None else reduction.shift + reduction.d * self.phase_range
+        key, tick = self.node_keys[node_idx], self._node_tick(node_idx)
+        remaining = histogram.to(torch.int64)
+        routed = torch.zeros((target_count, self.bins), dtype=torch.int64, device=self.device)
+        for target in range(target_count - 1):
+            chance = 1.0 / (target_count - target)  # over the targets left
+            counter = phases * target_count + target
+            share = self.rng.binomial(key, remaining, chance, tick, stream, counter, lane=channel + 1)
+            routed[target] = share
+            remaining = remaining - share
+        routed[target_count - 1] = remaining
+        return routed.to(self.count_dtype)
+
+    def _select_target_edges(self, node_idx: int, rule_idx: int, rule: CouplingRule) -> List[int]:
+        key = (node_idx, rule_idx)
+        cached = self._target_cache.get(key)
+        if cached is not None:
+            return cached
         edges = self.out_index[node_idx]
-        if not edges:
-            return []
-        if not rule.out_edge_tags_any:
-            return edges
-        scope = set(rule.out_edge_tags_any)
-        return [edge for edge in edges if not self.edge_tags[edge].isdisjoint(scope)]
+        if edges and rule.out_edge_tags_any:
+            scope = set(rule.out_edge_tags_any)
+            edges = [edge for edge in edges if not self.edge_tags[edge].isdisjoint(scope)]
+        self._target_cache[key] = edges
+        return edges
 
     def _rule_multiplicity(self, inventory: torch.Tensor, rule: CouplingRule) -> int:
         if not rule.inputs:
             return 0
         counts = []
+        self._count("host_syncs", len(rule.inputs))
         for inp in rule.inputs:
             total = int(inventory[inp.channel].sum().item())
             counts.append(total // inp.minimum if inp.minimum > 0 else 0)
@@ -227,14 +662,15 @@ class IRREPnetSim:
         for inp in rule.inputs:
             needed = multiplicity * inp.minimum
             channel_counts = inventory[inp.channel]
-            consumed_hist = torch.zeros(self.k, dtype=torch.int32, device=self.device)
+            consumed_hist = torch.zeros(self.bins, dtype=self.count_dtype, device=self.device)
             if needed == 0:
                 consumed[inp.channel] = consumed_hist
                 continue
-            for phase_index in range(self.k):
+            for phase_index in range(self.bins):
                 if needed <= 0:
                     break
                 available = int(channel_counts[phase_index].item())
+                self._count("host_syncs")
                 if available == 0:
                     continue
                 take = min(available, needed)
@@ -272,7 +708,7 @@ class IRREPnetSim:
         consumed: Dict[int, torch.Tensor],
         rule: CouplingRule,
     ) -> torch.Tensor:
-        hist = torch.zeros(self.k, dtype=torch.int32, device=self.device)
+        hist = torch.zeros(self.bins, dtype=self.count_dtype, device=self.device)
         if total == 0:
             return hist
 
@@ -284,6 +720,7 @@ class IRREPnetSim:
             if source_hist is None:
                 return hist
             source_total = int(source_hist.sum().item())
+            self._count("host_syncs")
             if source_total == 0:
                 return hist
             factor = total // source_total
@@ -295,7 +732,7 @@ class IRREPnetSim:
         if instr.kind == "fixed":
             if instr.value is None:
                 raise ValueError(f"E_PHASE_FIXED_VALUE_MISSING: {rule.name}")
-            phase_index = instr.value % self.k
+            phase_index = instr.value % self.bins
             hist[phase_index] = total
             return hist
 
@@ -320,27 +757,311 @@ class IRREPnetSim:
             return torch.roll(histogram, shifts=int(delta), dims=0)
         return histogram
 
+    def _kernel_version(self) -> Tuple[int, ...]:
+        """Changes with every write to the gauge, offset or mask tensors, API or direct (`sim.gauge[n] = g`)."""
+        tensors = (self.gauge, self.edge_offset, self.mask_table, self.mask_id)
+        return tuple(part for tensor in tensors if tensor is not None for part in (id(tensor), tensor._version))
+
     def _edge_channel_delta(self, channel: int, edge_idx: int) -> int:
-        base = int(self.edge_offset[edge_idx].item()) % self.k
-        if self.channel_is_neutral[channel]:
-            return base
-        src = int(self.src[edge_idx].item())
-        dst = int(self.dst[edge_idx].item())
-        gauge_src = int(self.gauge[src].item())
-        gauge_dst = int(self.gauge[dst].item())
-        return (gauge_src - gauge_dst + base) % self.k
+        version = self._kernel_version()
+        if version != self._delta_version:
+            self._delta_cache.clear()
+            self._delta_version = version
+        neutral = self.channels[channel].neutral
+        key = (edge_idx, neutral)
+        cached = self._delta_cache.get(key)
+        if cached is not None:
+            return cached
+        base = int(self.edge_offset[edge_idx].item()) % self.bins
+        self._count("host_syncs")
+        delta = base
+        if not neutral:
+            edge = self.scenario.directed_edges[edge_idx]
+            gauge_src, gauge_dst = self.gauge[[edge.src, edge.dst]].tolist()
+            self._count("host_syncs")
+            delta = (gauge_src - gauge_dst + base) % self.bins
+        self._delta_cache[key] = delta
+        return delta
+
+    @contextlib.contextmanager
+    def _writing_kernels(self, edges: Sequence[int]) -> Iterator[None]:
+        """
+        Wraps a mutation-API write that changes the kernels of `edges` only: just their cached
+        deltas and prepared backend chunks are dropped. Any other write to the gauge, offset or
+        mask tensors moves `_kernel_version()` on unannounced and drops every cache.
+        """
+        before = self._kernel_version()
+        yield
+        after = self._kernel_version()
+        if self._delta_version == before:
+            for edge_idx in edges:
+                self._delta_cache.pop((edge_idx, False), None)
+                self._delta_cache.pop((edge_idx, True), None)
+            self._delta_version = after
+        self._backend.invalidate(edges, before)
+
+    # ------------------------------------------------------------------ #
+    # Mutation API: validated updates of the live sim, rebuilding only the kernels they touch.
+    # Counts are left alone (except `add_counts`); `reset()` restores the loaded scenario.
+
+    def set_gauge(self, node_id: int, phase: int) -> None:
+        phase = int(phase)
+        k = self.k
+        if not (0 <= phase < k):
+            raise ValueError(f"E_GAUGE_PHASE_RANGE: {phase} not in [0..{k - 1}]")
+        node = self.node_index(node_id)
+        self._write_gauge(node, self._internal_step(phase))
+
+    def _write_gauge(self, node: int, phase: int) -> None:
+        """Set an internal gauge phase (declared phases go through `set_gauge`)."""
+        with self._writing_kernels(self.in_index[node] + self._out_all[node]):
+            self.gauge[node] = phase
+        self.scenario.node_gauge[node] = phase if self.reduction is None else phase * self.reduction.d
+        self._mutated()
+
+    def set_edge_offset(self, edge_id: int, offset: int) -> None:
+        edge_idx = self.edge_index(edge_id)
+        offset = int(offset) % self.k
+        with self._writing_kernels([edge_idx]):
+            self.edge_offset[edge_idx] = self._internal_step(offset)
+        edge = self.scenario.directed_edges[edge_idx]
+        self.scenario.directed_edges[edge_idx] = dataclasses.replace(edge, phase_offset=offset)
+        self._mutated()
+
+    def set_mask(self, edge_id: int, channel: int | str, allow_phases: Iterable[int]) -> None:
+        """Replace one edge/channel mask row with the given allowed phases."""
+        edge_idx = self.edge_index(edge_id)
+        channel_idx = self._channel(channel)
+        row = [0] * self.k
+        for phase in allow_phases:
+            phase = int(phase)
+            if not (0 <= phase < self.k):
+                raise ValueError("E_FUSION_MASK_PHASE_RANGE")
+            row[phase] = 1
+        self.scenario.fusion_mask[edge_idx][channel_idx] = row
+        if self.reduction is not None:
+            row = [row[self.reduction.declared(j)] for j in range(self.bins)]
+        values = torch.tensor(row, dtype=torch.uint8, device=self.device)
+        with self._writing_kernels([edge_idx]):
+            if self.mask_id is None:
+                self.mask_table[edge_idx, channel_idx] = values
+            else:
+                pattern = self.mask_table[self.mask_id[edge_idx]].clone()
+                pattern[channel_idx] = values
+                matches = (self.mask_table == pattern).flatten(1).all(dim=1).nonzero()
+                if matches.numel():
+                    self.mask_id[edge_idx] = matches[0, 0]
+                else:
+                    self.mask_table = torch.cat([self.mask_table, pattern.unsqueeze(0)])
+                    self.mask_id[edge_idx] = self.mask_table.shape[0] - 1
+        self._mutated()
+
+    def enable_edge(self, edge_id: int, enabled: bool = True) -> None:
+        """Take a loaded edge out of (or back into) propagation and rule targets."""
+        edge_idx = self.edge_index(edge_id)
+        enabled = bool(enabled)
+        if self.edge_enabled[edge_idx] == enabled:
+            return
+        self.edge_enabled[edge_idx] = enabled
+        if self.inbox is not None:
+            self.inbox.set_enabled(edge_idx, enabled)
+        src = self.scenario.directed_edges[edge_idx].src
+        self.out_index[src] = [edge for edge in self._out_all[src] if self.edge_enabled[edge]]
+        for key in [key for key in self._target_cache if key[0] == src]:
+            del self._target_cache[key]
+        affected = set(self._layers_by_edge.get(edge_idx, [])) | set(self._layers_by_dst.get(src, []))
+        replanned = [edge_idx]
+        for layer_idx in affected:
+            self._plans[layer_idx] = self._plan_layer(self.layers[layer_idx])
+            replanned.extend(self.layers[layer_idx])
+        self._backend.invalidate(replanned, self._kernel_version())  # chunks of the replaced plans
+        self._mutated()
+
+    def add_counts(self, edge_id: int, channel: int | str, phase: int, value: int) -> None:
+        """Add (or, with a negative value, remove) counts in one bin."""
+        edge_idx = self.edge_index(edge_id)
+        channel_idx = self._channel(channel)
+        phase = self._internal_phase(int(phase) % self.k)
+        row = self._edge_rows([edge_idx])[0]
+        total = int(row[channel_idx, phase].item()) + int(value)
+        if total < 0:
+            raise ValueError(f"E_COUNTS_NEGATIVE: edge {edge_id} would hold {total}")
+        if total > torch.iinfo(self.count_dtype).max:
+            raise ValueError(f"E_COUNTS_OVERFLOW: {total} exceeds {self.count_dtype}")
+        if self.inbox is not None:
+            self.inbox.add(edge_idx, channel_idx, phase, int(value))
+        else:
+            self.counts[edge_idx, channel_idx, phase] = total
+        self._mutated()
+
+    def _edge_rows(self, edges: Sequence[int]) -> torch.Tensor:
+        """Current rows [R, C, bins] of the given edge indices."""
+        edge_idx = torch.tensor(list(edges), dtype=torch.int64, device=self.device)
+        if self.inbox is not None:
+            return self.inbox.read(edge_idx)
+        return self.counts.index_select(0, edge_idx)
+
+    def set_rule_scope(
+        self,
+        rule_name: str,
+        nodes_any: Optional[Sequence[str]] = None,
+        out_edges_any: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Replace a coupling rule's node and out-edge tag scopes (None or empty = unscoped)."""
+        matches = [idx for idx, rule in enumerate(self.coupling_rules) if rule.name == rule_name]
+        if not matches:
+            raise ValueError(f"E_RULE_UNKNOWN: {rule_name}")
+        scope = {
+            "node_tags_any": tuple(nodes_any) if nodes_any else None,
+            "out_edge_tags_any": tuple(out_edges_any) if out_edges_any else None,
+        }
+        for rule_idx in matches:
+            # the sim's rules hold internal phases under a reduction, the scenario's declared ones
+            self.coupling_rules[rule_idx] = dataclasses.replace(self.coupling_rules[rule_idx], **scope)
+            declared = self.scenario.coupling_rules[rule_idx]
+            self.scenario.coupling_rules[rule_idx] = dataclasses.replace(declared, **scope)
+            for key in [key for key in self._target_cache if key[1] == rule_idx]:
+                del self._target_cache[key]
+        self._mutated()
+
+    def _channel(self, channel: int | str) -> int:
+        if isinstance(channel, str):
+            if channel not in self.scenario.channel_index:
+                raise ValueError(f"E_CHANNEL_UNKNOWN: {channel}")
+            return self.scenario.channel_index[channel]
+        if not (0 <= int(channel) < self.num_channels):
+            raise ValueError(f"E_CHANNEL_UNKNOWN: {channel}")
+        return int(channel)
+
+    def _mutated(self) -> None:
+        self.stability = None
+        self._stability_origin = None
+
+    def run(self, steps: int, *, outputs: Optional[Sequence[str]] = None, prune: bool = False) -> Dict[str, float]:
+        """
+        Advance `steps` steps and return the readouts (all, or those named in `outputs`).
+        `prune=True` propagates only the backward light cone of those readouts: their values are
+        exact, but counts outside the cone (and other readouts) are not meaningful afterwards.
+        """
+        if steps < 0:
+            raise ValueError("E_RUN_STEPS_RANGE")
+        names = {readout.name for readout in self.readouts}
+        unknown = [name for name in outputs or () if name not in names]
+        if unknown:
+            raise ValueError(f"E_RUN_OUTPUT_UNKNOWN: {unknown}")
+        selected = [readout for readout in self.readouts if outputs is None or readout.name in outputs]
+        if prune:
+            cone = light_cone(self, steps, sorted({edge for readout in selected for edge in readout.edges}))
+            for schedule in cone.schedule:
+                self._step(schedule)
+        else:
+            for _ in range(steps):
+                self.step()
+        measured = self.measure()
+        return {readout.name: measured[readout.name] for readout in selected}
+
+    def light_cone(self, steps: int, outputs: Optional[Sequence[str]] = None) -> LightCone:
+        """Pruned per-step schedules for the next `steps` steps (see `irrepnet.prune`)."""
+        selected = [readout for readout in self.readouts if outputs is None or readout.name in outputs]
+        return light_cone(self, steps, sorted({edge for readout in selected for edge in readout.edges}))
 
     def measure(self) -> Dict[str, float]:
         results: Dict[str, float] = {}
-        for readout in self.readouts:
-            results[readout.name] = measure_counts(
-                self.counts,
-                list(readout.edges),
-                self.k,
-                channels=list(readout.channels) if readout.channels is not None else None,
-            )
+        with self._phase("measure"):
+            for readout in self.readouts:
+                if self.inbox is None:
+                    counts, edges = self.counts, list(readout.edges)
+                else:  # materialize only the readout rows
+                    counts, edges = self._edge_rows(readout.edges), list(range(len(readout.edges)))
+                results[readout.name] = measure_counts(
+                    counts,
+                    edges,
+                    self.bins,
+                    channels=list(readout.channels) if readout.channels is not None else None,
+                )
+            self._count("host_syncs", len(self.readouts))
         return results
 
+    def gauge_response(
+        self,
+        nodes: int | Sequence[int],
+        steps: int = 1,
+        *,
+        outputs: Optional[Sequence[str]] = None,
+        method: str = "auto",
+    ) -> GaugeResponse:
+        """Readouts after `steps` steps for every gauge value of `nodes` (see `irrepnet.gauge`)."""
+        return gauge_response(self, nodes, steps, outputs=outputs, method=method)
+
+    def response_library(self, steps: int, *, cache_dir: Optional[str] = None, states: bool = False) -> ResponseLibrary:
+        """Cached unit-source responses after `steps` steps (see `irrepnet.green`)."""
+        return ResponseLibrary(self, steps, cache_dir=cache_dir, states=states)
+
+    def adjoint(self, readout: str, steps: int = 1) -> AdjointResult:
+        """Sensitivity of `readout` after `steps` steps to every current count bin (see `irrepnet.adjoint`)."""
+        return adjoint(self, readout, steps)
+
+    def _hash_weights(self) -> torch.Tensor:
+        if self._state_weights is None:
+            self._state_weights = hash_weights(self.counts.numel(), self.device)
+        return self._state_weights
+
+    def state_hash(self) -> Tuple[int, int]:
+        """128-bit (two int64 words) hash of `counts`; equal states always hash equal."""
+        first, second = state_hash(self.counts, self._hash_weights()).tolist()
+        return first, second
+
+    def run_until_stable(self, max_steps: int, period_max: int = 8, check_every: int = 16) -> StabilityResult:
+        """Step until a fixed point or a cycle of length <= `period_max` (see `irrepnet.stability`)."""
+        return run_until_stable(self, max_steps, period_max=period_max, check_every=check_every)
+
+    def jump_to(self, step: int) -> None:
+        """Move to the state at `step`, using the cycle found by `run_until_stable` when possible."""
+        jump_to(self, step)
+
+    def node_index(self, node_id: int) -> int:
+        """Internal index of a user-facing node ID."""
+        if node_id not in self.scenario.node_index_by_id:
+            raise ValueError(f"E_NODE_UNKNOWN: {node_id}")
+        return self.scenario.node_index_by_id[node_id]
+
+    def edge_index(self, edge_id: int) -> int:
+        """Internal index of a user-facing directed-edge ID."""
+        if edge_id not in self.scenario.edge_index_by_id:
+            raise ValueError(f"E_EDGE_UNKNOWN: {edge_id}")
+        return self.scenario.edge_index_by_id[edge_id]
+
+    def export_counts(self, counts: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Counts [E, C, k] with rows in load (YAML) order of the directed edges and declared phases."""
+        counts = self.counts if counts is None else counts
+        if self.export_index is None:
+            exported = counts.clone()
+        else:
+            exported = counts.index_select(0, self.export_index)
+        return self._declared_phases(exported)
+
+    def import_counts(self, counts: torch.Tensor) -> None:
+        """Replace the state with `export_counts`-layout counts (expanding if they leave the coset)."""
+        counts = counts.to(device=self.device, dtype=self.count_dtype)
+        if self.reduction is not None:
+            phases = [self.reduction.declared(j) for j in range(self.bins)]
+            outside = counts.clone()
+            outside[..., phases] = 0
+            if bool(outside.any()):
+                self._rebuild_phases(reduce=False)
+            else:
+                counts = counts[..., phases]
+        if self.export_index is not None:
+            counts = counts.index_select(0, self._import_index())
+        self._set_counts(counts)
+        self._mutated()
+
+    def _import_index(self) -> torch.Tensor:
+        assert self.export_index is not None
+        inverse = torch.empty_like(self.export_index)
+        inverse[self.export_index] = torch.arange(self.num_edges, device=self.device)
+        return inverse
+
     def export_state(self) -> Dict[str, Any]:
         return {
             "k": self.k,
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from .rng import mix32
+
+STABILITY_STATUS = ("fixed_point", "cycle", "max_steps")
+
+
+@dataclass
+class StabilityResult:
+    """
+    `cycle_start` is the first step whose state recurs and `period` the recurrence length
+    (1 for a fixed point); both are None when `status == "max_steps"`.
+    """
+
+    status: str
+    steps: int  # steps taken by run_until_stable
+    step: int  # sim.step_count when it returned
+    period: Optional[int] = None
+    cycle_start: Optional[int] = None
+
+    @property
+    def stable(self) -> bool:
+        return self.status != "max_steps"
+
+
+class _Origin:
+    """State the search started from, kept so `jump_to` can go back before the cycle."""
+
+    def __init__(self, sim: Any):
+        self.step = sim.step_count
+        self.layer_tick = sim.layer_tick
+        self.counts = sim.counts.clone()
+
+
+def hash_weights(numel: int, device: torch.device) -> torch.Tensor:
+    """Two fixed pseudo-random 32-bit weights per count cell: [2, numel] int64."""
+    index = torch.arange(numel, dtype=torch.int64, device=device)
+    return torch.stack([mix32(index + 0x1B873593), mix32(index ^ 0x5BD1E995) | 1])
+
+
+def state_hash(counts: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    """Device-side [2] int64 polynomial hash (sums wrap mod 2**64)."""
+    return (weights * counts.reshape(1, -1).to(torch.int64)).sum(dim=1)
+
+
+def run_until_stable(sim: Any, max_steps: int, period_max: int = 8, check_every: int = 16) -> StabilityResult:
+    """
+    Step until the counts reach a fixed point or a cycle of length <= `period_max`, or until
+    `max_steps` steps. Hashes stay on the device and are read back every `check_every` steps;
+    a hash repeat is confirmed by stepping one period and comparing counts exactly.
+    """
+    if max_steps < 0:
+        raise ValueError("E_STABLE_MAX_STEPS_RANGE")
+    if period_max < 1:
+        raise ValueError("E_STABLE_PERIOD_RANGE")
+    if check_every < 1:
+        raise ValueError("E_STABLE_CHECK_RANGE")
+    stochastic = [rule.name for rule in sim.coupling_rules if rule.probability < 1.0 or rule.route != "all"]
+    if stochastic:
+        raise ValueError(f"E_STABLE_STOCHASTIC: rules {stochastic} make the step depend on more than counts")
+
+    weights = sim._hash_weights()
+    origin = _Origin(sim)
+    start = sim.step_count
+    seen: Dict[Tuple[int, int], int] = {}
+    pending: List[Tuple[int, torch.Tensor]] = [(sim.step_count, state_hash(sim.counts, weights))]
+
+    while True:
+        done = sim.step_count - start >= max_steps
+        if len(pending) >= check_every or done:
+            values = torch.stack([value for _, value in pending]).tolist()
+            for (step, _), value in zip(pending, values):
+                key = (value[0], value[1])
+                previous = seen.get(key)
+                if previous is not None and step - previous <= period_max:
+                    period = step - previous
+                    if _confirm_period(sim, period):
+                        status = "fixed_point" if period == 1 else "cycle"
+                        result = StabilityResult(status, sim.step_count - start, sim.step_count, period, previous)
+                        sim.stability, sim._stability_origin = result, origin
+                        return result
+                    # hash collision: restart the search from here
+                    seen.clear()
+                    pending = [(sim.step_count, state_hash(sim.counts, weights))]
+                    break
+                seen[key] = step
+            else:
+                pending = []
+            if done:
+                result = StabilityResult("max_steps", sim.step_count - start, sim.step_count)
+                sim.stability, sim._stability_origin = result, origin
+                return result
+            continue
+        sim.step()
+        pending.append((sim.step_count, state_hash(sim.counts, weights)))
+
+
+def _confirm_period(sim: Any, period: int) -> bool:
+    snapshot = sim.counts.clone()
+    for _ in range(period):
+        sim.step()
+    return torch.equal(sim.counts, snapshot)
+
+
+def jump_to(sim: Any, step: int) -> None:
+    """
+    Put the sim in the state it has at `step`: inside a detected cycle this takes fewer than
+    `period` steps; otherwise it re-simulates from the stored origin (or from reset).
+    """
+    if step < 0:
+        raise ValueError("E_JUMP_STEP_RANGE")
+    result: Optional[StabilityResult] = sim.stability
+    origin: Optional[_Origin] = sim._stability_origin
+    if step == sim.step_count:
+        return
+    in_cycle = result is not None and result.period is not None
+    if in_cycle and step >= result.cycle_start and sim.step_count >= result.cycle_start:
+        for _ in range((step - sim.step_count) % result.period):
+            sim.step()
+        _set_clock(sim, step)
+        return
+    if step < sim.step_count:
+        if origin is not None and step >= origin.step:
+            sim._set_counts(origin.counts)
+            sim.step_count, sim.layer_tick = origin.step, origin.layer_tick
+        else:
+            sim.reset()
+    while sim.step_count < step:
+        sim.step()
+
+
+def _set_clock(sim: Any, step: int) -> None:
+    ticks_per_step = sim.repeat * sum(1 for layer in sim.layers if layer)
+    sim.layer_tick += (step - sim.step_count) * ticks_per_step
+    sim.step_count = step
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT = "irrepnet-trajectory/1"
+_DATA = "frames.bin"
+_META = "meta.json"
+
+
+@dataclass(frozen=True)
+class _Block:
+    chunk: int  # frame chunk
+    rows: int  # first edge row of the block
+    offset: int  # byte range in frames.bin
+    length: int
+
+
+class TrajectoryWriter:
+    """
+    Streams `[E, C, k]` count snapshots into a chunked, compressed store (a directory).
+
+    Frames are grouped into chunks of `chunk_frames` and edges into blocks of `edge_block` rows;
+    each (chunk, block) is one zlib record in `frames.bin`. The first frame of a chunk stores its
+    rows in full, later frames only the rows that changed since the previous frame, so a reader
+    decodes at most one chunk of one block to reach any (step, edge range).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        num_edges: int,
+        channels: Sequence[str],
+        k: int,
+        dtype: Any = np.int32,
+        edge_ids: Optional[Sequence[int]] = None,
+        chunk_frames: int = 64,
+        edge_block: int = 4096,
+        level: int = 1,
+    ):
+        if chunk_frames < 1:
+            raise ValueError("E_TRAJECTORY_CHUNK_RANGE")
+        if edge_block < 1:
+            raise ValueError("E_TRAJECTORY_BLOCK_RANGE")
+        if edge_ids is not None and len(edge_ids) != num_edges:
+            raise ValueError("E_TRAJECTORY_EDGE_IDS")
+        self.path = path
+        self.shape = (num_edges, len(channels), k)
+        self.dtype = np.dtype(dtype)
+        self.channels = list(channels)
+        self.edge_ids = list(edge_ids) if edge_ids is not None else list(range(num_edges))
+        self.chunk_frames = chunk_frames
+        self.edge_block = edge_block
+        self.level = level
+        self.steps: List[int] = []
+        self._blocks: List[_Block] = []
+        self._previous: Optional[np.ndarray] = None
+        self._pending: List[List[bytes]] = [[] for _ in range(0, max(num_edges, 1), edge_block)]
+        os.makedirs(path, exist_ok=True)
+        self._data = open(os.path.join(path, _DATA), "wb")
+        self._closed = False
+
+    def __enter__(self) -> "TrajectoryWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def append(self, step: int, counts: Any) -> None:
+        if self._closed:
+            raise ValueError("E_TRAJECTORY_CLOSED")
+        frame = np.array(_as_numpy(counts), dtype=self.dtype)  # owned: callers recycle their buffers
+        if frame.shape != self.shape:
+            raise ValueError(f"E_TRAJECTORY_SHAPE: {frame.shape} != {self.shape}")
+        if self.steps and step <= self.steps[-1]:
+            raise ValueError("E_TRAJECTORY_STEP_ORDER")
+        rows = frame.reshape(self.shape[0], -1)
+        keyframe = len(self.steps) % self.chunk_frames == 0
+        previous = None if keyframe or self._previous is None else self._previous.reshape(self.shape[0], -1)
+        for block, start in enumerate(range(0, self.shape[0], self.edge_block)):
+            current = rows[start : start + self.edge_block]
+            if previous is None:
+                changed = np.arange(current.shape[0], dtype=np.int32)
+            else:
+                changed = np.flatnonzero((current != previous[start : start + self.edge_block]).any(axis=1))
+                changed = changed.astype(np.int32)
+            header = np.array([changed.size], dtype=np.int32)
+            self._pending[block].append(header.tobytes() + changed.tobytes() + current[changed].tobytes())
+        self._previous = frame
+        self.steps.append(int(step))
+        if len(self.steps) % self.chunk_frames == 0:
+            self._flush()
+
+    def _flush(self) -> None:
+        chunk = (len(self.steps) - 1) // self.chunk_frames
+        for block, records in enumerate(self._pending):
+            if not records:
+                continue
+            payload = zlib.compress(b"".join(records), self.level)
+            offset = self._data.tell()
+            self._data.write(payload)
+            self._blocks.append(_Block(chunk, block * self.edge_block, offset, len(payload)))
+            records.clear()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        if self.steps and len(self.steps) % self.chunk_frames:
+            self._flush()
+        self._data.close()
+        meta = {
+            "format": FORMAT,
+            "shape": list(self.shape),
+            "dtype": self.dtype.str,
+            "channels": self.channels,
+            "edge_ids": self.edge_ids,
+            "chunk_frames": self.chunk_frames,
+            "edge_block": self.edge_block,
+            "steps": self.steps,
+            "blocks": [[b.chunk, b.rows, b.offset, b.length] for b in self._blocks],
+        }
+        with open(os.path.join(self.path, _META), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        self._closed = True
+
+
+class TrajectoryReader:
+    """
+    Lazy random access to a store written by `TrajectoryWriter`. `frames.bin` is memory-mapped;
+    only the records covering the requested edge range are decompressed, and the last decoded
+    chunk of each block is cached so sequential reads decode every record once.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, _META), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"E_TRAJECTORY_FORMAT: {meta.get('format')}")
+        self.path = path
+        self.shape: Tuple[int, int, int] = tuple(meta["shape"])  # type: ignore[assignment]
+        self.dtype = np.dtype(meta["dtype"])
+        self.channels: List[str] = meta["channels"]
+        self.edge_ids: List[int] = meta["edge_ids"]
+        self.steps: List[int] = meta["steps"]
+        self.chunk_frames: int = meta["chunk_frames"]
+        self.edge_block: int = meta["edge_block"]
+        self._blocks: Dict[Tuple[int, int], _Block] = {}
+        for chunk, rows, offset, length in meta["blocks"]:
+            self._blocks[(chunk, rows)] = _Block(chunk, rows, offset, length)
+        self._step_index = {step: index for index, step in enumerate(self.steps)}
+        data_path = os.path.join(path, _DATA)
+        self._data = np.memmap(data_path, dtype=np.uint8, mode="r") if os.path.getsize(data_path) else None
+        self._cache: Dict[int, Tuple[int, np.ndarray]] = {}  # block rows -> (chunk, decoded [F, R, C*k])
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def index_of(self, step: int) -> int:
+        if step not in self._step_index:
+            raise ValueError(f"E_TRAJECTORY_STEP_UNKNOWN: {step}")
+        return self._step_index[step]
+
+    def _channel_index(self, channels: Optional[Sequence[int | str]]) -> Optional[List[int]]:
+        if channels is None:
+            return None
+        index = []
+        for channel in channels:
+            if isinstance(channel, str):
+                if channel not in self.channels:
+                    raise ValueError(f"E_TRAJECTORY_CHANNEL_UNKNOWN: {channel}")
+                channel = self.channels.index(channel)
+            index.append(int(channel))
+        return index
+
+    def frame(
+        self,
+        index: int,
+        edges: Optional[slice] = None,
+        channels: Optional[Sequence[int | str]] = None,
+        *,
+        sum_channels: bool = False,
+        sum_phases: bool = False,
+    ) -> np.ndarray:
+        """
+        Counts of the `index`-th stored frame as `[E', C', k]` (see `steps` for its step), restricted
+        to an edge slice and a channel subset and optionally summed over channels and/or phases.
+        """
+        if not (-len(self) <= index < len(self)):
+            raise IndexError(index)
+        index %= len(self)
+        num_edges, num_channels, k = self.shape
+        start, stop, stride = (edges or slice(None)).indices(num_edges)
+        out = np.empty((max(stop - start, 0), num_channels * k), dtype=self.dtype)
+        chunk, local = divmod(index, self.chunk_frames)
+        for block_start in range(start - start % self.edge_block, stop, self.edge_block):
+            decoded = self._decode(chunk, block_start)
+            lo = max(start, block_start)
+            hi = min(stop, block_start + self.edge_block)
+            out[lo - start : hi - start] = decoded[local, lo - block_start : hi - block_start]
+        frame = out.reshape(-1, num_channels, k)[::stride]
+        channel_index = self._channel_index(channels)
+        if channel_index is not None:
+            frame = frame[:, channel_index]
+        if sum_channels:
+            frame = frame.sum(axis=1, keepdims=True)
+        if sum_phases:
+            frame = frame.sum(axis=2, keepdims=True)
+        return frame
+
+    def at_step(self, step: int, **options: Any) -> np.ndarray:
+        return self.frame(self.index_of(step), **options)
+
+    def iter_frames(self, **options: Any) -> Iterator[Tuple[int, np.ndarray]]:
+        """(step, frame) pairs in order; `options` are passed to `frame`."""
+        for index, step in enumerate(self.steps):
+            yield step, self.frame(index, **options)
+
+    def _decode(self, chunk: int, block_start: int) -> np.ndarray:
+        cached = self._cache.get(block_start)
+        if cached is not None and cached[0] == chunk:
+            return cached[1]
+        record = self._blocks[(chunk, block_start)]
+        assert self._data is not None
+        raw = zlib.decompress(self._data[record.offset : record.offset + record.length].tobytes())
+        rows = min(self.edge_block, self.shape[0] - block_start)
+        width = self.shape[1] * self.shape[2]
+        frames = min(self.chunk_frames, len(self.steps) - chunk * self.chunk_frames)
+        decoded = np.empty((frames, rows, width), dtype=self.dtype)
+        cursor = 0
+        for local in range(frames):
+            (changed,) = np.frombuffer(raw, dtype=np.int32, count=1, offset=cursor)
+            cursor += 4
+            index = np.frombuffer(raw, dtype=np.int32, count=changed, offset=cursor)
+            cursor += 4 * int(changed)
+            values = np.frombuffer(raw, dtype=self.dtype, count=int(changed) * width, offset=cursor)
+            cursor += values.nbytes
+            if local:
+                decoded[local] = decoded[local - 1]
+            decoded[local, index] = values.reshape(-1, width)
+        self._cache[block_start] = (chunk, decoded)
+        return decoded
+
+
+def record_trajectory(sim: Any, path: str, steps: int, *, every: int = 1, **options: Any) -> TrajectoryWriter:
+    """
+    Run `steps` steps of `sim` through a `SimulationPipeline`, storing the initial state and every
+    `every`-th step at `path`; `options` go to `TrajectoryWriter`. Host memory stays O(E x C x k).
+    """
+    from .pipeline import SimulationPipeline
+
+    export_index = getattr(sim, "export_index", None)
+    order = export_index.tolist() if export_index is not None else range(sim.num_edges)
+    writer = TrajectoryWriter(
+        path,
+        num_edges=sim.num_edges,
+        channels=[channel.name for channel in sim.scenario.channels],
+        k=sim.scenario.k,
+        dtype=_as_numpy(sim.counts[:0]).dtype,
+        edge_ids=[sim.scenario.directed_edges[edge].id for edge in order],
+        **options,
+    )
+    pipeline = SimulationPipeline(sim, every=every, snapshots=True, measure=False, include_initial=True)
+    with writer:
+        for frame in pipeline.frames(steps):
+            writer.append(frame.step, sim._declared_phases(frame.counts))
+    return writer
+
+
+def _as_numpy(counts: Any) -> np.ndarray:
+    if isinstance(counts, np.ndarray):
+        return counts
+    return counts.detach().cpu().numpy()
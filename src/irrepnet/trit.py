@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import torch
+
+from .loader import TritRule, TritScenario, load_trit_scenario
+from .measure import phasor_intensity
+from .rng import CounterRNG
+from .sim import select_device
+
+
+@dataclass
+class TritGraph:
+    num_nodes: int
+    num_edges: int
+    edge_src: torch.Tensor  # [E]
+    edge_dst: torch.Tensor  # [E]
+    rowptr: torch.Tensor  # [N + 1], out-edges of node n are colidx[rowptr[n]:rowptr[n + 1]]
+    colidx: torch.Tensor  # [E]
+    node_tags: List[set]
+    edge_tags: List[set]
+    node_keys: torch.Tensor  # [N] counter-RNG keys of the node IDs
+
+
+@dataclass
+class TritState:
+    signed_counts: torch.Tensor  # [E, C]
+    ttl_gamma: torch.Tensor  # [E]
+    edge_tag: torch.Tensor  # [E]
+    absorbed: torch.Tensor  # [N, C]
+    expired: torch.Tensor  # [N]
+    abs_counts: Optional[torch.Tensor]  # [E, C]
+    # per-tick working buffers
+    inbox: torch.Tensor  # [N, C]
+    node_ttl: torch.Tensor  # [N]
+    next_counts: torch.Tensor  # [E, C]
+    next_ttl: torch.Tensor  # [E]
+    tick: int = 0
+
+
+class TritRuleModule(torch.nn.Module):
+    """
+    Base for the v0.3 rules: a pure-tensor `(state, graph, gen) -> state` module.
+    Rules read node inboxes and write the next edge state; whatever a node keeps
+    in its inbox after the rule set runs is absorbed there. `gen` is the sim's
+    CounterRNG; `stream` is the rule's position in the rule set.
+    """
+
+    def __init__(self, rule: TritRule, scenario: TritScenario, graph: TritGraph, stream: int = 0):
+        super().__init__()
+        self.rule = rule
+        self.stream = stream
+        node_mask = [
+            rule.node_tags_any is None or not tags.isdisjoint(rule.node_tags_any) for tags in graph.node_tags
+        ]
+        target_mask: List[bool] = []
+        for edge in scenario.directed_edges:
+            tagged = rule.out_edge_tags_any is None or not set(edge.tags).isdisjoint(rule.out_edge_tags_any)
+            target_mask.append(node_mask[edge.src] and tagged)
+
+        target_rank = [0] * graph.num_edges
+        target_degree = [0] * graph.num_nodes
+        target_list: List[int] = []
+        for edge_idx in graph.colidx.tolist():
+            if target_mask[edge_idx]:
+                src = scenario.directed_edges[edge_idx].src
+                target_rank[edge_idx] = target_degree[src]
+                target_degree[src] += 1
+                target_list.append(edge_idx)
+        target_ptr = [0]
+        for degree in target_degree[:-1]:
+            target_ptr.append(target_ptr[-1] + degree)
+
+        device = graph.edge_src.device
+        self.register_buffer("node_mask", torch.tensor(node_mask, dtype=torch.bool, device=device))
+        self.register_buffer("target_mask", torch.tensor(target_mask, dtype=torch.bool, device=device))
+        self.register_buffer("target_rank", torch.tensor(target_rank, dtype=torch.int32, device=device))
+        self.register_buffer("target_degree", torch.tensor(target_degree, dtype=torch.int32, device=device))
+        self.register_buffer("target_list", torch.tensor(target_list, dtype=torch.int64, device=device))
+        self.register_buffer("target_ptr", torch.tensor(target_ptr, dtype=torch.int64, device=device))
+        self.register_buffer(
+            "channel_index", torch.tensor(list(rule.channels), dtype=torch.int64, device=device)
+        )
+
+    def _split(self, values: torch.Tensor, graph: TritGraph) -> torch.Tensor:
+        """Split per-node signed values [N, C'] evenly over each node's target edges -> [E, C']."""
+        per_edge = values.index_select(0, graph.edge_src)
+        degree = self.target_degree.index_select(0, graph.edge_src).clamp(min=1).unsqueeze(1)
+        quotient = torch.div(per_edge, degree, rounding_mode="trunc")
+        remainder = per_edge - quotient * degree
+        extra = torch.sign(remainder) * (self.target_rank.unsqueeze(1) < remainder.abs()).to(per_edge.dtype)
+        return (quotient + extra) * self.target_mask.unsqueeze(1).to(per_edge.dtype)
+
+    def _split_random(self, values: torch.Tensor, graph: TritGraph, gen: CounterRNG, tick: int) -> torch.Tensor:
+        """
+        Send every signed token [N, C'] to one uniformly drawn target edge of its node -> [E, C'],
+        as one binomial draw per (node, column) for each target rank over the targets left.
+        """
+        columns = values.shape[1]
+        degree = self.target_degree.to(torch.int64)
+        remaining = values.abs().to(torch.int64)
+        sign = torch.sign(values)
+        column = torch.arange(columns, dtype=torch.int64, device=values.device)
+        keys = graph.node_keys.unsqueeze(1)
+        moved = torch.zeros((graph.num_edges * columns,), dtype=values.dtype, device=values.device)
+        for rank in range(int(degree.max()) if degree.numel() else 0):
+            serves = degree > rank
+            chance = 1.0 / (degree - rank).clamp(min=1).to(torch.float64).unsqueeze(1)  # over the targets left
+            share = gen.binomial(keys, remaining, chance, tick, self.stream, rank * columns + column)
+            share = share * serves.unsqueeze(1)
+            edges = self.target_list.index_select(0, torch.where(serves, self.target_ptr + rank, 0))
+            index = (edges.unsqueeze(1) * columns + column).reshape(-1)
+            moved.index_add_(0, index, (sign * share.to(values.dtype)).reshape(-1))
+            remaining = remaining - share
+        return moved.view(graph.num_edges, columns)
+
+    def _spread(self, values: torch.Tensor, graph: TritGraph, gen: Any, tick: int) -> torch.Tensor:
+        if self.rule.mode == "random":
+            return self._split_random(values, graph, gen, tick)
+        return self._split(values, graph)
+
+    def _routable(self, values: torch.Tensor) -> torch.Tensor:
+        keep = self.node_mask & (self.target_degree > 0)
+        return values * keep.view(-1, *([1] * (values.dim() - 1))).to(values.dtype)
+
+
+class ScatterOneHop(TritRuleModule):
+    def __init__(self, rule: TritRule, scenario: TritScenario, graph: TritGraph, stream: int = 0):
+        super().__init__(rule, scenario, graph, stream)
+        self.register_buffer(
+            "tag_character",
+            torch.tensor(scenario.tag_character, dtype=torch.int32, device=graph.edge_src.device),
+        )
+
+    def forward(self, state: TritState, graph: TritGraph, gen: Any = None) -> TritState:
+        values = self._routable(state.inbox.index_select(1, self.channel_index))
+        moved = self._spread(values, graph, gen, state.tick)
+        if self.rule.parity:
+            moved = moved * self.tag_character.index_select(0, state.edge_tag).unsqueeze(1)
+        state.next_counts.index_add_(1, self.channel_index, moved)
+        state.inbox.index_add_(1, self.channel_index, -values)
+        return state
+
+
+class GammaWalkTTL(TritRuleModule):
+    def __init__(self, rule: TritRule, scenario: TritScenario, graph: TritGraph, stream: int = 0):
+        super().__init__(rule, scenario, graph, stream)
+        self.gamma = int(scenario.gamma_channel)
+        self.decay = scenario.gamma_ttl > 0
+
+    def forward(self, state: TritState, graph: TritGraph, gen: Any = None) -> TritState:
+        values = state.inbox[:, self.gamma] * self.node_mask.to(state.inbox.dtype)
+        ttl_out = state.node_ttl - 1
+        if self.decay:
+            expired = values * (ttl_out <= 0).to(values.dtype)
+        else:
+            expired = torch.zeros_like(values)
+        moving = self._routable(values - expired)
+        moved = self._spread(moving.unsqueeze(1), graph, gen, state.tick).squeeze(1)
+        state.next_counts[:, self.gamma] += moved
+        carried = torch.where(moved != 0, ttl_out.index_select(0, graph.edge_src), torch.zeros_like(state.next_ttl))
+        torch.maximum(state.next_ttl, carried, out=state.next_ttl)
+        state.inbox[:, self.gamma] -= moving + expired
+        state.expired += expired
+        return state
+
+
+class BindEmitGamma(TritRuleModule):
+    def __init__(self, rule: TritRule, scenario: TritScenario, graph: TritGraph, stream: int = 0):
+        super().__init__(rule, scenario, graph, stream)
+        self.inputs = [inp.channel for inp in rule.inputs]
+        self.gamma_ttl = scenario.gamma_ttl
+        self.tag_group = scenario.tag_group
+
+    def forward(self, state: TritState, graph: TritGraph, gen: Any = None) -> TritState:
+        available = state.inbox[:, self.inputs].clamp(min=0)  # [N, I]
+        multiplicity = available.amin(dim=1) * self.node_mask.to(available.dtype)  # [N]
+        if self.rule.probability < 1.0:
+            fired = gen.binomial(graph.node_keys, multiplicity, self.rule.probability, state.tick, self.stream)
+            multiplicity = fired.to(multiplicity.dtype)
+        per_edge = multiplicity.index_select(0, graph.edge_src) * self.target_mask.to(multiplicity.dtype)
+        for output in self.rule.outputs:
+            state.next_counts[:, output.channel] += per_edge * output.add
+        fired = per_edge > 0
+        ttl = torch.full_like(state.next_ttl, self.gamma_ttl)
+        torch.maximum(state.next_ttl, torch.where(fired, ttl, torch.zeros_like(ttl)), out=state.next_ttl)
+        if self.rule.toggle_tag and self.tag_group > 1:
+            state.edge_tag = torch.where(fired, (state.edge_tag + 1) % self.tag_group, state.edge_tag)
+        return state
+
+
+class UnbindAbsorbGamma(TritRuleModule):
+    def __init__(self, rule: TritRule, scenario: TritScenario, graph: TritGraph, stream: int = 0):
+        super().__init__(rule, scenario, graph, stream)
+        self.gamma = int(scenario.gamma_channel)
+
+    def forward(self, state: TritState, graph: TritGraph, gen: Any = None) -> TritState:
+        values = state.inbox[:, self.gamma].clamp(min=0) * self.node_mask.to(state.inbox.dtype)
+        state.inbox[:, self.gamma] -= values
+        state.absorbed[:, self.gamma] += values
+        for output in self.rule.outputs:
+            state.inbox[:, output.channel] += values * output.add
+        return state
+
+
+RULE_MODULES = {
+    "scatter_onehop": ScatterOneHop,
+    "gamma_walk_ttl": GammaWalkTTL,
+    "bind_emit_gamma": BindEmitGamma,
+    "unbind_absorb_gamma": UnbindAbsorbGamma,
+}
+
+
+class TritRuleSet(torch.nn.Module):
+    def __init__(self, modules: Sequence[TritRuleModule]):
+        super().__init__()
+        self.rules = torch.nn.ModuleList(modules)
+
+    def forward(self, state: TritState, graph: TritGraph, gen: Any = None) -> TritState:
+        for rule in self.rules:
+            state = rule(state, graph, gen)
+        return state
+
+
+class TritSim:
+    """
+    Phase-free signed-count engine for irrepnet_dm 0.3 scenarios.
+    State is `signed_counts[E, C]` plus `ttl_gamma[E]` and small edge tags; each tick
+    gathers edge counts into node inboxes and runs the rule set to fill the next state.
+    """
+
+    def __init__(self, scenario_file: str, device: torch.device | None = None, track_abs: bool = False):
+        self.scenario_path = scenario_file
+        self.scenario: TritScenario = load_trit_scenario(scenario_file)
+        self.device = select_device(device)
+        self.track_abs = track_abs
+        self._build()
+
+    def _build(self) -> None:
+        scenario = self.scenario
+        device = self.device
+        self.num_channels = len(scenario.channels)
+        self.num_edges = len(scenario.directed_edges)
+        self.num_nodes = scenario.node_count
+        self.gamma_channel = scenario.gamma_channel
+
+        src = [edge.src for edge in scenario.directed_edges]
+        order = sorted(range(self.num_edges), key=lambda idx: src[idx])
+        degree = [0] * self.num_nodes
+        for node in src:
+            degree[node] += 1
+        rowptr = [0]
+        for node in range(self.num_nodes):
+            rowptr.append(rowptr[-1] + degree[node])
+
+        self.rng = CounterRNG(scenario.seed, device)
+        self.graph = TritGraph(
+            num_nodes=self.num_nodes,
+            num_edges=self.num_edges,
+            edge_src=torch.tensor(src, dtype=torch.int64, device=device),
+            edge_dst=torch.tensor([edge.dst for edge in scenario.directed_edges], dtype=torch.int64, device=device),
+            rowptr=torch.tensor(rowptr, dtype=torch.int64, device=device),
+            colidx=torch.tensor(order, dtype=torch.int64, device=device),
+            node_tags=[set(tags) for tags in scenario.node_tags],
+            edge_tags=[set(edge.tags) for edge in scenario.directed_edges],
+            node_keys=self.rng.entity_keys(torch.arange(self.num_nodes, dtype=torch.int64, device=device)),
+        )
+        self.rules = TritRuleSet(
+            [
+                RULE_MODULES[rule.kind](rule, scenario, self.graph, stream)
+                for stream, rule in enumerate(scenario.rules)
+            ]
+        )
+
+        E, C, N = self.num_edges, self.num_channels, self.num_nodes
+        signed_counts = torch.zeros((E, C), dtype=torch.int32, device=device)
+        for entry in scenario.signed_counts_init:
+            signed_counts[entry.edge, entry.channel] += int(entry.value)
+        ttl_gamma = torch.zeros(E, dtype=torch.int32, device=device)
+        if self.gamma_channel is not None and scenario.gamma_ttl > 0:
+            ttl_gamma = torch.where(
+                signed_counts[:, self.gamma_channel] != 0,
+                torch.full_like(ttl_gamma, scenario.gamma_ttl),
+                ttl_gamma,
+            )
+        self.state = TritState(
+            signed_counts=signed_counts,
+            ttl_gamma=ttl_gamma,
+            edge_tag=torch.tensor(scenario.edge_tag_init, dtype=torch.int64, device=device),
+            absorbed=torch.zeros((N, C), dtype=torch.int32, device=device),
+            expired=torch.zeros(N, dtype=torch.int32, device=device),
+            abs_counts=torch.zeros((E, C), dtype=torch.int64, device=device) if self.track_abs else None,
+            inbox=torch.zeros((N, C), dtype=torch.int32, device=device),
+            node_ttl=torch.zeros(N, dtype=torch.int32, device=device),
+            next_counts=torch.zeros((E, C), dtype=torch.int32, device=device),
+            next_ttl=torch.zeros(E, dtype=torch.int32, device=device),
+        )
+
+        self.readouts = list(scenario.measurement)
+        self.arrival_mod_k = scenario.arrival_mod_k
+        readout_rows: List[int] = []
+        readout_edges: List[int] = []
+        readout_channels: List[int] = []
+        for row, readout in enumerate(self.readouts):
+            channels = readout.channels if readout.channels is not None else tuple(range(C))
+            for edge in readout.edges:
+                for channel in channels:
+                    readout_rows.append(row)
+                    readout_edges.append(edge)
+                    readout_channels.append(channel)
+        self._readout_rows = torch.tensor(readout_rows, dtype=torch.int64, device=device)
+        self._readout_edges = torch.tensor(readout_edges, dtype=torch.int64, device=device)
+        self._readout_channels = torch.tensor(readout_channels, dtype=torch.int64, device=device)
+        self.readout_flux = torch.zeros(len(self.readouts), dtype=torch.int64, device=device)
+        self.arrival_hist = torch.zeros(
+            (len(self.readouts), max(self.arrival_mod_k, 1)), dtype=torch.int64, device=device
+        )
+
+    @property
+    def signed_counts(self) -> torch.Tensor:
+        return self.state.signed_counts
+
+    def reset(self) -> None:
+        self.scenario = load_trit_scenario(self.scenario_path)
+        self._build()
+
+    @torch.no_grad()
+    def step(self) -> None:
+        state = self.state
+        graph = self.graph
+        self._record_arrivals()
+
+        state.inbox.zero_()
+        state.inbox.index_add_(0, graph.edge_dst, state.signed_counts)
+        state.node_ttl.zero_()
+        if self.gamma_channel is not None:
+            carrying = torch.where(
+                state.signed_counts[:, self.gamma_channel] != 0,
+                state.ttl_gamma,
+                torch.zeros_like(state.ttl_gamma),
+            )
+            state.node_ttl.scatter_reduce_(0, graph.edge_dst, carrying, reduce="amax")
+        if state.abs_counts is not None:
+            state.abs_counts += state.signed_counts.abs()
+        state.next_counts.zero_()
+        state.next_ttl.zero_()
+
+        state = self.rules(state, graph, self.rng)
+
+        state.absorbed += state.inbox
+        state.signed_counts, state.next_counts = state.next_counts, state.signed_counts
+        state.ttl_gamma, state.next_ttl = state.next_ttl, state.ttl_gamma
+        state.tick += 1
+        self.state = state
+
+    def _record_arrivals(self) -> None:
+        if not self.readouts:
+            return
+        flux = self.state.signed_counts[self._readout_edges, self._readout_channels].to(torch.int64)
+        per_readout = torch.zeros_like(self.readout_flux).index_add_(0, self._readout_rows, flux)
+        self.readout_flux += per_readout
+        if self.arrival_mod_k:
+            self.arrival_hist[:, self.state.tick % self.arrival_mod_k] += per_readout
+
+    def measure(self) -> Dict[str, float]:
+        """Accumulated detector signal: arrival-mod-k phasor intensity, or signed flux when k is off."""
+        results: Dict[str, float] = {}
+        for row, readout in enumerate(self.readouts):
+            if self.arrival_mod_k:
+                results[readout.name] = phasor_intensity(self.arrival_hist[row], self.arrival_mod_k)
+            else:
+                results[readout.name] = float(self.readout_flux[row].item())
+        return results
+
+    def channel_totals(self) -> torch.Tensor:
+        """Signed totals per channel over edges plus node-absorbed counts ([C], on device)."""
+        state = self.state
+        return state.signed_counts.sum(dim=0, dtype=torch.int64) + state.absorbed.sum(dim=0, dtype=torch.int64)
+
+    def export_state(self) -> Dict[str, Any]:
+        return {
+            "version": self.scenario.version,
+            "counts_shape": list(self.state.signed_counts.shape),
+            "counts_checksum": int(self.state.signed_counts.abs().sum().item() % 2_147_483_647),
+            "tick": self.state.tick,
+            "device": str(self.device),
+        }
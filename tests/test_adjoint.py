@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _linear_sources():
+    lattice = bench.lattice_scenario(4, k=5, channels=2)
+    lattice["nodes"][5]["gauge_phase"] = 2
+    return [
+        str(EXAMPLES / "two_path_v01.yaml"),
+        str(EXAMPLES / "triangle_loop_v01.yaml"),
+        parse_scenario(lattice),
+    ]
+
+
+@pytest.mark.parametrize("source", _linear_sources())
+@pytest.mark.parametrize("reorder", [None, "rcm"])
+def test_adjoint_predicts_forward_readouts(source, reorder):
+    sim = IRREPnetSim(source, device=CPU, reorder=reorder)
+    if sim.coupling_rules:
+        pytest.skip("adjoint is defined for linear scenarios")
+    generator = torch.Generator().manual_seed(0)
+    steps = 3
+    results = {r.name: sim.adjoint(r.name, steps) for r in sim.readouts}
+    for _ in range(3):
+        start = torch.randint(0, 4, sim.counts.shape, generator=generator, dtype=torch.int64)
+        sim.reset()
+        sim.counts.copy_(start if sim.export_index is None else start[sim.export_index.argsort()])
+        assert torch.equal(sim.export_counts(), start.to(sim.counts.dtype))
+        for _ in range(steps):
+            sim.step()
+        measured = sim.measure()
+        for name, result in results.items():
+            assert result.predict(start) == pytest.approx(measured[name], rel=1e-9, abs=1e-6)
+
+
+def test_adjoint_top_and_validation():
+    sim = IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), device=CPU)
+    name = sim.readouts[0].name
+    result = sim.adjoint(name, 0)
+    edge_ids = {sim.scenario.directed_edges[edge].id for edge in sim.readouts[0].edges}
+    assert {entry[0] for entry in result.top(100)} == edge_ids
+    assert all(entry[3] == pytest.approx(1.0) for entry in result.top(100))
+    with pytest.raises(ValueError, match="E_ADJOINT_READOUT_UNKNOWN"):
+        sim.adjoint("nope")
+    with pytest.raises(ValueError, match="E_ADJOINT_NONLINEAR"):
+        IRREPnetSim(parse_scenario(bench.scatter_zone_scenario(2)), device=CPU).adjoint("gamma_0")
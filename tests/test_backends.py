@@ -0,0 +1,135 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.backends import NUMPY_AUTO_CELLS
+from irrepnet.loader import parse_scenario
+from irrepnet.memory import MemoryLayout
+
+ROOT = Path(__file__).resolve().parents[1]
+EXAMPLES = ROOT / "examples"
+CPU = torch.device("cpu")
+
+
+def _stochastic_scatter():
+    raw = bench.scatter_zone_scenario(5, k=8, channels=2)
+    raw["coupling_rules"][0]["probability"] = 0.5
+    raw["coupling_rules"][1]["route"] = "random_one"
+    raw["seed"] = 11
+    return parse_scenario(raw)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [str(EXAMPLES / name) for name in ("cloud_v01.yaml", "chain_momentum_v01.yaml", "triangle_loop_v01.yaml")]
+    + [_stochastic_scatter()],
+)
+@pytest.mark.parametrize("reorder", [None, "rcm"])
+def test_numpy_backend_matches_torch(source, reorder):
+    reference = IRREPnetSim(source, device=CPU, backend="torch", reorder=reorder)
+    fast = IRREPnetSim(source, backend="numpy", reorder=reorder)
+    assert fast.backend == "numpy" and fast.device.type == "cpu"
+    for step in range(6):
+        if step == 3:  # cached kernels follow mutations
+            edge = reference.scenario.directed_edges[0]
+            node = reference.scenario.node_ids[edge.src]
+            for sim in (reference, fast):
+                sim.set_gauge(node, 3)
+                sim.set_edge_offset(edge.id, 1)
+                sim.set_mask(edge.id, 0, range(0, sim.k, 2))
+        reference.step()
+        fast.step()
+        assert torch.equal(reference.export_counts(), fast.export_counts())
+        assert reference.measure() == fast.measure()
+
+
+def test_auto_selection():
+    small = IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"))
+    assert small.backend == "numpy"
+    assert IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), device=CPU, backend="torch").backend == "torch"
+    side = int((NUMPY_AUTO_CELLS / 4) ** 0.5) + 2
+    large = IRREPnetSim(parse_scenario(bench.lattice_scenario(side, k=4, channels=1)), device=CPU)
+    assert large.num_edges * large.num_channels * large.k > NUMPY_AUTO_CELLS
+    assert large.backend == "torch"
+    with pytest.raises(ValueError, match="E_BACKEND_UNKNOWN"):
+        IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), backend="jax")
+    with pytest.raises(ValueError, match="E_BACKEND_DEVICE"):
+        IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), device=torch.device("meta"), backend="numpy")
+    named = IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), device="cpu")
+    assert named.backend == "numpy" and named.device == CPU
+
+
+def test_loader_and_validate_do_not_import_torch():
+    code = (
+        "import sys, irrepnet, irrepnet.loader\n"
+        "from irrepnet.__main__ import main\n"
+        f"assert main(['validate', {str(EXAMPLES / 'cloud_v01.yaml')!r}]) == 0\n"
+        "assert 'torch' not in sys.modules, 'torch imported'\n"
+        "irrepnet.IRREPnetSim\n"
+        "assert 'torch' in sys.modules\n"
+    )
+    env = {"PYTHONPATH": str(ROOT / "src")}
+    subprocess.run([sys.executable, "-c", code], check=True, env=env, capture_output=True)
+
+
+def test_validate_reports_malformed_scenarios(tmp_path, capsys):
+    from irrepnet.__main__ import main
+
+    text = (EXAMPLES / "two_path_v01.yaml").read_text(encoding="utf-8")
+    broken = tmp_path / "missing_src.yaml"
+    broken.write_text(text.replace("src:", "source:", 1), encoding="utf-8")
+    scalar = tmp_path / "scalar.yaml"
+    scalar.write_text("42\n", encoding="utf-8")
+    paths = [str(EXAMPLES / "two_path_v01.yaml"), str(EXAMPLES / "cloud_v03_trit.yaml"), str(broken), str(scalar)]
+    assert main(["validate", *paths]) == 1
+    out, err = capsys.readouterr()
+    assert out.count(": ok (") == 2
+    assert f"{broken}: E_SCENARIO_MALFORMED: KeyError" in err
+    assert f"{scalar}: E_SCENARIO_MALFORMED" in err
+
+
+@pytest.mark.parametrize("backend", ["numpy", "torch"])
+def test_direct_tensor_writes_reach_cached_kernels(backend):
+    scenario = _stochastic_scatter()
+    reference = IRREPnetSim(scenario, device=CPU, backend="torch")
+    sim = IRREPnetSim(scenario, device=CPU, backend=backend)
+    for sim_ in (reference, sim):
+        sim_.step()
+    sim.gauge[1] = 3  # bypasses the mutation API and its invalidation
+    sim.edge_offset[1] = 2  # a gamma line: "delta" emissions roll by its offset
+    reference.set_gauge(reference.scenario.node_ids[1], 3)
+    reference.set_edge_offset(reference.scenario.directed_edges[1].id, 2)
+    for _ in range(3):
+        reference.step()
+        sim.step()
+        assert torch.equal(reference.export_counts(), sim.export_counts())
+
+
+def test_mutations_rebuild_only_the_chunks_they_touch():
+    scenario = parse_scenario(bench.lattice_scenario(6, k=4, channels=1))
+    reference = IRREPnetSim(scenario, device=CPU, backend="torch")
+    sim = IRREPnetSim(scenario, device=CPU, backend="numpy", layout=MemoryLayout(chunk_rows=4))
+    sim.step()
+    reference.step()
+    prepared = {id(chunk): chunk for _, chunks in sim._backend._layers.values() for chunk in chunks}
+    node = 7
+    touched = set(sim.in_index[node] + sim._out_all[node])
+    for sim_ in (reference, sim):
+        sim_.set_gauge(sim_.scenario.node_ids[node], 2)
+    sim.step()
+    reference.step()
+    assert torch.equal(reference.export_counts(), sim.export_counts())
+    kept = {id(chunk) for _, chunks in sim._backend._layers.values() for chunk in chunks}
+    rebuilt = {key for key, chunk in prepared.items() if touched & set(chunk.rows.tolist())}
+    assert rebuilt and len(rebuilt) < len(prepared)
+    assert kept & set(prepared) == set(prepared) - rebuilt
+    sim.gauge[node] = 1  # an unannounced write followed by an API one still drops everything
+    reference.set_gauge(reference.scenario.node_ids[node], 1)
+    for sim_ in (reference, sim):
+        sim_.set_edge_offset(sim_.scenario.directed_edges[0].id, 3)
+        sim_.step()
+    assert torch.equal(reference.export_counts(), sim.export_counts())
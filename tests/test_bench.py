@@ -0,0 +1,44 @@
+import json
+
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import parse_scenario
+
+
+def test_families_have_stationary_totals():
+    for family, make in bench.FAMILIES.items():
+        sim = IRREPnetSim(parse_scenario(make(4, k=4, channels=2)), device=torch.device("cpu"))
+        sim.step()
+        total = int(sim.counts.sum())
+        for _ in range(6):
+            sim.step()
+            assert int(sim.counts.sum()) == total, family
+
+
+def test_suite_and_compare(tmp_path):
+    cases = bench.default_suite("tiny")
+    report = bench.run_suite(cases[:2], torch.device("cpu"), warmup=1, steps=2)
+    assert report["meta"]["device"] == "cpu"
+    assert [entry["name"] for entry in report["results"]] == [case.name for case in cases[:2]]
+    for entry in report["results"]:
+        assert entry["backend"] == "numpy" and entry["peak_rss_bytes"] >= entry["base_rss_bytes"] > 0
+    assert bench.compare(report, report) == []
+    pinned = bench.run_suite(cases[:1], torch.device("cpu"), warmup=1, steps=2, backend="torch", isolate=False)
+    assert pinned["results"][0]["backend"] == "torch" and pinned["results"][0]["peak_rss_bytes"] is None
+    assert len(bench.compare(pinned, report)) == 1
+
+    slow = json.loads(json.dumps(report))
+    for entry in slow["results"]:
+        entry["step_ms"] = entry["step_ms"] * 10 + 1.0
+    assert len(bench.compare(slow, report)) == 2
+
+    generous = json.loads(json.dumps(report))
+    for entry in generous["results"]:
+        for metric in bench.REGRESSION_METRICS:
+            if metric.endswith("_ms"):
+                entry[metric] = entry[metric] * 100 + 100.0
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(generous))
+    assert bench.main(["--scale", "tiny", "--family", "corridor", "--device", "cpu", "--steps", "2",
+                       "--baseline", str(baseline)]) == 0
@@ -0,0 +1,109 @@
+import pytest
+import torch
+
+from irrepnet import CorridorSim, IRREPnetSim, bench
+from irrepnet.corridor import collapse_corridors
+from irrepnet.loader import parse_scenario
+
+CPU = torch.device("cpu")
+
+
+def _junctions(k=8):
+    """A scatter hub 0 feeding two one-way corridors (dead reverse edges) that meet at 4 and loop back."""
+    gauges = {0: 1, 1: 5, 2: 2, 3: 7, 4: 3, 5: 6, 6: 0, 7: 4}
+    nodes = [{"id": node, "gauge_phase": gauge, "tags": ["scatter_zone"] if node == 0 else []}
+             for node, gauge in gauges.items()]
+    forward = [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 4), (4, 0)]
+    directed = []
+    for src, dst in forward:
+        offset, tags = (3 * src + dst) % k, ["line"] if src == 0 else []
+        directed.append({"id": len(directed), "src": src, "dst": dst, "phase_offset": offset, "tags": tags})
+        directed.append({"id": len(directed), "src": dst, "dst": src, "phase_offset": src % k})
+
+    def mask(entry, channel):
+        if entry["id"] % 2:
+            return [0] * k
+        if (entry["src"], entry["dst"]) == (5, 6) and channel == 1:
+            return [0] * k
+        if (entry["src"], entry["dst"]) in ((3, 4), (7, 4)):
+            return [1 if (phase + channel) % 3 else 0 for phase in range(k)]
+        return [1] * k
+
+    channels = [{"name": "a", "charge": 1}, {"name": "b", "charge": 1}, {"name": "gamma", "charge": 0, "neutral": True}]
+    rules = [
+        {
+            "name": "brems",
+            "scope": {"nodes_any": ["scatter_zone"], "out_edges_any": ["line"]},
+            "in": [{"ch": "a", "min": 1}],
+            "out": [{"ch": "a", "add": 1}, {"ch": "gamma", "add": 1}],
+            "phase": {"gamma": "delta", "a": "inherit"},
+        }
+    ]
+    return parse_scenario(
+        bench._scenario(
+            k=k,
+            channels=channels,
+            nodes=nodes,
+            directed=directed,
+            mask=mask,
+            counts_init=[
+                {"edge": 16, "channel": "a", "phase": 2, "value": 5},
+                {"edge": 16, "channel": "b", "phase": 6, "value": 7},
+                {"edge": 4, "channel": "a", "phase": 1, "value": 3},
+                {"edge": 10, "channel": "gamma", "phase": 4, "value": 2},
+            ],
+            outputs=[
+                {"name": "back", "readout_edges": [16]},
+                {"name": "stub", "readout_edges": [7]},
+            ],
+            rules=rules,
+        )
+    )
+
+
+@pytest.mark.parametrize("backend", ["torch", "numpy"])
+def test_corridor_sim_matches_full_graph(backend):
+    scenario = _junctions()
+    reference = IRREPnetSim(scenario, device=CPU, backend=backend)
+    coarse = CorridorSim(scenario, device=CPU, backend=backend)
+    assert [corridor.delay for corridor in coarse.corridors] == [3, 3]
+    assert coarse.num_nodes == 2
+    assert torch.equal(coarse.original_counts(), reference.export_counts())
+    for step in range(12):
+        if step == 4:
+            for sim in (reference, coarse):
+                sim.set_gauge(0, 6)
+                sim.set_gauge(4, 2)
+        reference.step()
+        coarse.step()
+        assert torch.equal(coarse.original_counts(), reference.export_counts())
+        assert coarse.measure() == pytest.approx(reference.measure())
+    coarse.reset()
+    reference.reset()
+    assert torch.equal(coarse.original_counts(), reference.export_counts())
+
+
+def test_ring_corridor_collapses_to_one_edge():
+    scenario = parse_scenario(bench.FAMILIES["corridor"](32, k=8, channels=2))
+    coarse, corridors = collapse_corridors(scenario)
+    assert len(coarse.directed_edges) == 4 and corridors[0].delay == 30
+    reference = IRREPnetSim(scenario, device=CPU)
+    sim = CorridorSim(scenario, device=CPU)
+    for _ in range(40):
+        reference.step()
+        sim.step()
+        assert torch.equal(sim.original_counts(), reference.export_counts())
+        assert sim.measure() == reference.measure()
+
+
+def test_collapsed_ids_are_rejected():
+    sim = CorridorSim(_junctions(), device=CPU)
+    with pytest.raises(ValueError, match="E_CORRIDOR_COLLAPSED"):
+        sim.set_gauge(2, 1)
+    with pytest.raises(ValueError, match="E_CORRIDOR_COLLAPSED"):
+        sim.enable_edge(0, False)
+    with pytest.raises(ValueError, match="E_CORRIDOR_COLLAPSED"):
+        sim.add_counts(3, "a", 0, 1)
+    sim.add_counts(16, "a", 0, 1)
+    with pytest.raises(ValueError, match="E_CORRIDOR_UNSUPPORTED"):
+        sim.run(2, prune=True)
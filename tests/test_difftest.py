@@ -0,0 +1,112 @@
+import copy
+from functools import partial
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench, difftest
+from irrepnet.difftest import (
+    CANDIDATES,
+    REFERENCE,
+    Divergence,
+    ReferenceFailure,
+    compare,
+    fuzz,
+    random_scenario,
+    shrink,
+)
+from irrepnet.loader import parse_scenario
+
+CPU = torch.device("cpu")
+
+
+class _BumpedSim(IRREPnetSim):
+    """Adds one count to edge 6 (channel 0, phase 2) after the fifth layer application."""
+
+    def _advance(self) -> None:
+        super()._advance()
+        if self.layer_tick == 4:
+            self.counts[self.edge_index(6), 0, 2] += 1
+
+
+class _CrashingSim(IRREPnetSim):
+    def _advance(self) -> None:
+        if self.layer_tick == 1:
+            raise RuntimeError("boom")
+        super()._advance()
+
+
+class _BackwardDeltaSim(IRREPnetSim):
+    """Rolls "delta" rule emissions the wrong way."""
+
+    def _edge_channel_delta(self, channel: int, edge_idx: int) -> int:
+        return -super()._edge_channel_delta(channel, edge_idx)
+
+
+def test_random_scenarios_load():
+    for seed in range(100):
+        parse_scenario(random_scenario(seed))
+
+
+def test_random_scenarios_stay_small():
+    for seed in (62, 141, 150, 193):  # overflowed int32 or blew up before the fan-out cap
+        sim = REFERENCE(parse_scenario(random_scenario(seed)))
+        sim.run(4)
+        assert int(sim.export_counts().max()) < 2**24
+
+
+@pytest.mark.parametrize("candidate", sorted(CANDIDATES))
+def test_candidates_agree_with_the_reference(candidate):
+    assert fuzz(candidate, cases=12, steps=3) is None
+
+
+def test_reports_the_first_divergence():
+    raw = bench.FAMILIES["corridor"](8, k=8)
+    found = compare(raw, lambda scenario: _BumpedSim(scenario, device=CPU, backend="torch"), steps=6)
+    assert (found.step, found.layer, found.edge, found.channel, found.phase) == (4, 0, 6, "ch0", 2)
+    assert found.actual == found.expected + 1
+    assert compare(raw, lambda scenario: _BumpedSim(scenario, device=CPU, backend="torch"), steps=4) is None
+
+    def crashing(scenario):
+        raise RuntimeError("boom")
+
+    assert compare(raw, crashing).error == "RuntimeError: boom"
+    assert compare(raw, lambda scenario: _CrashingSim(scenario, device=CPU)) == Divergence(
+        step=1, layer=0, error="RuntimeError: boom"
+    )
+
+
+def test_shrinks_a_failing_scenario():
+    candidate = _BackwardDeltaSim
+    raw, found = fuzz(candidate, cases=50, steps=2, max_nodes=4)
+    shrunk = shrink(raw, lambda smaller: compare(smaller, candidate, steps=2) is not None)
+    assert compare(shrunk, candidate, steps=2) is not None
+    assert len(shrunk["directed_edges"]) < len(raw["directed_edges"])
+    assert all(node["gauge_phase"] == 0 for node in shrunk["nodes"])
+    for index in range(len(shrunk["coupling_rules"])):  # no rule can go
+        smaller = copy.deepcopy(shrunk)
+        smaller["coupling_rules"].pop(index)
+        assert compare(smaller, candidate, steps=2) is None
+
+
+def test_reference_failures_are_skipped(monkeypatch, capsys):
+    def reference(scenario):
+        if scenario.k == 3:
+            raise RuntimeError("overflow")
+        return REFERENCE(scenario)
+
+    with pytest.raises(ReferenceFailure, match="RuntimeError: overflow"):
+        compare(bench.FAMILIES["corridor"](8, k=3), "numpy", reference=reference)
+    monkeypatch.setattr(difftest, "compare", partial(compare, reference=reference))
+    skipped = []
+    assert fuzz("numpy", cases=20, steps=2, skipped=skipped) is None
+    assert skipped and all(random_scenario(seed)["phase_group"]["k"] == 3 for seed in skipped)
+    assert difftest.main(["--cases", "20", "--steps", "2"]) == 0
+    out = capsys.readouterr().out
+    assert f"skipped {len(skipped)} scenarios" in out
+    assert f"numpy: {20 - len(skipped)} scenarios agree" in out
+
+
+def test_cli_runs_the_default_case_count(capsys):
+    assert difftest.main(["--candidate", "numpy"]) == 0
+    assert "numpy: 100 scenarios agree with the reference" in capsys.readouterr().out
@@ -0,0 +1,96 @@
+import itertools
+from pathlib import Path
+
+import pytest
+import torch
+import yaml
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _sweep(sim, nodes, steps):
+    values = {}
+    for assignment in itertools.product(range(sim.k), repeat=len(nodes)):
+        sim.reset()
+        for node, phase in zip(nodes, assignment):
+            sim.set_gauge(sim.scenario.node_ids[node], phase)
+        for _ in range(steps):
+            sim.step()
+        for name, value in sim.measure().items():
+            values.setdefault(name, []).append(value)
+    sim.reset()
+    return {name: torch.tensor(vals, dtype=torch.float64) for name, vals in values.items()}
+
+
+def _two_path(all_pass):
+    raw = yaml.safe_load((EXAMPLES / "two_path_v01.yaml").read_text())
+    if all_pass:
+        for entry in raw["fusion_mask_sparse"]:
+            entry["allow_phases"] = list(range(8))
+        raw["counts_init"].append({"edge": 0, "channel": "signal", "phase": 3, "value": 2})
+    return parse_scenario(raw)
+
+
+@pytest.mark.parametrize(
+    "scenario, nodes, steps, method",
+    [
+        (_two_path(all_pass=True), [2], 1, "winding"),
+        (_two_path(all_pass=True), [1, 2], 1, "winding"),
+        (_two_path(all_pass=False), [2], 1, "batched"),
+        (parse_scenario(bench.lattice_scenario(3, k=4)), [4, 0], 4, "batched"),
+    ],
+)
+def test_gauge_response_matches_sweep(scenario, nodes, steps, method):
+    sim = IRREPnetSim(scenario, device=CPU)
+    expected = _sweep(sim, nodes, steps)
+    response = sim.gauge_response(nodes, steps)
+    assert response.method == method
+    for name, values in expected.items():
+        assert torch.allclose(response.values[name].reshape(-1), values, atol=1e-9), name
+    assert torch.equal(sim.counts, IRREPnetSim(scenario, device=CPU).counts)
+
+
+def test_gauge_response_with_coupling_uses_brute_force():
+    sim = IRREPnetSim(str(EXAMPLES / "cloud_v01.yaml"), device=CPU)
+    expected = _sweep(sim, [2], 2)
+    response = sim.gauge_response(2, steps=2)
+    assert response.method == "brute_force"
+    for name, values in expected.items():
+        assert torch.allclose(response.values[name], values), name
+    with pytest.raises(ValueError, match="E_GAUGE_NONLINEAR"):
+        sim.gauge_response(2, method="winding")
+
+
+def test_brute_force_leaves_the_sim_alone():
+    raw = bench.scatter_zone_scenario(4, k=8, channels=2)
+    raw["coupling_rules"][0]["probability"] = 0.5
+    raw["coupling_rules"][1]["route"] = "random_one"
+    raw["seed"] = 5
+    raw["measurement"]["outputs"].append({"name": "all", "readout_edges": [e["id"] for e in raw["directed_edges"]]})
+    scenario = parse_scenario(raw)
+    disabled = scenario.directed_edges[-1].id
+
+    def advanced():
+        sim = IRREPnetSim(scenario, device=CPU)
+        sim.enable_edge(disabled, False)
+        for _ in range(2):
+            sim.step()
+        return sim
+
+    sim = advanced()
+    marker = object()
+    sim.stability = marker
+    counts, gauges = sim.counts.clone(), list(sim.scenario.node_gauge)
+    node = sim.scenario.node_ids[1]
+    response = sim.gauge_response(node, steps=2)
+    assert response.method == "brute_force" and len(set(response.curve("all"))) > 1
+    assert sim.stability is marker and sim.scenario.node_gauge == gauges and torch.equal(sim.counts, counts)
+    for phase in range(sim.k):
+        rerun = advanced()
+        rerun.set_gauge(node, phase)
+        for name, value in rerun.run(2).items():
+            assert response.values[name][phase].item() == pytest.approx(value), (phase, name)
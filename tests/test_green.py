@@ -0,0 +1,104 @@
+import copy
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+import yaml
+
+from irrepnet import IRREPnetSim, bench, green
+from irrepnet.loader import parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _raws():
+    two_path = yaml.safe_load((EXAMPLES / "two_path_v01.yaml").read_text())
+    lattice = bench.lattice_scenario(4, k=6, channels=2)
+    lattice["nodes"][3]["gauge_phase"] = 2
+    return [two_path, lattice]
+
+
+def _random_init(raw, rng):
+    channels = [channel["name"] for channel in raw["channels"]]
+    edges = [edge["id"] for edge in raw["directed_edges"]]
+    k = raw["phase_group"]["k"]
+    return [
+        {"edge": rng.choice(edges), "channel": rng.choice(channels), "phase": rng.randrange(k), "value": rng.randint(1, 5)}
+        for _ in range(4)
+    ]
+
+
+@pytest.mark.parametrize("raw", _raws())
+def test_library_matches_fresh_simulations(raw, tmp_path):
+    sim = IRREPnetSim(parse_scenario(copy.deepcopy(raw)), device=CPU)
+    library = sim.response_library(3, cache_dir=str(tmp_path), states=True)
+    rng = random.Random(1)
+    for _ in range(4):
+        counts_init = _random_init(raw, rng)
+        edited = copy.deepcopy(raw)
+        edited["counts_init"] = counts_init
+        fresh = IRREPnetSim(parse_scenario(edited), device=CPU)
+        for _ in range(3):
+            fresh.step()
+        assert library.measure(counts_init) == fresh.measure()
+        assert np.array_equal(library.state(counts_init), fresh.export_counts().numpy())
+
+
+def test_rotation_and_disk_cache(tmp_path, monkeypatch):
+    raw = bench.lattice_scenario(3, k=8, channels=1)
+    raw["fusion_mask"] = [[[1] * 8] for _ in raw["fusion_mask"]]  # all-pass: one base phase per source
+    sim = IRREPnetSim(parse_scenario(raw), device=CPU)
+    library = sim.response_library(2, cache_dir=str(tmp_path))
+    edge = raw["directed_edges"][2]["id"]
+    sweep = [[(edge, 0, 0, 1), (edge, 0, phase, 2)] for phase in range(8)]
+    answers = [library.measure(init) for init in sweep]
+    assert len(library) == 1
+    for init, answer in zip(sweep, answers):
+        edited = copy.deepcopy(raw)
+        edited["counts_init"] = [{"edge": e, "channel": "ch0", "phase": p, "value": v} for e, _, p, v in init]
+        fresh = IRREPnetSim(parse_scenario(edited), device=CPU)
+        assert fresh.run(2) == answer
+    assert len({answer["origin"] for answer in answers}) > 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("recomputed a cached response")
+
+    monkeypatch.setattr(green, "_propagate_sources", fail)
+    reloaded = IRREPnetSim(parse_scenario(raw), device=CPU).response_library(2, cache_dir=str(tmp_path))
+    assert [reloaded.measure(init) for init in sweep] == answers
+
+    sim.set_gauge(raw["nodes"][0]["id"], 1)  # a different scenario state gets its own cache entry
+    assert sim.response_library(2, cache_dir=str(tmp_path)).key != library.key
+
+
+def test_library_follows_a_mutated_sim(tmp_path):
+    raw = bench.lattice_scenario(3, k=6, channels=1)
+    raw["fusion_mask"] = [[[1] * 6] for _ in raw["fusion_mask"]]
+    sim = IRREPnetSim(parse_scenario(copy.deepcopy(raw)), device=CPU)
+    library = sim.response_library(2, cache_dir=str(tmp_path), states=True)
+    edge = raw["directed_edges"][0]["id"]
+    init = [(edge, 0, 1, 3)]
+    before = library.state(init)
+    old_path = library.path
+    sim.set_edge_offset(edge, 3)
+    after = library.state(init)
+    assert library.path != old_path and len(library) == 1 and not np.array_equal(after, before)
+    edited = copy.deepcopy(raw)
+    edited["directed_edges"][0]["phase_offset"] = 3
+    edited["counts_init"] = [{"edge": edge, "channel": "ch0", "phase": 1, "value": 3}]
+    fresh = IRREPnetSim(parse_scenario(edited), device=CPU)
+    fresh.run(2)
+    assert np.array_equal(after, fresh.export_counts().numpy())
+    with np.load(old_path) as data:  # the old entry keeps only responses of the old offsets
+        assert len(data["sources"]) == 1
+    reloaded = IRREPnetSim(parse_scenario(copy.deepcopy(raw)), device=CPU)
+    assert np.array_equal(reloaded.response_library(2, cache_dir=str(tmp_path), states=True).state(init), before)
+
+
+def test_library_rejects_coupling():
+    sim = IRREPnetSim(parse_scenario(bench.scatter_zone_scenario(2)), device=CPU)
+    with pytest.raises(ValueError, match="E_GREEN_NONLINEAR"):
+        sim.response_library(1)
@@ -0,0 +1,120 @@
+import copy
+import random
+from pathlib import Path
+
+import pytest
+import torch
+import yaml
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.holonomy import HolonomyIndex
+from irrepnet.loader import parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _two_path():
+    return yaml.safe_load((EXAMPLES / "two_path_v01.yaml").read_text())
+
+
+def _lattice():
+    raw = bench.lattice_scenario(3, k=6, channels=2)
+    rng = random.Random(3)
+    for edge in raw["directed_edges"]:
+        edge["phase_offset"] = rng.randrange(6)
+    return raw
+
+
+def _open_lattice():
+    raw = _lattice()
+    raw["fusion_mask"] = [[[1] * 6 for _ in row] for row in raw["fusion_mask"]]
+    return raw
+
+
+def _measure(raw, steps, gauges):
+    sim = IRREPnetSim(parse_scenario(copy.deepcopy(raw)), device=CPU)
+    for node_id, phase in gauges.items():
+        sim.set_gauge(node_id, phase)
+    for _ in range(steps):
+        sim.step()
+    return sim.measure()
+
+
+def test_loop_holonomy_matches_route_sums():
+    scenario = parse_scenario(_lattice())
+    index = HolonomyIndex(scenario)
+    assert len(index.cycles) == len(scenario.directed_edges) - scenario.node_count + 1
+    for cycle, holonomy in zip(index.cycles, index.holonomy):
+        assert holonomy == sum(sign * scenario.directed_edges[e].phase_offset for e, sign in cycle.edges) % scenario.k
+
+
+def test_phase_difference_of_two_path_routes():
+    raw = _two_path()
+    scenario = parse_scenario(raw)
+    index = HolonomyIndex(scenario)
+    by_pair = {(e["src"], e["dst"]): e["id"] for e in raw["directed_edges"]}
+    # every pair of two-edge routes with shared ends
+    two_step = {}
+    for (a, b), e1 in by_pair.items():
+        for (c, d), e2 in by_pair.items():
+            if b == c:
+                two_step.setdefault((a, d), []).append([e1, e2])
+    checked = 0
+    for options in two_step.values():
+        for route_a in options:
+            for route_b in options:
+                for charged in (True, False):
+                    direct = index.route_phase(route_a, charged=charged) - index.route_phase(route_b, charged=charged)
+                    assert index.phase_difference(route_a, route_b) == direct % scenario.k
+                checked += 1
+    assert checked
+
+
+def test_incremental_offset_update_matches_fresh_index():
+    raw = _lattice()
+    scenario = parse_scenario(copy.deepcopy(raw))
+    index = HolonomyIndex(scenario)
+    rng = random.Random(5)
+    for _ in range(10):
+        edge = rng.choice(raw["directed_edges"])
+        edge["phase_offset"] = rng.randrange(6)
+        index.set_edge_offset(edge["id"], edge["phase_offset"])
+    fresh = HolonomyIndex(parse_scenario(raw))
+    assert index.holonomy == fresh.holonomy
+
+
+@pytest.mark.parametrize("make", [_two_path, _lattice, _open_lattice])
+def test_redundant_gauge_steps_leave_readouts_unchanged(make):
+    raw = make()
+    scenario = parse_scenario(copy.deepcopy(raw))
+    index = HolonomyIndex(scenario)
+    k = scenario.k
+    base = _measure(raw, 3, {})
+    for readout in scenario.measurement:
+        for node_id in scenario.node_ids:
+            step = index.redundant_step(node_id, readout.name)
+            assert k % step == 0
+            for phase in range(step, k, step):
+                shifted = _measure(raw, 3, {node_id: (scenario.node_gauge[scenario.node_index_by_id[node_id]] + phase) % k})
+                assert shifted[readout.name] == pytest.approx(base[readout.name])
+
+
+def test_gauge_sweeps_shrink():
+    scenario = parse_scenario(_two_path())
+    index = HolonomyIndex(scenario)
+    # masks allow {0, 4} of k=8: only gauge changes by 4 can matter
+    assert {index.redundant_step(node_id, "det_A") for node_id in scenario.node_ids} == {4}
+    open_index = HolonomyIndex(parse_scenario(_open_lattice()))
+    readout = open_index.scenario.measurement[0].name
+    assert open_index.gauge_invariant(readout)
+
+
+def test_errors():
+    index = HolonomyIndex(parse_scenario(_two_path()))
+    with pytest.raises(ValueError, match="E_HOLONOMY_ROUTE"):
+        index.route_phase([])
+    with pytest.raises(ValueError, match="E_EDGE_UNKNOWN"):
+        index.route_phase([999])
+    with pytest.raises(ValueError, match="E_HOLONOMY_READOUT_UNKNOWN"):
+        index.redundant_step(index.scenario.node_ids[0], "missing")
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import load_scenario, parse_scenario
+from irrepnet.memory import MemoryLayout
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+INBOX = MemoryLayout(state="inbox")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        parse_scenario(bench.FAMILIES["lattice"](4, k=8, channels=2)),
+        parse_scenario(bench.FAMILIES["scatter"](4, k=8, channels=2)),
+        str(EXAMPLES / "cloud_v01.yaml"),
+        str(EXAMPLES / "chain_momentum_v01.yaml"),
+    ],
+)
+def test_inbox_state_matches_edge_state(source):
+    scenario = source if not isinstance(source, str) else load_scenario(source)
+    reference = IRREPnetSim(scenario, device=CPU, backend="torch")
+    inbox = IRREPnetSim(scenario, device=CPU, layout=INBOX, reorder="rcm")
+    assert inbox.backend == "torch" and inbox.counts_next is None
+    for _ in range(6):
+        reference.step()
+        inbox.step()
+        assert torch.equal(reference.export_counts(), inbox.export_counts())
+        assert inbox.measure() == pytest.approx(reference.measure())
+
+
+def test_inbox_state_follows_mutations():
+    scenario = parse_scenario(bench.FAMILIES["lattice"](4, k=8, channels=2))
+    sims = [IRREPnetSim(scenario, device=CPU, backend="torch"), IRREPnetSim(scenario, device=CPU, layout=INBOX)]
+    edge = scenario.directed_edges[5].id
+    for sim in sims:
+        sim.step()
+        sim.enable_edge(edge, False)
+        sim.add_counts(edge, 0, 3, 2)
+        sim.set_gauge(scenario.node_ids[1], 3)
+    assert torch.equal(sims[0].export_counts(), sims[1].export_counts())
+    for _ in range(3):
+        for sim in sims:
+            sim.step()
+        assert torch.equal(sims[0].export_counts(), sims[1].export_counts())
+    for sim in sims:
+        sim.enable_edge(edge, True)
+        sim.step()
+    assert sims[0].state_hash() == sims[1].state_hash()
+
+    exported = sims[0].export_counts()
+    sims[1].reset()
+    sims[1].import_counts(exported)
+    assert torch.equal(sims[1].export_counts(), exported)
+
+
+def test_inbox_estimate_and_budget():
+    scenario = parse_scenario(bench.FAMILIES["lattice"](8, k=16, channels=2))
+    edges = IRREPnetSim.estimate_memory(scenario).components["counts"]
+    inbox = IRREPnetSim.estimate_memory(scenario, layout=INBOX).components["counts"]
+    assert inbox < 0.55 * edges  # mean out-degree about 2
+    assert "state=inbox" in IRREPnetSim.estimate_memory(scenario, layout=INBOX).report()
+
+    narrowest = MemoryLayout(masks="compact", chunk_rows=1)
+    smallest_edges = IRREPnetSim.estimate_memory(scenario, layout=narrowest).total_bytes
+    sim = IRREPnetSim(scenario, device=CPU, memory_budget=smallest_edges - 1)
+    assert sim.layout.state == "inbox"
+    reference = IRREPnetSim(scenario, device=CPU)
+    for _ in range(3):
+        sim.step()
+        reference.step()
+    assert torch.equal(sim.counts, reference.counts)
+
+
+def test_inbox_state_needs_the_torch_backend():
+    path = str(EXAMPLES / "two_path_v01.yaml")
+    with pytest.raises(ValueError, match="E_BACKEND_STATE"):
+        IRREPnetSim(path, backend="numpy", layout=INBOX)
+    with pytest.raises(ValueError, match="E_BACKEND_STATE"):
+        IRREPnetSim(path, layout=MemoryLayout(state="nodes"))
+    with pytest.raises(ValueError, match="E_MEMORY_STATE"):
+        IRREPnetSim.estimate_memory(path, layout=MemoryLayout(state="inbox", storage="mmap"))
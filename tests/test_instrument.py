@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+import torch
+
+from irrepnet import IRREPnetSim
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+
+
+def test_profiler_records_phases_and_counters(tmp_path):
+    plain = IRREPnetSim(str(EXAMPLES / "cloud_v01.yaml"), device=torch.device("cpu"))
+    sim = IRREPnetSim(str(EXAMPLES / "cloud_v01.yaml"), device=torch.device("cpu"))
+    profiler = sim.enable_profiling()
+    for _ in range(3):
+        plain.step()
+        sim.step()
+    sim.measure()
+    assert torch.equal(plain.counts, sim.counts)
+
+    summary = profiler.summary()
+    assert {"propagate", "coupling", "consume", "emit", "measure"} <= set(summary["phases"])
+    assert summary["phases"]["propagate"]["calls"] == 3 * len(sim.layers)
+    assert summary["rules_fired"]["brems_emit"] >= 1
+    assert summary["rule_multiplicity"]["brems_emit"] >= summary["rules_fired"]["brems_emit"]
+    for name in ("nodes_touched", "edges_written", "host_syncs"):
+        assert summary["counters"][name] > 0
+    assert set(profiler.per_step()) == {0, 1, 2}
+    assert set(profiler.per_layer()) == set(range(len(sim.layers)))
+    assert "brems_emit" in profiler.table()
+
+    trace = tmp_path / "trace.json"
+    profiler.export_chrome_trace(str(trace))
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert len(events) == len(profiler.records)
+    assert all(event["ph"] == "X" for event in events)
+
+    assert sim.disable_profiling() is profiler
+    before = len(profiler.records)
+    sim.step()
+    assert len(profiler.records) == before
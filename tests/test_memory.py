@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import load_scenario, parse_scenario
+from irrepnet.memory import MemoryLayout
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def test_estimate_matches_allocated_state():
+    path = str(EXAMPLES / "cloud_v01.yaml")
+    estimate = IRREPnetSim.estimate_memory(path)
+    sim = IRREPnetSim(path, device=CPU)
+    assert estimate.components["counts"] == sim.counts.nbytes + sim.counts_next.nbytes
+    assert estimate.components["fusion_mask"] == sim.fusion_mask.nbytes
+    assert IRREPnetSim.estimate_memory(path, batch=4).components["counts"] == 4 * estimate.components["counts"]
+    wide = IRREPnetSim.estimate_memory(path, dtype=torch.int64)
+    assert wide.components["counts"] == 2 * estimate.components["counts"]
+    assert "peak" in estimate.report()
+
+
+def test_cheaper_layouts_do_not_change_results():
+    scenario = parse_scenario(bench.FAMILIES["scatter"](6, k=8, channels=2))
+    reference = IRREPnetSim(scenario, device=CPU)
+    compact = IRREPnetSim(scenario, device=CPU, layout=MemoryLayout(masks="compact", chunk_rows=1))
+    assert compact.mask_table.shape[0] < compact.num_edges
+    for _ in range(6):
+        reference.step()
+        compact.step()
+        assert torch.equal(reference.counts, compact.counts)
+
+
+def test_memory_budget_picks_layout_or_fails_fast():
+    scenario = parse_scenario(bench.FAMILIES["lattice"](8, k=16, channels=2))
+    full = IRREPnetSim.estimate_memory(scenario).total_bytes
+
+    with pytest.raises(ValueError, match="E_MEMORY_BUDGET"):
+        IRREPnetSim(scenario, device=CPU, memory_budget=1024)
+
+    sim = IRREPnetSim(scenario, device=CPU, memory_budget=full - 1)
+    assert sim.layout.masks == "compact"
+    assert sim.memory.total_bytes < full
+
+    state_only = IRREPnetSim.estimate_memory(scenario).components["counts"]
+    narrow = IRREPnetSim(scenario, device=CPU, memory_budget=state_only, max_count=1000)
+    assert narrow.counts.dtype == torch.int16
+    assert narrow.layout.chunk_rows is not None
+    for _ in range(4):
+        sim.step()
+        narrow.step()
+    assert torch.equal(sim.counts, narrow.counts.to(torch.int32))
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        parse_scenario(bench.FAMILIES["scatter"](6, k=8, channels=2)),
+        str(EXAMPLES / "cloud_v01.yaml"),
+        str(EXAMPLES / "triangle_loop_v01.yaml"),
+    ],
+)
+def test_memory_mapped_counts_match_in_memory_run(source, tmp_path):
+    scenario = source if not isinstance(source, str) else load_scenario(source)
+    reference = IRREPnetSim(scenario, device=CPU, backend="torch")
+    layout = MemoryLayout(chunk_rows=4, storage="mmap", storage_dir=str(tmp_path))
+    mapped = IRREPnetSim(scenario, reorder="rcm", layout=layout)
+    assert mapped.backend == "mmap"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["counts-a.bin", "counts-b.bin"]
+    for _ in range(6):
+        reference.step()
+        mapped.step()
+        assert torch.equal(reference.export_counts(), mapped.export_counts())
+        assert not mapped._backend._layers  # per-chunk indices are dropped after use
+    assert mapped.measure() == pytest.approx(reference.measure())
+
+
+def test_memory_budget_falls_back_to_mapped_counts():
+    scenario = parse_scenario(bench.FAMILIES["corridor"](64, k=16, channels=2))
+    counts = IRREPnetSim.estimate_memory(scenario).components["counts"]
+    sim = IRREPnetSim(scenario, memory_budget=counts // 2)
+    assert sim.layout.storage == "mmap"
+    assert sim.memory.components["counts"] < counts
+    reference = IRREPnetSim(scenario, device=CPU)
+    for _ in range(3):
+        sim.step()
+        reference.step()
+    assert torch.equal(sim.counts, reference.counts)
+
+
+def test_mapped_counts_need_the_mmap_backend():
+    path = str(EXAMPLES / "two_path_v01.yaml")
+    with pytest.raises(ValueError, match="E_BACKEND_STORAGE"):
+        IRREPnetSim(path, backend="mmap")
+    with pytest.raises(ValueError, match="E_BACKEND_STORAGE"):
+        IRREPnetSim(path, backend="torch", layout=MemoryLayout(storage="mmap"))
+    with pytest.raises(ValueError, match="E_MEMORY_STORAGE"):
+        IRREPnetSim.estimate_memory(path, layout=MemoryLayout(storage="disk"))
@@ -0,0 +1,68 @@
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, InvariantMonitor, bench
+from irrepnet.loader import parse_scenario
+from irrepnet.memory import MemoryLayout
+
+CPU = torch.device("cpu")
+
+
+def _corridor(**options):
+    return IRREPnetSim(parse_scenario(bench.corridor_scenario(6, k=8, channels=2)), device=CPU, **options)
+
+
+def test_monitor_tracks_totals_without_violations():
+    sim = _corridor()
+    sim.step()
+    monitor = InvariantMonitor(sim, conserve=("charge", "ch0"), checkpoint_every=5).attach()
+    for _ in range(10):
+        sim.step()
+    assert monitor.checkpoint().ok
+    steps, totals, charge = monitor.history()
+    assert steps == list(range(2, 12))
+    assert torch.equal(totals[-1], sim.counts.sum(dim=(0, 2)).to(torch.int64))
+    assert int(charge[0]) == int(totals[0].sum())
+    monitor.detach()
+    sim.step()
+    assert monitor.history()[0][-1] == 11
+
+
+def test_monitor_latches_first_violation():
+    sim = _corridor()
+    monitor = InvariantMonitor(sim, every=2, conserve=("charge",)).attach()
+    for _ in range(4):
+        sim.step()
+    sim.counts[2, 0, 1] += 5
+    for _ in range(3):
+        sim.step()
+    report = monitor.checkpoint(raise_on_violation=False)
+    assert report.violations == {"CONSERVATION": 6}
+    with pytest.raises(RuntimeError, match="E_INVARIANT_CONSERVATION"):
+        monitor.checkpoint()
+
+
+def test_monitor_flags_negative_and_saturated_counts():
+    sim = _corridor(layout=MemoryLayout(count_dtype=torch.int16))
+    monitor = InvariantMonitor(sim)
+    sim.counts[0, 0, 0] = torch.iinfo(torch.int16).max
+    sim.counts[1, 0, 0] = -1
+    monitor.observe()
+    report = monitor.checkpoint(raise_on_violation=False)
+    assert set(report.violations) == {"NEGATIVE", "SATURATED"}
+    with pytest.raises(RuntimeError, match="E_INVARIANT_NEGATIVE"):
+        monitor.checkpoint()
+
+
+def test_monitor_history_keeps_the_last_observations_only():
+    sim = _corridor()
+    monitor = InvariantMonitor(sim, history=4).attach()
+    for _ in range(10):
+        sim.step()
+    steps, totals, charge = monitor.history()
+    assert steps == [7, 8, 9, 10]
+    assert totals.shape[0] == charge.shape[0] == 4 and len(monitor._steps) == 4
+    assert torch.equal(totals[-1], sim.counts.sum(dim=(0, 2)).to(torch.int64))
+    monitor.reset()
+    sim.step()
+    assert monitor.history()[0] == [11]
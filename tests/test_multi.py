@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, MultiScenarioSim, bench
+from irrepnet.loader import load_scenario, parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _stochastic_scatter(seed):
+    raw = bench.scatter_zone_scenario(5, k=8, channels=2)
+    raw["coupling_rules"][0]["probability"] = 0.5
+    raw["coupling_rules"][1]["route"] = "random_one"
+    raw["seed"] = seed
+    return parse_scenario(raw)
+
+
+def _sources():
+    examples = [str(EXAMPLES / f"{name}_v01.yaml") for name in ("two_path", "triangle_loop", "chain_momentum", "cloud")]
+    return examples + [_stochastic_scatter(11), _stochastic_scatter(12), load_scenario(examples[1], reorder="rcm")]
+
+
+@pytest.mark.parametrize("backend", ["torch", "numpy"])
+def test_packed_scenarios_match_solo_runs(backend):
+    sources = _sources()
+    multi = MultiScenarioSim(sources, device=CPU, backend=backend)
+    solos = [IRREPnetSim(source, device=CPU, backend=backend) for source in sources]
+    assert multi.k == 24  # lcm of 8 and 12
+    for _ in range(6):
+        multi.step()
+        for solo in solos:
+            solo.step()
+        measured = multi.measure_scenarios()
+        for index, solo in enumerate(solos):
+            assert measured[index] == pytest.approx(solo.measure())
+            assert torch.equal(multi.scenario_counts(index), solo.export_counts())
+
+
+def test_mutation_through_merged_ids():
+    source = str(EXAMPLES / "two_path_v01.yaml")
+    multi = MultiScenarioSim([source, source], device=CPU)
+    solo = IRREPnetSim(source, device=CPU)
+    multi.set_gauge(multi.node_id(1, 2), 0)
+    solo.set_gauge(2, 0)
+    for _ in range(3):
+        multi.step()
+        solo.step()
+    first, second = multi.measure_scenarios()
+    assert second == pytest.approx(solo.measure())
+    assert first == pytest.approx(IRREPnetSim(source, device=CPU).run(3))
+    with pytest.raises(ValueError, match="E_EDGE_UNKNOWN"):
+        multi.edge_id(0, 999)
+
+
+def test_merge_errors():
+    with pytest.raises(ValueError, match="E_MULTI_EMPTY"):
+        MultiScenarioSim([], device=CPU)
+    a = parse_scenario(bench.corridor_scenario(3, k=200))
+    b = parse_scenario(bench.corridor_scenario(3, k=3))
+    with pytest.raises(ValueError, match="E_MULTI_K"):
+        MultiScenarioSim([a, b], device=CPU)
@@ -0,0 +1,142 @@
+import copy
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import parse_scenario
+from irrepnet.memory import MemoryLayout
+
+CPU = torch.device("cpu")
+
+
+def _raw():
+    raw = bench.scatter_zone_scenario(4, k=4, channels=2)
+    raw["nodes"][1]["gauge_phase"] = 1
+    return raw
+
+
+def _sim(raw, **options):
+    return IRREPnetSim(parse_scenario(copy.deepcopy(raw)), device=CPU, **options)
+
+
+def _assert_same(mutated, fresh, steps=4):
+    for _ in range(steps):
+        mutated.step()
+        fresh.step()
+        assert mutated.measure() == fresh.measure()
+    for edge in fresh.scenario.directed_edges:
+        assert torch.equal(mutated.counts[mutated.edge_index(edge.id)], fresh.counts[fresh.edge_index(edge.id)])
+
+
+@pytest.mark.parametrize("masks", ["dense", "compact"])
+def test_mutations_match_edited_scenario(masks):
+    raw = _raw()
+    layout = MemoryLayout(masks=masks)
+    sim = _sim(raw, layout=layout)
+    sim.step()  # caches are warm before mutating
+
+    edited = copy.deepcopy(raw)
+    edited["nodes"][2]["gauge_phase"] = 3
+    edited["directed_edges"][1]["phase_offset"] = 2
+    edited["fusion_mask"][0][1] = [0, 1, 0, 1]
+    edited["coupling_rules"][1]["scope"]["out_edges_any"] = []
+    fresh = _sim(edited, layout=layout)
+    fresh.counts.copy_(sim.counts)
+    fresh.step_count, fresh.layer_tick = sim.step_count, sim.layer_tick
+
+    sim.set_gauge(2, 3)
+    sim.set_edge_offset(raw["directed_edges"][1]["id"], 2)
+    sim.set_mask(raw["directed_edges"][0]["id"], "ch1", [1, 3])
+    sim.set_rule_scope("brems_ch1", nodes_any=["scatter_zone"])
+    _assert_same(sim, fresh)
+
+
+def test_disabled_edge_matches_removed_edge():
+    raw = _raw()
+    readout = {edge for out in raw["measurement"]["outputs"] for edge in out["readout_edges"]}
+    seeded = {entry["edge"] for entry in raw["counts_init"]}
+    victim = next(
+        edge["id"] for edge in raw["directed_edges"] if edge["id"] not in readout | seeded and edge.get("tags")
+    )
+    edited = copy.deepcopy(raw)
+    keep = [i for i, edge in enumerate(edited["directed_edges"]) if edge["id"] != victim]
+    edited["directed_edges"] = [edited["directed_edges"][i] for i in keep]
+    edited["fusion_mask"] = [edited["fusion_mask"][i] for i in keep]
+    for layer in edited["dag"]["layers"]:
+        layer["edges"] = [edge for edge in layer["edges"] if edge != victim]
+
+    sim = _sim(raw)
+    sim.step()
+    sim.reset()
+    sim.enable_edge(victim, False)
+    _assert_same(sim, _sim(edited))
+
+    sim.enable_edge(victim)
+    sim.reset()
+    baseline = _sim(raw)
+    sim.enable_edge(victim, False)
+    sim.enable_edge(victim, True)
+    _assert_same(sim, baseline)
+
+
+def test_add_counts_and_validation():
+    sim = _sim(_raw())
+    edge = sim.scenario.directed_edges[0].id
+    before = int(sim.counts[0, 0, 2])
+    sim.add_counts(edge, "ch0", 2, 5)
+    assert int(sim.counts[0, 0, 2]) == before + 5
+    sim.add_counts(edge, 0, 2, -5)
+    assert int(sim.counts[0, 0, 2]) == before
+
+    with pytest.raises(ValueError, match="E_COUNTS_NEGATIVE"):
+        sim.add_counts(edge, "ch0", 2, -before - 1)
+    with pytest.raises(ValueError, match="E_GAUGE_PHASE_RANGE"):
+        sim.set_gauge(0, sim.k)
+    with pytest.raises(ValueError, match="E_NODE_UNKNOWN"):
+        sim.set_gauge(10_000, 0)
+    with pytest.raises(ValueError, match="E_EDGE_UNKNOWN"):
+        sim.set_edge_offset(10_000, 0)
+    with pytest.raises(ValueError, match="E_FUSION_MASK_PHASE_RANGE"):
+        sim.set_mask(edge, "ch0", [sim.k])
+    with pytest.raises(ValueError, match="E_CHANNEL_UNKNOWN"):
+        sim.set_mask(edge, "nope", [0])
+    with pytest.raises(ValueError, match="E_RULE_UNKNOWN"):
+        sim.set_rule_scope("nope")
+
+
+def test_mutation_clears_stability_and_reset_restores():
+    raw = _raw()
+    sim = _sim(raw)
+    sim.run_until_stable(64)
+    assert sim.stability is not None
+    sim.set_gauge(2, 3)
+    assert sim.stability is None
+    sim.reset()
+    fresh = _sim(raw)
+    _assert_same(sim, fresh)
+
+
+def test_edge_deltas_follow_gauge_and_offset_changes():
+    sim = _sim(_raw())
+    sim.set_gauge(sim.scenario.node_ids[2], 3)
+    sim.set_edge_offset(sim.scenario.directed_edges[1].id, 2)
+    deltas = sim._edge_deltas(torch.arange(sim.num_edges)) % sim.bins
+    channels = range(sim.num_channels)
+    assert deltas.tolist() == [[sim._edge_channel_delta(c, edge) for c in channels] for edge in range(sim.num_edges)]
+
+
+@pytest.mark.parametrize("options", [{}, {"backend": "numpy"}, {"layout": MemoryLayout(state="inbox")}])
+def test_a_layer_with_every_edge_disabled_still_runs(options):
+    raw = bench.corridor_scenario(6, k=8, channels=2)
+    edges = [entry["id"] for entry in raw["directed_edges"]]
+    raw["dag"]["layers"] = [{"edges": edges[0::2]}, {"edges": edges[1::2]}]
+    sims = [_sim(raw, **options) for _ in range(2)]
+    for sim in sims:
+        for edge_id in edges[1::2]:
+            sim.enable_edge(edge_id, False)
+        assert int(sim.counts.sum()) > 0
+    sims[0].step()
+    sims[1].run(1, prune=True)
+    for sim in sims:
+        assert (sim.layer_tick, int(sim.counts.sum())) == (2, 0)
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import detect_phase_reduction, load_scenario, parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+@pytest.mark.parametrize("name", sorted(path.name for path in EXAMPLES.glob("*_v01.yaml")))
+def test_reduced_run_matches_full_run(name):
+    path = str(EXAMPLES / name)
+    reduced = IRREPnetSim(path, device=CPU, reduce_phases=True)
+    full = IRREPnetSim(path, device=CPU)
+    reduction = detect_phase_reduction(load_scenario(path))
+    assert reduced.k == full.k == full.bins
+    assert reduced.counts.shape[-1] == (full.k if reduction is None else reduction.internal_k)
+    for _ in range(5):
+        reduced.step()
+        full.step()
+        assert torch.equal(reduced.export_counts(), full.export_counts())
+    assert reduced.measure() == pytest.approx(full.measure())
+
+
+def test_detects_subgroup_and_coset():
+    assert detect_phase_reduction(load_scenario(str(EXAMPLES / "chain_momentum_v01.yaml"))).d == 4
+    assert detect_phase_reduction(parse_scenario(bench.FAMILIES["scatter"](4, k=8, channels=2))) is None
+
+    sim = IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), device=CPU, reduce_phases=True)
+    assert sim.reduction is not None and sim.bins == sim.k // sim.reduction.d
+    sim.add_counts(sim.scenario.directed_edges[0].id, 0, sim.reduction.declared(1), 3)
+    assert sim.reduction is not None
+
+
+def test_leaving_the_coset_expands_in_place():
+    path = str(EXAMPLES / "two_path_v01.yaml")
+    sim = IRREPnetSim(path, device=CPU, reduce_phases=True)
+    full = IRREPnetSim(path, device=CPU)
+    for other in (sim, full):
+        other.step()
+    node = sim.scenario.node_ids[2]
+    for other in (sim, full):
+        other.set_gauge(node, 1)
+    assert sim.reduction is None and sim.bins == sim.k
+    for _ in range(3):
+        sim.step()
+        full.step()
+    assert torch.equal(sim.export_counts(), full.export_counts())
+    assert sim.step_count == full.step_count
+
+    sim.reset()
+    assert sim.reduction is not None
+    sim.expand_phases()
+    sim.reset()
+    assert sim.reduction is None
+
+
+def test_import_counts_round_trips():
+    sim = IRREPnetSim(str(EXAMPLES / "chain_momentum_v01.yaml"), device=CPU, reorder="rcm", reduce_phases=True)
+    sim.step()
+    exported = sim.export_counts()
+    sim.reset()
+    sim.import_counts(exported)
+    assert sim.reduction is not None
+    assert torch.equal(sim.export_counts(), exported)
+
+    off_coset = torch.zeros_like(exported)
+    off_coset[0, 0, 1] = 5
+    sim.import_counts(off_coset)
+    assert sim.reduction is None
+    assert torch.equal(sim.export_counts(), off_coset)
+
+
+def test_estimate_sizes_the_reduced_state():
+    path = str(EXAMPLES / "chain_momentum_v01.yaml")
+    reduced = IRREPnetSim.estimate_memory(path, reduce_phases=True).components["counts"]
+    full = IRREPnetSim.estimate_memory(path).components["counts"]
+    assert reduced * 4 == full
+
+
+def test_adjoint_and_responses_keep_the_reduction():
+    path = str(EXAMPLES / "two_path_v01.yaml")
+    sim = IRREPnetSim(path, device=CPU, reduce_phases=True)
+    full = IRREPnetSim(path, device=CPU)
+    name = sim.readouts[0].name
+    assert torch.equal(sim.adjoint(name, 3).sensitivity, full.adjoint(name, 3).sensitivity)
+    assert sim.reduction is not None
+    counts_init = [(sim.scenario.directed_edges[0].id, 0, 1, 4)]
+    assert sim.response_library(3).measure(counts_init) == full.response_library(3).measure(counts_init)
+    assert sim.reduction is not None and sim.bins < sim.k
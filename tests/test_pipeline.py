@@ -0,0 +1,37 @@
+import time
+from pathlib import Path
+
+import torch
+
+from irrepnet import IRREPnetSim, SimulationPipeline
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+
+
+def test_pipeline_matches_sequential_steps():
+    scenario = str(EXAMPLES / "cloud_v01.yaml")
+    reference = IRREPnetSim(scenario, device=torch.device("cpu"))
+    expected = []
+    for _ in range(4):
+        reference.step()
+        expected.append((reference.counts.clone(), reference.measure()))
+
+    sim = IRREPnetSim(scenario, device=torch.device("cpu"))
+    pipeline = SimulationPipeline(sim, max_pending=1)
+
+    def slow_consumer(frame):
+        time.sleep(0.01)
+        return frame.step, frame.counts.clone(), frame.readouts
+
+    results = pipeline.run(4, slow_consumer)
+    assert [step for step, _, _ in results] == [1, 2, 3, 4]
+    for (_, counts, readouts), (ref_counts, ref_readouts) in zip(results, expected):
+        assert torch.equal(counts, ref_counts)
+        assert readouts == ref_readouts
+
+
+def test_pipeline_every_and_initial_frame():
+    sim = IRREPnetSim(str(EXAMPLES / "two_path_v01.yaml"), device=torch.device("cpu"))
+    pipeline = SimulationPipeline(sim, every=2, include_initial=True, snapshots=False)
+    steps = [frame.step for frame in pipeline.frames(5)]
+    assert steps == [0, 2, 4, 5]
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _sources():
+    scatter = bench.scatter_zone_scenario(6, k=8, channels=2)
+    scatter["coupling_rules"][0]["probability"] = 0.5
+    scatter["coupling_rules"][1]["route"] = "random_one"
+    detectors = bench.detector_scenario(12)
+    detectors["repeat"] = 2
+    return [
+        str(EXAMPLES / "cloud_v01.yaml"),
+        str(EXAMPLES / "two_path_v01.yaml"),
+        parse_scenario(scatter),
+        parse_scenario(detectors),
+    ]
+
+
+@pytest.mark.parametrize("source", _sources())
+@pytest.mark.parametrize("backend", ["torch", "numpy"])
+def test_pruned_run_matches_full_run(source, backend):
+    names = [readout.name for readout in IRREPnetSim(source, device=CPU).readouts]
+    for outputs in (None, names[:1]):
+        for steps in (1, 3, 7):
+            full = IRREPnetSim(source, device=CPU, backend=backend).run(steps, outputs=outputs)
+            pruned = IRREPnetSim(source, device=CPU, backend=backend).run(steps, outputs=outputs, prune=True)
+            assert pruned == full
+
+
+def test_cone_shrinks_towards_the_end():
+    raw = bench.corridor_scenario(40)
+    sim = IRREPnetSim(parse_scenario(raw), device=CPU)
+    cone = sim.light_cone(30)
+    full_rows = sum(chunk.edge_idx.numel() for chunks in sim._plans for chunk in chunks) * sim.repeat
+    assert cone.rows[-1] < full_rows
+    assert cone.rows == sorted(cone.rows, reverse=True)
+    with pytest.raises(ValueError, match="E_RUN_OUTPUT_UNKNOWN"):
+        sim.run(1, outputs=["nope"])
@@ -0,0 +1,104 @@
+import math
+import textwrap
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim
+from irrepnet.rng import CounterRNG
+
+SCENARIO = """
+irrepnet_dm: "0.2"
+seed: {seed}
+phase_group: {{ kind: "Zk", k: 4 }}
+channels:
+  - {{ name: e_minus, charge: -1 }}
+  - {{ name: gamma, charge: 0, neutral: true }}
+nodes:
+  - {{ id: 0 }}
+  - {{ id: 1, tags: ["scatter_zone"] }}
+  - {{ id: 2 }}
+  - {{ id: 3 }}
+  - {{ id: 4 }}
+edges:
+  - {{ id: 0, u: 0, v: 1 }}
+  - {{ id: 1, u: 1, v: 2, tags: ["gamma_line"] }}
+  - {{ id: 2, u: 1, v: 3, tags: ["gamma_line"] }}
+  - {{ id: 3, u: 1, v: 4, tags: ["gamma_line"] }}
+directed_edges:
+  - {{ id: 0, src: 0, dst: 1, edge_ref: 0 }}
+  - {{ id: 1, src: 1, dst: 2, edge_ref: 1 }}
+  - {{ id: 2, src: 1, dst: 3, edge_ref: 2 }}
+  - {{ id: 3, src: 1, dst: 4, edge_ref: 3 }}
+fusion_mask_sparse:
+  - {{ edge_id: 0, channel: e_minus, allow_phases: [0, 1, 2, 3] }}
+coupling_rules:
+  - name: brems_emit
+    scope: {{ nodes_any: ["scatter_zone"], out_edges_any: ["gamma_line"] }}
+    in:  [{{ ch: e_minus, min: 1 }}]
+    out: [{{ ch: e_minus, add: 1 }}, {{ ch: gamma, add: 1 }}]
+    phase: {{ gamma: "delta", e_minus: "inherit" }}
+    probability: 0.5
+    route: random_one
+counts_init:
+  - {{ edge: 0, channel: e_minus, phase: 0, value: {value} }}
+dag:
+  layers:
+    - {{ edges: [0] }}
+"""
+
+
+def _gamma_after_step(tmp_path, seed, value=400):
+    path = tmp_path / f"stochastic_{seed}.yaml"
+    path.write_text(textwrap.dedent(SCENARIO.format(seed=seed, value=value)))
+    sim = IRREPnetSim(str(path), device=torch.device("cpu"))
+    sim.step()
+    return sim.counts[:, sim.scenario.channel_index["gamma"], :].sum(dim=1)
+
+
+def test_counter_rng_is_order_independent():
+    rng = CounterRNG(1234, torch.device("cpu"))
+    keys = rng.entity_keys(torch.arange(64))
+    full = rng.bits(keys, step=7, stream=2, counter=torch.arange(64))
+    halves = torch.cat(
+        [
+            rng.bits(keys[32:], step=7, stream=2, counter=torch.arange(32, 64)),
+            rng.bits(keys[:32], step=7, stream=2, counter=torch.arange(32)),
+        ]
+    )
+    assert torch.equal(full, torch.cat([halves[32:], halves[:32]]))
+    assert int(full.min()) >= 0 and int(full.max()) < 2**32
+    assert not torch.equal(full, rng.bits(keys, step=8, stream=2, counter=torch.arange(64)))
+
+
+def test_stochastic_rule_is_seeded_and_routes_each_count_once(tmp_path):
+    first = _gamma_after_step(tmp_path, seed=11)
+    again = _gamma_after_step(tmp_path, seed=11)
+    other = _gamma_after_step(tmp_path, seed=12)
+    assert torch.equal(first, again)
+    assert not torch.equal(first, other)
+    fired = int(first.sum())
+    assert 0 < fired < 400
+    assert (first[1:] > 0).all()
+
+
+@pytest.mark.parametrize("count, probability", [(12, 0.3), (400, 0.5), (60, 0.9), (5, 1.0)])
+def test_binomial_draws_follow_the_distribution_and_their_keys(count, probability):
+    rng = CounterRNG(5, torch.device("cpu"))
+    keys = rng.entity_keys(torch.arange(20000))
+    draws = rng.binomial(keys, count, probability, step=3, stream=1)
+    assert int(draws.min()) >= 0 and int(draws.max()) <= count
+    mean, variance = count * probability, count * probability * (1 - probability)
+    assert float(draws.double().mean()) == pytest.approx(mean, abs=5 * math.sqrt(variance / draws.numel()) + 1e-9)
+    assert float(draws.double().var()) == pytest.approx(variance, rel=0.08, abs=1e-9)
+    halves = torch.cat(
+        [rng.binomial(keys[10000:], count, probability, 3, 1), rng.binomial(keys[:10000], count, probability, 3, 1)]
+    )
+    assert torch.equal(draws, torch.cat([halves[10000:], halves[:10000]]))
+
+
+def test_large_histograms_are_routed_without_a_draw_per_count(tmp_path):
+    gamma = _gamma_after_step(tmp_path, seed=11, value=2_000_000)
+    fired = int(gamma.sum())
+    assert fired == pytest.approx(1_000_000, rel=0.01)
+    assert all(int(share) == pytest.approx(fired / 3, rel=0.02) for share in gamma[1:])
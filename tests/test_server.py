@@ -0,0 +1,127 @@
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim
+from irrepnet.__main__ import main as cli
+from irrepnet.memory import MemoryLayout
+from irrepnet.server import SimRequest, SimulationService, make_server
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+SCENARIO = str(EXAMPLES / "two_path_v01.yaml")
+
+
+@pytest.fixture()
+def server():
+    service = SimulationService(device=CPU, batch_window=0.05)
+    httpd = make_server(service)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield service, f"http://{host}:{port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST")
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def _expected(steps, gauge=None):
+    sim = IRREPnetSim(SCENARIO, device=CPU)
+    for node_id, phase in (gauge or {}).items():
+        sim.set_gauge(node_id, phase)
+    for _ in range(steps):
+        sim.step()
+    return sim
+
+
+def test_concurrent_requests_are_coalesced_and_match_direct_runs(server):
+    service, url = server
+    node = IRREPnetSim(SCENARIO, device=CPU).scenario.node_ids[1]
+    payloads = [{"scenario": SCENARIO, "steps": steps} for steps in (1, 2, 3, 3)]
+    payloads.append({"scenario": SCENARIO, "steps": 2, "overrides": {"gauge": {str(node): 1}}})
+    with ThreadPoolExecutor(len(payloads)) as pool:
+        replies = list(pool.map(lambda p: json.loads(_post(url + "/simulate", p)), payloads))
+
+    for payload, reply in zip(payloads[:4], replies[:4]):
+        assert reply["step"] == payload["steps"]
+        assert reply["readouts"] == _expected(payload["steps"]).measure()
+    assert replies[4]["readouts"] == _expected(2, {node: 1}).measure()
+    assert max(reply["batched"] for reply in replies) > 1
+    # overrides were undone: the warm sim answers like a fresh one
+    again = json.loads(_post(url + "/simulate", {"scenario": SCENARIO, "steps": 2}))
+    assert again["readouts"] == _expected(2).measure()
+
+
+def test_npz_counts_and_errors(server):
+    _, url = server
+    body = _post(url + "/simulate?format=npz", {"scenario": SCENARIO, "steps": 2, "counts": True})
+    archive = np.load(io.BytesIO(body))
+    assert np.array_equal(archive["counts"], _expected(2).export_counts().numpy())
+    assert int(archive["step"]) == 2
+
+    with pytest.raises(urllib.error.HTTPError) as info:
+        _post(url + "/simulate", {"scenario": SCENARIO, "overrides": {"gauge": {"123456": 0}}})
+    assert info.value.code == 400
+    assert "E_NODE_UNKNOWN" in json.loads(info.value.read())["error"]
+    with pytest.raises(urllib.error.HTTPError):
+        _post(url + "/simulate", {"scenario": "missing.yaml"})
+    for path, payload in (("/load", []), ("/simulate", "x")):
+        with pytest.raises(urllib.error.HTTPError) as info:
+            _post(url + path, payload)
+        assert info.value.code == 400
+        assert json.loads(info.value.read())["error"].startswith("E_SERVE_REQUEST:")
+
+    with urllib.request.urlopen(url + "/scenarios") as response:
+        assert list(json.loads(response.read())) == [str(Path(SCENARIO).resolve())]
+
+
+@pytest.mark.parametrize("layout", [None, MemoryLayout(state="inbox")])
+def test_out_of_coset_overrides_are_undone_to_the_reduction(layout):
+    service = SimulationService(device=CPU, batch_window=0, reduce_phases=True)
+    warm = service.load(SCENARIO)
+    if layout is not None:
+        warm.sim = IRREPnetSim(SCENARIO, device=CPU, layout=layout, reduce_phases=True)
+    bins = warm.sim.bins
+    assert warm.sim.reduction is not None
+    node = warm.sim.scenario.node_ids[2]
+    reply = service.submit(SimRequest.from_json({"scenario": SCENARIO, "steps": 3, "overrides": {"gauge": {node: 1}}}))
+    assert reply.readouts == pytest.approx(_expected(3, {node: 1}).measure())
+    assert warm.sim.reduction is not None and warm.sim.bins == bins
+    reply = service.submit(SimRequest.from_json({"scenario": SCENARIO, "steps": 3, "counts": True}))
+    assert np.array_equal(reply.counts, _expected(3).export_counts().numpy())
+
+
+def test_internal_errors_answer_500(server, monkeypatch):
+    service, url = server
+
+    def broken(request):
+        raise RuntimeError("device lost")
+
+    monkeypatch.setattr(service, "submit", broken)
+    with pytest.raises(urllib.error.HTTPError) as info:
+        _post(url + "/simulate", {"scenario": SCENARIO, "steps": 1})
+    assert info.value.code == 500
+    assert json.loads(info.value.read())["error"] == "E_SERVE_INTERNAL: RuntimeError: device lost"
+
+
+def test_request_validation_and_cli_usage():
+    with pytest.raises(ValueError, match="E_SERVE_OVERRIDE_UNKNOWN"):
+        SimRequest.from_json({"scenario": SCENARIO, "overrides": {"bogus": 1}})
+    with pytest.raises(ValueError, match="E_SERVE_STEPS_RANGE"):
+        SimRequest.from_json({"scenario": SCENARIO, "steps": -1})
+    with pytest.raises(ValueError, match="E_SERVE_STEPS_RANGE"):
+        SimRequest.from_json({"scenario": SCENARIO, "steps": 10**12})
+    assert cli([]) == 2
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, bench
+from irrepnet.loader import parse_scenario
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "examples"
+CPU = torch.device("cpu")
+
+
+def _state_at(scenario, step):
+    sim = IRREPnetSim(scenario, device=CPU)
+    for _ in range(step):
+        sim.step()
+    return sim.counts
+
+
+def test_fixed_point_detected():
+    sim = IRREPnetSim(str(EXAMPLES / "cloud_v01.yaml"), device=CPU)
+    result = sim.run_until_stable(100, check_every=4)
+    assert result.status == "fixed_point"
+    assert result.period == 1
+    assert result.step < 10
+    sim.jump_to(1000)
+    assert sim.step_count == 1000
+    assert torch.equal(sim.counts, _state_at(str(EXAMPLES / "cloud_v01.yaml"), result.step))
+
+
+def test_cycle_detected_and_jump():
+    scenario = parse_scenario(bench.corridor_scenario(6, k=8, channels=1))
+    sim = IRREPnetSim(scenario, device=CPU)
+    result = sim.run_until_stable(200, period_max=8)
+    assert result.status == "cycle"
+    assert result.period == 6
+    assert result.cycle_start == 1
+    for target in (53, 2, 0, 31):
+        sim.jump_to(target)
+        assert sim.step_count == target
+        assert torch.equal(sim.counts, _state_at(scenario, target)), target
+
+
+def test_short_budget_and_stochastic_rules():
+    scenario = parse_scenario(bench.corridor_scenario(6, k=8, channels=1))
+    sim = IRREPnetSim(scenario, device=CPU)
+    result = sim.run_until_stable(5, period_max=8)
+    assert result.status == "max_steps" and not result.stable
+    assert sim.step_count == 5
+    other = IRREPnetSim(scenario, device=CPU)
+    assert other.state_hash() != sim.state_hash()
+    other.jump_to(5)
+    assert other.state_hash() == sim.state_hash()
+
+    raw = bench.scatter_zone_scenario(4, k=8)
+    raw["coupling_rules"][0]["probability"] = 0.5
+    with pytest.raises(ValueError, match="E_STABLE_STOCHASTIC"):
+        IRREPnetSim(parse_scenario(raw), device=CPU).run_until_stable(10)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import torch
+
+from irrepnet import IRREPnetSim, SimulationPipeline, TrajectoryReader, TrajectoryWriter, bench
+from irrepnet.loader import parse_scenario
+from irrepnet.trajectory import record_trajectory
+
+CPU = torch.device("cpu")
+
+
+def test_store_round_trips_sim_frames(tmp_path):
+    scenario = parse_scenario(bench.scatter_zone_scenario(5, k=4, channels=2))
+    expected = [
+        frame.counts.numpy().copy()
+        for frame in SimulationPipeline(IRREPnetSim(scenario, device=CPU), measure=False, include_initial=True).frames(9)
+    ]
+    sim = IRREPnetSim(scenario, device=CPU)
+    record_trajectory(sim, str(tmp_path / "run"), 9, chunk_frames=4, edge_block=3)
+
+    reader = TrajectoryReader(str(tmp_path / "run"))
+    assert reader.steps == list(range(10))
+    assert reader.edge_ids == [edge.id for edge in scenario.directed_edges]
+    for index in (7, 0, 9, 3, 4):  # random access across chunks
+        assert np.array_equal(reader.frame(index), expected[index])
+    part = reader.frame(6, edges=slice(2, 8), channels=["ch1"], sum_phases=True)
+    assert np.array_equal(part, expected[6][2:8, [1]].sum(axis=2, keepdims=True))
+    totals = [frame.sum() for _, frame in reader.iter_frames(sum_channels=True)]
+    assert totals == [frame.sum() for frame in expected]
+
+
+def test_unchanged_rows_are_delta_encoded(tmp_path):
+    frame = np.zeros((1000, 2, 8), dtype=np.int32)
+    frame[:, 0, 0] = np.arange(1000)
+    writer = TrajectoryWriter(str(tmp_path / "s"), num_edges=1000, channels=["a", "b"], k=8, chunk_frames=50)
+    with writer:
+        for step in range(100):
+            frame[step % 1000, 1, 3] += 1  # one row changes per frame
+            writer.append(step, frame)
+    reader = TrajectoryReader(str(tmp_path / "s"))
+    assert reader.frame(99)[5, 1, 3] == 1 and reader.frame(4)[5, 1, 3] == 0
+    assert np.array_equal(reader.at_step(99), frame)
+    stored = (tmp_path / "s" / "frames.bin").stat().st_size
+    assert stored < frame.nbytes * 4  # 100 raw frames would take 25x that
+
+
+def test_writer_validation(tmp_path):
+    writer = TrajectoryWriter(str(tmp_path / "s"), num_edges=2, channels=["a"], k=3)
+    with pytest.raises(ValueError, match="E_TRAJECTORY_SHAPE"):
+        writer.append(0, np.zeros((2, 1, 4)))
+    writer.append(1, np.zeros((2, 1, 3)))
+    with pytest.raises(ValueError, match="E_TRAJECTORY_STEP_ORDER"):
+        writer.append(1, np.zeros((2, 1, 3)))
+    writer.close()
+    with pytest.raises(ValueError, match="E_TRAJECTORY_STEP_UNKNOWN"):
+        TrajectoryReader(str(tmp_path / "s")).at_step(5)